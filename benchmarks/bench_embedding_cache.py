@@ -0,0 +1,95 @@
+# bench_embedding_cache.py
+# 以本地假嵌入伺服器（OpenAI 相容 /v1/embeddings，帶延遲）比較：逐塊嵌入 vs 去重 + 分批並行 + 快取（冷 / 熱）
+
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embedding_cache import CachedEmbedder, OpenAIEmbedder
+from vector_index import HashEmbedder
+
+LATENCY = float(os.environ.get("BENCH_LATENCY", 0.05))
+FAKE_MODEL = HashEmbedder(dim=64)
+
+
+class FakeEmbeddingHandler(BaseHTTPRequestHandler):
+    """假嵌入服務：以 HashEmbedder 產生向量，每個請求延遲 LATENCY 秒"""
+
+    requests = 0
+    texts = 0
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with self.lock:
+            FakeEmbeddingHandler.requests += 1
+            FakeEmbeddingHandler.texts += len(body["input"])
+        time.sleep(LATENCY)
+        vectors = FAKE_MODEL.embed(body["input"])
+        payload = json.dumps({
+            "object": "list",
+            "model": body["model"],
+            "data": [{"object": "embedding", "index": i, "embedding": vector.tolist()}
+                     for i, vector in enumerate(vectors)],
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_chunks(count=2000, unique_ratio=0.4):
+    """模擬手冊：大量重複的警告、頁首與法律聲明"""
+    random.seed(0)
+    boilerplate = [f"警告：操作前請確認電源已關閉（{i}）。" for i in range(20)]
+    chunks = []
+    for i in range(count):
+        if random.random() < unique_ratio:
+            chunks.append(f"第 {i} 節：泵浦 {i} 的檢查步驟與保養週期說明。")
+        else:
+            chunks.append(random.choice(boilerplate))
+    return chunks
+
+
+def run(label, embedder, texts):
+    FakeEmbeddingHandler.requests = FakeEmbeddingHandler.texts = 0
+    start = time.perf_counter()
+    if isinstance(embedder, CachedEmbedder):
+        embedder.embed(texts)
+    else:
+        for text in texts:
+            embedder.embed([text])
+    elapsed = time.perf_counter() - start
+    print(f"{label:<14} {elapsed:8.3f} 秒，請求 {FakeEmbeddingHandler.requests} 次，"
+          f"嵌入 {FakeEmbeddingHandler.texts} 段文字")
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEmbeddingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}/v1"
+
+    texts = make_chunks(int(os.environ.get("BENCH_CHUNKS", 2000)))
+    print(f"塊數: {len(texts)}，不重複: {len(set(texts))}")
+
+    client = OpenAIEmbedder(model="fake-embedding", dim=FAKE_MODEL.dim, base_url=base_url, api_key="test")
+    cache_dir = tempfile.mkdtemp()
+
+    run("逐塊嵌入", client, texts[:200])
+    print("  （只跑前 200 塊）")
+    run("快取（冷）", CachedEmbedder(client, cache_dir), texts)
+    run("快取（熱）", CachedEmbedder(client, cache_dir), texts)
+
+    server.shutdown()
@@ -0,0 +1,69 @@
+# bench_pdf2docx_workers.py
+# 比較 translate_pdf 的 PDF 轉 DOCX：原本單行程 Converter.convert vs 分頁平行（1 / 2 / 4 個行程），
+# 以及轉換與翻譯重疊的 convert_and_translate（假翻譯器）
+# 用法：python benchmarks/bench_pdf2docx_workers.py [pdf 路徑]（未指定時產生合成 PDF）
+# 需要安裝 pdf2docx、googletrans（只為了匯入 translate_pdf，不會實際連網）
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+from pdf2docx import Converter
+
+import translate_pdf
+from bench_pdf_workers import make_pdf
+from translation_engine import FakeTranslator
+
+LATENCY = float(os.environ.get("BENCH_LATENCY", 0.05))
+
+
+def docx_texts(path):
+    doc = Document(path)
+    return ([p.text for p in doc.paragraphs],
+            [cell.text for table in doc.tables for row in table.rows for cell in row.cells])
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"==> {label}: {elapsed:.2f} 秒\n")
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    tmp_dir = tempfile.mkdtemp()
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pages = int(os.environ.get("BENCH_PAGES", 60))
+        pdf_path = os.path.join(tmp_dir, "bench.pdf")
+        make_pdf(pdf_path, pages)
+        print(f"合成 PDF: {pages} 頁\n")
+
+    serial_docx = os.path.join(tmp_dir, "serial.docx")
+
+    def serial():
+        cv = Converter(pdf_path)
+        cv.convert(serial_docx)
+        cv.close()
+
+    timed("單行程 Converter.convert", serial)
+    baseline = docx_texts(serial_docx)
+
+    for workers in (1, 2, 4):
+        docx_path = os.path.join(tmp_dir, f"workers-{workers}.docx")
+        timed(f"分頁平行 workers={workers}",
+              lambda: translate_pdf.pdf_to_docx(pdf_path, docx_path, workers=workers))
+        if docx_texts(docx_path) != baseline:
+            print("  注意：段落或表格文字與單行程結果不一致\n")
+
+    timed("轉換 + 翻譯重疊", lambda: translate_pdf.convert_and_translate(
+        pdf_path, os.path.join(tmp_dir, "temp.docx"), os.path.join(tmp_dir, "translated.docx"),
+        rate=20, backend_factory=lambda: FakeTranslator(LATENCY)))
@@ -0,0 +1,58 @@
+# bench_pdf_workers.py
+# 以合成的多頁 PDF（每三頁一個格線表格）比較 PDFParser 在 1 / 2 / 4 / 8 個行程下的解析時間
+# 用法：python benchmarks/bench_pdf_workers.py [pdf 路徑]（未指定時產生合成 PDF）
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # PyMuPDF
+
+from rag_solution1_pymupdf_pdfplumber import PDFParser
+
+
+def make_pdf(path, pages=200):
+    """產生合成 PDF：每頁 25 行文字，每三頁一個 4x3 格線表格"""
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        y = 72
+        for j in range(25):
+            page.insert_text((72, y), f"Page {i + 1} line {j}: the pump must be inspected.", fontsize=10)
+            y += 14
+        if i % 3 == 0:
+            for r in range(4):
+                for c in range(3):
+                    rect = fitz.Rect(72 + c * 150, 500 + r * 20, 72 + (c + 1) * 150, 500 + (r + 1) * 20)
+                    page.draw_rect(rect, color=(0, 0, 0), width=0.8)
+                    page.insert_text((rect.x0 + 3, rect.y1 - 6), f"H{c}" if r == 0 else f"v{r}{c}", fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def run(pdf_path, workers):
+    parser = PDFParser(pdf_path, workers=workers)
+    start = time.perf_counter()
+    documents = list(parser.iter_documents())
+    elapsed = time.perf_counter() - start
+    tables = sum(1 for d in documents if d["content_type"] == "table")
+    print(f"workers={workers:<2} {elapsed:8.3f} 秒，文檔 {len(documents)} 個，表格 {tables} 個")
+    return documents
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pages = int(os.environ.get("BENCH_PAGES", 200))
+        pdf_path = os.path.join(tempfile.mkdtemp(), "bench.pdf")
+        make_pdf(pdf_path, pages)
+        print(f"合成 PDF: {pages} 頁")
+
+    baseline = run(pdf_path, 1)
+    for workers in (2, 4, 8):
+        assert run(pdf_path, workers) == baseline, "多行程結果與單行程不一致"
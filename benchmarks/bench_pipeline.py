@@ -0,0 +1,78 @@
+# bench_pipeline.py
+# 以合成的雙語翻譯文件（正文、縮排群組、表格、多節頁首頁尾、文字框）比較 translate_document：
+# 分階段（全部翻譯完才寫入與調整格式）vs 管線（各區域翻譯完成即處理），並確認兩者輸出相同
+
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.oxml import parse_xml
+
+import translate_deep_translator as tdt
+from bench_textboxes import TEXTBOX_XML
+from translation_engine import FakeTranslator
+
+LATENCY = float(os.environ.get("BENCH_LATENCY", 0.2))
+
+
+def make_docx(path, sections=8, paragraphs=120, tables=4, rows=12):
+    """每節：正文段落（含編號 + 縮排的群組）、表格、獨立的頁首頁尾、一個文字框"""
+    doc = Document()
+    for s in range(sections):
+        section = doc.sections[0] if s == 0 else doc.add_section(WD_SECTION.NEW_PAGE)
+        section.header.is_linked_to_previous = False
+        section.header.paragraphs[0].text = f"第{s}章 操作手冊"
+        section.footer.is_linked_to_previous = False
+        section.footer.paragraphs[0].text = "文件編號 QP-001"
+
+        for i in range(paragraphs):
+            if i % 10 == 0:
+                doc.add_paragraph(f"{i // 10 + 1}. 第{s}章第{i}段：檢查泵浦壓力")
+                doc.add_paragraph(f"      並確認閥門{i}已關閉")
+            else:
+                doc.add_paragraph(f"第{s}章第{i}段：操作前請確認電源已關閉。")
+        for t in range(tables):
+            table = doc.add_table(rows=rows, cols=3)
+            for r in range(rows):
+                table.cell(r, 0).text = "項目"
+                table.cell(r, 1).text = f"第{s}章表{t}參數{r}"
+                table.cell(r, 2).text = f"{r * 10}"
+        box = '<w:p><w:r><w:t>' + f'流程{s}：開始檢查' + '</w:t></w:r></w:p>'
+        doc.add_paragraph()._p.append(parse_xml(TEXTBOX_XML.format(paragraphs=box)))
+    doc.save(path)
+
+
+def document_xml(path):
+    """比較用：所有 XML part 的內容"""
+    with zipfile.ZipFile(path) as z:
+        return {name: z.read(name) for name in z.namelist() if name.endswith('.xml')}
+
+
+def run(label, input_path, output_path, pipelined):
+    start = time.perf_counter()
+    result = tdt.translate_document(input_path, output_path, backend_factory=lambda: FakeTranslator(LATENCY),
+                                    pipelined=pipelined)
+    elapsed = time.perf_counter() - start
+    print(f"==> {label}: {elapsed:.2f} 秒，請求 {result['requests']} 次，各階段 {result['timings']}\n")
+
+
+if __name__ == "__main__":
+    tdt.TRANSLATION_MEMORY_PATH = None
+    tmp_dir = tempfile.mkdtemp()
+    input_path = os.path.join(tmp_dir, "bench.docx")
+    make_docx(input_path)
+
+    staged_path = os.path.join(tmp_dir, "staged.docx")
+    pipelined_path = os.path.join(tmp_dir, "pipelined.docx")
+    run("分階段", input_path, staged_path, pipelined=False)
+    run("管線", input_path, pipelined_path, pipelined=True)
+
+    same = document_xml(staged_path) == document_xml(pipelined_path)
+    print("輸出相同" if same else "注意：兩種模式的輸出不同")
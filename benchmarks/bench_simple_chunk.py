@@ -0,0 +1,83 @@
+# bench_simple_chunk.py
+# 比較 UnstructuredPDFParser 備援分塊：原本的字串累加 + metadata.update 與串流 list-join 打包器
+# 以 10k / 30k / 100k 個合成元素檢查是否線性成長，並確認 overlap=0 時塊文字與原實作相同
+# 需要安裝 unstructured（只為了匯入 rag_solution2_unstructured，不會實際解析 PDF）
+
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import rag_solution2_unstructured as rs2
+from element_store import ElementStore
+
+CHUNK_SIZE = 1000
+OVERLAP = 200
+
+
+def make_elements(count):
+    """模擬手冊：每頁約 20 個長短不一的元素"""
+    random.seed(0)
+    elements = []
+    for i in range(count):
+        words = " ".join(f"word{random.randint(0, 999)}" for _ in range(random.randint(3, 40)))
+        elements.append({
+            "type": "Title" if i % 20 == 0 else "NarrativeText",
+            "element_id": f"e{i}",
+            "text": f"元素 {i}: {words}",
+            "metadata": {"filename": "manual.pdf", "page_number": i // 20 + 1},
+        })
+    return elements
+
+
+def legacy_simple_chunk(documents, chunk_size):
+    """原本的實作（字串累加、忽略 overlap），僅供比較"""
+    chunks = []
+    current_chunk = ""
+    current_metadata = {}
+    for doc in documents:
+        text = doc["text"]
+        if len(current_chunk) + len(text) <= chunk_size:
+            current_chunk += text + "\n"
+            current_metadata.update(doc["metadata"])
+        else:
+            if current_chunk:
+                chunks.append({"text": current_chunk.strip(), "metadata": dict(current_metadata)})
+            current_chunk = text + "\n"
+            current_metadata = doc["metadata"].copy()
+    if current_chunk:
+        chunks.append({"text": current_chunk.strip(), "metadata": dict(current_metadata)})
+    return chunks
+
+
+def timed(fn, repeat=3):
+    """取 repeat 次中最快的一次"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def run(count):
+    parser = rs2.UnstructuredPDFParser("manual.pdf")
+    parser.store = ElementStore.from_dicts(make_elements(count))
+
+    legacy, legacy_time = timed(lambda: legacy_simple_chunk(parser.store.iter_documents(), CHUNK_SIZE))
+    packed, packed_time = timed(lambda: parser._simple_chunk(CHUNK_SIZE, 0))
+    overlapped, overlap_time = timed(lambda: parser._simple_chunk(CHUNK_SIZE, OVERLAP))
+
+    same = [c["text"] for c in legacy] == [c["text"] for c in packed]
+    print(f"{count:>7} 元素  原實作 {legacy_time:6.3f} 秒  list-join {packed_time:6.3f} 秒"
+          f"（{packed_time / count * 1e6:5.2f} µs/元素）  overlap={OVERLAP} {overlap_time:6.3f} 秒  "
+          f"塊數 {len(packed)} / {len(overlapped)}  {'文字相同' if same else '文字不同！'}")
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in os.environ.get("BENCH_ELEMENTS", "10000,30000,100000").split(",")]
+    for count in sizes:
+        run(count)
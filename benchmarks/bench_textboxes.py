@@ -0,0 +1,89 @@
+# bench_textboxes.py
+# 以合成的流程圖 DOCX（大量文字框、每段被拆成多個 w:t）比較文字框翻譯的舊作法與新作法
+
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from docx.oxml import OxmlElement
+
+import translate_deep_translator as tdt
+from translation_engine import FakeTranslator, TranslationEngine
+
+TEXTBOX_XML = (
+    '<w:r xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+    ' xmlns:v="urn:schemas-microsoft-com:vml"><w:pict><v:shape><v:textbox><w:txbxContent>'
+    '{paragraphs}</w:txbxContent></v:textbox></v:shape></w:pict></w:r>'
+)
+
+
+def make_flowchart_docx(boxes=300, paragraphs_per_box=3, fragments_per_paragraph=4):
+    """產生流程圖型文件：每個文字框數段文字，每段拆成多個 run"""
+    doc = Document()
+    for i in range(boxes):
+        paragraphs = ''.join(
+            '<w:p>' + ''.join(
+                f'<w:r><w:t>步驟{i}-{j}片段{k}</w:t></w:r>' for k in range(fragments_per_paragraph)
+            ) + '</w:p>'
+            for j in range(paragraphs_per_box)
+        )
+        doc.add_paragraph()._p.append(parse_xml(TEXTBOX_XML.format(paragraphs=paragraphs)))
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+def legacy_translate_textbox(textbox):
+    """舊作法：逐一翻譯每個 w:t，每遇到中文就重設整個文字框的 run 與段落樣式"""
+    for text_elem in textbox.findall('.//' + qn('w:t')):
+        if text_elem.text and text_elem.text.strip():
+            original_text = text_elem.text
+            text_elem.text = tdt.translate_to_english(original_text)
+            if tdt.is_chinese(original_text):
+                for r in textbox.findall('.//' + qn('w:r')):
+                    rPr = r.find(qn('w:rPr'))
+                    if rPr is None:
+                        rPr = OxmlElement('w:rPr')
+                        r.append(rPr)
+                    sz = rPr.find(qn('w:sz'))
+                    if sz is None:
+                        sz = OxmlElement('w:sz')
+                        rPr.append(sz)
+                    sz.set(qn('w:val'), '11')
+                for _ in range(2):
+                    for p in textbox.findall('.//' + qn('w:p')):
+                        pPr = p.find(qn('w:pPr'))
+                        if pPr is None:
+                            pPr = OxmlElement('w:pPr')
+                            p.insert(0, pPr)
+
+
+def run(label, data, translate, prefetch):
+    doc = Document(io.BytesIO(data))
+    tdt.engine = TranslationEngine(lambda: FakeTranslator(0), max_workers=4, rate=0)
+    textboxes = list(doc.element.body.iter(qn('w:txbxContent')))
+
+    start = time.perf_counter()
+    if prefetch:
+        texts = [joined for tb in textboxes for _, joined in tdt.textbox_paragraph_texts(tb)]
+        tdt.engine.prefetch(texts)
+    for textbox in textboxes:
+        translate(textbox)
+    elapsed = time.perf_counter() - start
+
+    print(f"{label:<10} {elapsed:8.3f} 秒，翻譯請求 {tdt.engine.stats['requests']} 次")
+
+
+if __name__ == "__main__":
+    boxes = int(os.environ.get("BENCH_BOXES", 300))
+    data = make_flowchart_docx(boxes=boxes)
+    print(f"文字框數: {boxes}（每框 3 段，每段 4 個 w:t）")
+    run("舊作法", data, legacy_translate_textbox, prefetch=False)
+    run("新作法", data, tdt.translate_textbox, prefetch=True)
@@ -0,0 +1,54 @@
+# bench_translate_direct.py
+# 比較 translate_pdf 的兩條路徑（假翻譯器）：PDF → DOCX（pdf2docx）→ 翻譯，vs 直接翻譯 PDF 文字層
+# 用法：python benchmarks/bench_translate_direct.py [pdf 路徑]（未指定時產生合成 PDF）
+# 需要安裝 pdf2docx、googletrans（只為了匯入 translate_pdf，不會實際連網）
+
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import translate_pdf
+from bench_pdf_workers import make_pdf
+from translation_engine import FakeTranslator
+
+LATENCY = float(os.environ.get("BENCH_LATENCY", 0.05))
+RATE = 20
+
+
+def fake_backend():
+    return FakeTranslator(LATENCY)
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"==> {label}: {elapsed:.2f} 秒\n")
+    return elapsed
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    tmp_dir = tempfile.mkdtemp()
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pages = int(os.environ.get("BENCH_PAGES", 60))
+        pdf_path = os.path.join(tmp_dir, "bench.pdf")
+        make_pdf(pdf_path, pages)
+        print(f"合成 PDF: {pages} 頁\n")
+
+    docx_time = timed("PDF → DOCX → 翻譯", lambda: translate_pdf.convert_and_translate(
+        pdf_path, os.path.join(tmp_dir, "temp.docx"), os.path.join(tmp_dir, "translated.docx"),
+        rate=RATE, backend_factory=fake_backend))
+
+    for mode in translate_pdf.DIRECT_MODES:
+        output_path = os.path.join(tmp_dir, f"direct_{mode}" + (".txt" if mode == "text" else ".pdf"))
+        elapsed = timed(f"直接翻譯 {mode}", lambda: translate_pdf.translate_pdf_direct(
+            pdf_path, output_path, mode=mode, rate=RATE, backend_factory=fake_backend))
+        print(f"    比 DOCX 路徑快 {docx_time / elapsed:.1f} 倍\n")
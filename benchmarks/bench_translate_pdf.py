@@ -0,0 +1,74 @@
+# bench_translate_pdf.py
+# 以本地假翻譯器測試 translate_pdf.translate_docx：段落 + 含合併儲存格與重複文字的表格
+# 比較原本「逐段 / 逐格請求 + 固定 sleep 0.5 秒」的估計耗時與限速併發翻譯的實際耗時
+# 需要安裝 pdf2docx、googletrans（只為了匯入 translate_pdf，不會實際連網）
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx import Document
+
+import translate_pdf
+from translation_engine import FakeTranslator
+
+LATENCY = float(os.environ.get("BENCH_LATENCY", 0.05))
+LEGACY_SLEEP = 0.5
+
+
+def make_docx(path, paragraphs=200, tables=10, rows=10):
+    """段落 + 表格：第一欄每列重複、表頭兩格合併"""
+    doc = Document()
+    for i in range(paragraphs):
+        doc.add_paragraph(f"Paragraph {i}: check the pump pressure before operation.")
+    for t in range(tables):
+        table = doc.add_table(rows=rows, cols=4)
+        table.cell(0, 0).merge(table.cell(0, 1)).text = f"Table {t} header"
+        table.cell(0, 2).text = "Value"
+        table.cell(0, 3).text = "Unit"
+        for r in range(1, rows):
+            table.cell(r, 0).text = "Item"
+            table.cell(r, 1).text = f"Parameter {t}-{r}"
+            table.cell(r, 2).text = str(r * 10)
+            table.cell(r, 3).text = "bar"
+    doc.save(path)
+
+
+def legacy_requests(path):
+    """原本的實作對每個非空段落、row.cells 中每個非空儲存格各送一次請求"""
+    doc = Document(path)
+    count = sum(1 for p in doc.paragraphs if p.text.strip())
+    for table in doc.tables:
+        for row in table.rows:
+            count += sum(1 for cell in row.cells if cell.text.strip())
+    return count
+
+
+def run(path, workers, rate):
+    output = path.replace(".docx", f"_out_{workers}.docx")
+    start = time.perf_counter()
+    translate_pdf.translate_docx(path, output, max_workers=workers, rate=rate,
+                                 backend_factory=lambda: FakeTranslator(LATENCY))
+    elapsed = time.perf_counter() - start
+    print(f"==> workers={workers} rate={rate}/秒: {elapsed:.2f} 秒\n")
+    return output
+
+
+if __name__ == "__main__":
+    path = os.path.join(tempfile.mkdtemp(), "bench.docx")
+    make_docx(path)
+    requests = legacy_requests(path)
+    print(f"原實作: {requests} 次請求，估計 {requests * (LATENCY + LEGACY_SLEEP):.1f} 秒"
+          f"（延遲 {LATENCY * 1000:.0f} ms + sleep {LEGACY_SLEEP} 秒）\n")
+
+    run(path, 1, translate_pdf.REQUESTS_PER_SECOND)
+    output = run(path, translate_pdf.MAX_WORKERS, 20)
+
+    doc = Document(output)
+    untranslated = [p.text for p in doc.paragraphs if p.text.strip() and not p.text.startswith("EN[")]
+    cell = doc.tables[0].cell(0, 0).text
+    print(f"未翻譯段落: {len(untranslated)}，合併儲存格: {cell!r}")
@@ -0,0 +1,44 @@
+# bench_translation_engine.py
+# 以本地假翻譯器比較「逐筆序列翻譯」與 TranslationEngine 批次併發翻譯
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from translation_engine import FakeTranslator, TranslationEngine
+
+
+def make_texts(n=2000, unique=600):
+    return [f"第{i % unique}條 作業程序說明文字，請依規定執行。" for i in range(n)]
+
+
+def bench_serial(texts, latency):
+    translator = FakeTranslator(latency)
+    start = time.perf_counter()
+    for text in texts:
+        translator.translate(text)
+    return time.perf_counter() - start
+
+
+def bench_engine(texts, latency, max_workers, rate):
+    engine = TranslationEngine(lambda: FakeTranslator(latency), max_workers=max_workers, rate=rate)
+    start = time.perf_counter()
+    engine.prefetch(texts)
+    for text in texts:
+        engine.translate(text)
+    return time.perf_counter() - start, engine.stats
+
+
+if __name__ == "__main__":
+    latency = 0.05
+    texts = make_texts(n=400)
+    print(f"字串數: {len(texts)}，模擬延遲: {latency * 1000:.0f} ms")
+
+    serial = bench_serial(texts, latency)
+    print(f"逐筆序列: {serial:.2f} 秒（{len(texts)} 次請求）")
+
+    for workers in (1, 4, 8):
+        elapsed, stats = bench_engine(texts, latency, workers, rate=20)
+        print(f"引擎 workers={workers}: {elapsed:.2f} 秒（{stats['requests']} 次請求）")
@@ -0,0 +1,45 @@
+# bench_unstructured_workers.py
+# 比較 UnstructuredPDFParser 以 hi_res 分頁平行解析時 1 / 2 / 4 個行程的吞吐量（頁 / 秒）
+# 用法：python benchmarks/bench_unstructured_workers.py [pdf 路徑]（未指定時產生合成 PDF）
+# 需要安裝 unstructured[pdf]（hi_res 另需 tesseract / detectron2 等模型）
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import fitz  # PyMuPDF
+
+import rag_solution2_unstructured as rs2
+from bench_pdf_workers import make_pdf
+
+
+def run(pdf_path, workers, total_pages):
+    parser = rs2.UnstructuredPDFParser(pdf_path, workers=workers)
+    start = time.perf_counter()
+    store = parser.parse(strategy="hi_res")
+    elapsed = time.perf_counter() - start
+    print(f"workers={workers:<2} {elapsed:8.2f} 秒，{total_pages / elapsed:6.2f} 頁/秒，元素 {len(store)} 個")
+    return [(doc["text"], doc["metadata"].get("page_number")) for doc in store.iter_documents()]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        pdf_path = sys.argv[1]
+    else:
+        pages = int(os.environ.get("BENCH_PAGES", 24))
+        pdf_path = os.path.join(tempfile.mkdtemp(), "bench.pdf")
+        make_pdf(pdf_path, pages)
+        print(f"合成 PDF: {pages} 頁")
+
+    with fitz.open(pdf_path) as doc:
+        total_pages = len(doc)
+    print(f"每段頁數上限: {rs2.PARTITION_PAGES_PER_TASK}")
+
+    baseline = run(pdf_path, 1, total_pages)
+    for workers in (2, 4):
+        if run(pdf_path, workers, total_pages) != baseline:
+            print("  注意：元素文字或頁碼與單行程結果不一致")
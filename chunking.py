@@ -0,0 +1,245 @@
+"""
+語意分塊
+依句子邊界（。！？等）與表格列切分，貪婪打包到字數或 token 數上限，文本可跨頁延續
+單次線性掃描，片段只記錄 (起, 迄) 位置，輸出塊時才切出文字
+"""
+
+import math
+import re
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from tokenizer import Tokenizer, get_tokenizer
+
+# 句末標點（含其後的右引號、右括號）；英文句點須接空白才算句末；空行視為段落邊界
+SENTENCE_BOUNDARY = re.compile(r'[。！？!?；;]+[」』”’）)\]]*|\.(?=\s)|\n\s*\n')
+# 表格列、過長句子的次要邊界
+LINE_BOUNDARY = re.compile(r'\n')
+# 片段內第一個到最後一個非空白字元
+_NON_SPACE = re.compile(r'\S(?:[\s\S]*\S)?')
+# 跨頁接續時插入的分隔
+PAGE_SEPARATOR = "\n"
+# token 模式下一次批次計算 token 數的文檔數
+COUNT_BATCH_DOCS = 256
+# token 模式下切句時的字元上限倍數（估計每 token 最多約 4 字元）
+CHARS_PER_TOKEN = 4
+
+Span = Tuple[int, int]
+
+
+def _strip_span(text: str, start: int, end: int) -> Optional[Span]:
+    match = _NON_SPACE.search(text, start, end)
+    return match.span() if match else None
+
+
+def _split_spans(text: str, start: int, end: int, boundary: "re.Pattern") -> Iterator[Span]:
+    """以 boundary 切出 [start, end) 內的片段（邊界字元歸前一段），去除頭尾空白"""
+    pos = start
+    for match in boundary.finditer(text, start, end):
+        span = _strip_span(text, pos, match.end())
+        if span:
+            yield span
+        pos = match.end()
+    span = _strip_span(text, pos, end)
+    if span:
+        yield span
+
+
+def sentence_spans(text: str, max_length: int, table: bool = False) -> Iterator[Span]:
+    """
+    切出句子片段 (start, end)
+    表格以列（換行）為單位；文本以句末標點為單位，
+    超過 max_length 的句子再依換行切開，仍過長時依 max_length 硬切
+    """
+    for start, end in _split_spans(text, 0, len(text), LINE_BOUNDARY if table else SENTENCE_BOUNDARY):
+        if end - start <= max_length:
+            yield start, end
+            continue
+
+        lines = ((start, end),) if table else _split_spans(text, start, end, LINE_BOUNDARY)
+        for line_start, line_end in lines:
+            while line_end - line_start > max_length:
+                span = _strip_span(text, line_start, line_start + max_length)
+                if span:
+                    yield span
+                line_start += max_length
+            span = _strip_span(text, line_start, line_end)
+            if span:
+                yield span
+
+
+class _Packer:
+    """
+    把片段貪婪打包成不超過 chunk_size 的塊，輸出後保留尾端片段作為重疊
+    片段為 (文檔, 起, 迄, token 數)；token 數為 None 時以字元計算
+    """
+
+    def __init__(self, chunk_size: int, overlap: int, tokens: bool = False):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.tokens = tokens
+        self.pending: List[Tuple[Dict[str, Any], int, int, Optional[int]]] = []
+        self.length = 0
+
+    def _cost(self, prev: Optional[tuple], unit: tuple) -> int:
+        """加入 unit 後增加的長度（字元模式含同一文檔內兩片段之間的原文空白）"""
+        doc, start, end, weight = unit
+        if self.tokens:
+            return weight
+        if prev is None:
+            return end - start
+        if prev[0] is doc:
+            return end - prev[2]
+        return end - start + len(PAGE_SEPARATOR)
+
+    def _recompute(self):
+        self.length = 0
+        prev = None
+        for unit in self.pending:
+            self.length += self._cost(prev, unit)
+            prev = unit
+
+    def _carry_overlap(self):
+        """保留尾端總長不超過 overlap 的片段（至少捨棄第一個，確保前進）"""
+        keep = 0
+        length = 0
+        for i in range(len(self.pending) - 1, 0, -1):
+            unit = self.pending[i]
+            if keep:
+                after = self.pending[i + 1]
+                length += self._cost(None, unit) + self._cost(unit, after) - self._cost(None, after)
+            else:
+                length = self._cost(None, unit)
+            if length > self.overlap:
+                break
+            keep += 1
+        self.pending = self.pending[len(self.pending) - keep:] if keep else []
+        self._recompute()
+
+    def add(self, doc: Dict[str, Any], start: int, end: int,
+            weight: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        unit = (doc, start, end, weight)
+        if self.pending and self.length + self._cost(self.pending[-1], unit) > self.chunk_size:
+            yield self._emit()
+            self._carry_overlap()
+            while self.pending and self.length + self._cost(self.pending[-1], unit) > self.chunk_size:
+                self.pending.pop(0)
+                self._recompute()
+
+        self.length += self._cost(self.pending[-1] if self.pending else None, unit)
+        self.pending.append(unit)
+
+    def flush(self) -> Iterator[Dict[str, Any]]:
+        if self.pending:
+            yield self._emit()
+        self.pending = []
+        self.length = 0
+
+    def _emit(self) -> Dict[str, Any]:
+        # 同一文檔內連續的片段合併成一段原文區間
+        groups = []
+        for doc, start, end, _ in self.pending:
+            if groups and groups[-1][0] is doc:
+                groups[-1][2] = end
+            else:
+                groups.append([doc, start, end])
+
+        first_doc, chunk_start, _ = groups[0]
+        last_doc, _, chunk_end = groups[-1]
+        chunk = {
+            "text": PAGE_SEPARATOR.join(doc["content"][start:end] for doc, start, end in groups),
+            "metadata": {
+                **first_doc["metadata"],
+                "content_type": first_doc["content_type"],
+                "chunk_start": chunk_start,
+                "chunk_end": chunk_end,
+                "page_end": last_doc["page"],
+            }
+        }
+        if self.tokens:
+            chunk["metadata"]["tokens"] = self.length
+        return chunk
+
+
+class SentenceChunker:
+    """
+    句子感知分塊器
+    - 文本依句末標點、表格依列切分，貪婪打包到 chunk_size
+    - overlap 以完整句子為單位（尾端總長不超過 overlap 的句子帶到下一塊）
+    - cross_page=True 時同一來源的文本頁面可接續成同一塊（文檔帶 new_section=True 時重新開始）；表格各自分塊
+    - chunk_start 為起始頁內容中的位置，chunk_end 為結束頁（page_end）內容中的位置
+    - tokenizer 指定時 chunk_size / overlap 以 token 計算（可傳名稱，見 tokenizer.get_tokenizer），
+      每 COUNT_BATCH_DOCS 個文檔的句子合併成一批計算 token 數
+    """
+
+    def __init__(self, chunk_size: int = 1000, overlap: int = 200, cross_page: bool = True,
+                 tokenizer: Union[str, Tokenizer, None] = None):
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.cross_page = cross_page
+        self.tokenizer = get_tokenizer(tokenizer)
+        self._text = _Packer(chunk_size, overlap, self.tokenizer is not None)
+
+    def _weigh(self, units: List[tuple]) -> List[tuple]:
+        """批次計算片段的 token 數；超過 chunk_size 的片段依字元平均切開後重算"""
+        counts = self.tokenizer.count_many([doc["content"][start:end] for doc, start, end in units])
+        weighed = []
+        for (doc, start, end), count in zip(units, counts):
+            if count <= self.chunk_size or end - start <= 1:
+                weighed.append((doc, start, end, count))
+                continue
+            step = math.ceil((end - start) / (math.ceil(count / self.chunk_size) + 1))
+            pieces = []
+            for piece_start in range(start, end, step):
+                span = _strip_span(doc["content"], piece_start, min(piece_start + step, end))
+                if span:
+                    pieces.append((doc, *span))
+            weighed.extend(self._weigh(pieces))
+        return weighed
+
+    def feed_many(self, docs: List[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """加入多個文檔（token 模式下一起計算 token 數），產生已完成的塊"""
+        max_length = self.chunk_size * (CHARS_PER_TOKEN if self.tokenizer is not None else 1)
+        units = [(doc, start, end)
+                 for doc in docs
+                 for start, end in sentence_spans(doc["content"], max_length, doc["content_type"] == "table")]
+        if self.tokenizer is not None:
+            units = self._weigh(units)
+        else:
+            units = [(*unit, None) for unit in units]
+
+        position = 0
+        for doc in docs:
+            table = doc["content_type"] == "table"
+            if table or not self.cross_page:
+                packer = _Packer(self.chunk_size, self.overlap, self.tokenizer is not None)
+            else:
+                packer = self._text
+                if packer.pending and (doc.get("new_section") or
+                                       packer.pending[-1][0]["metadata"].get("source") != doc["metadata"].get("source")):
+                    yield from packer.flush()
+
+            while position < len(units) and units[position][0] is doc:
+                yield from packer.add(*units[position])
+                position += 1
+
+            if packer is not self._text:
+                yield from packer.flush()
+
+    def feed(self, doc: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """加入一個文檔，產生已完成的塊（跨頁延續中的塊留待後續文檔或 flush）"""
+        yield from self.feed_many([doc])
+
+    def flush(self) -> Iterator[Dict[str, Any]]:
+        """輸出最後一個跨頁延續中的塊"""
+        yield from self._text.flush()
+
+    def chunk(self, documents: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        documents = iter(documents)
+        batch_size = COUNT_BATCH_DOCS if self.tokenizer is not None else 1
+        while True:
+            docs = list(islice(documents, batch_size))
+            if not docs:
+                break
+            yield from self.feed_many(docs)
+        yield from self.flush()
@@ -0,0 +1,179 @@
+# docx_walker.py
+# 單次走訪 DOCX 的 lxml 樹，依文件順序產生分類節點，各處理階段以 handler 註冊
+
+import time
+
+from docx.oxml.ns import qn
+from docx.table import Table, _Cell
+from docx.text.paragraph import Paragraph
+
+# ==================== 節點類型 ====================
+BODY = 'body'                               # 正文段落（順序與 doc.paragraphs 相同）
+CELL = 'cell'                               # 正文表格儲存格（w:tc）
+HEADER_FOOTER = 'header_footer'             # 頁首頁尾段落
+HEADER_FOOTER_CELL = 'header_footer_cell'   # 頁首頁尾表格儲存格
+TEXTBOX = 'textbox'                         # 流程圖文字框（w:txbxContent）
+
+ALL_KINDS = (BODY, CELL, HEADER_FOOTER, HEADER_FOOTER_CELL, TEXTBOX)
+
+# ===================== 節點 =====================
+
+class DocNode:
+    """
+    文件節點
+    element: w:p / w:tc / w:txbxContent
+    parent: 建立 python-docx 代理物件所需的父物件
+    index: 正文段落序號（與 enumerate(doc.paragraphs) 相同）
+    table: 儲存格節點所屬的 w:tbl
+    """
+    __slots__ = ('kind', 'element', 'parent', 'index', 'table', '_proxy')
+
+    def __init__(self, kind, element, parent=None, index=None, table=None):
+        self.kind = kind
+        self.element = element
+        self.parent = parent
+        self.index = index
+        self.table = table
+        self._proxy = None
+
+    @property
+    def paragraph(self):
+        """段落節點的 Paragraph（只建立一次）"""
+        if self._proxy is None:
+            self._proxy = Paragraph(self.element, self.parent)
+        return self._proxy
+
+    @property
+    def cell(self):
+        """儲存格節點的 _Cell（只建立一次）"""
+        if self._proxy is None:
+            self._proxy = _Cell(self.element, self.parent)
+        return self._proxy
+
+    @property
+    def paragraphs(self):
+        """節點內的段落（段落節點回傳自己）"""
+        if self.kind in (BODY, HEADER_FOOTER):
+            return [self.paragraph]
+        if self.kind == TEXTBOX:
+            return []
+        cell = self.cell
+        return [Paragraph(p, cell) for p in self.element.iterchildren(qn('w:p'))]
+
+    @property
+    def runs(self):
+        """節點內的 w:r 元素（不建立 Run 代理物件）"""
+        if self.kind == TEXTBOX:
+            return list(self.element.iter(qn('w:r')))
+        if self.kind in (BODY, HEADER_FOOTER):
+            return list(self.element.iterchildren(qn('w:r')))
+        runs = []
+        for p in self.element.iterchildren(qn('w:p')):
+            runs.extend(p.iterchildren(qn('w:r')))
+        return runs
+
+# ===================== 走訪 =====================
+
+def iter_header_footers(doc):
+    """所有未連結到前一節的頁首頁尾（依 part 去重）"""
+    seen = set()
+    for section in doc.sections:
+        for hf in (section.header, section.first_page_header, section.even_page_header,
+                   section.footer, section.first_page_footer, section.even_page_footer):
+            if not hf or hf.is_linked_to_previous:
+                continue
+            if id(hf.part) in seen:
+                continue
+            seen.add(id(hf.part))
+            yield hf
+
+def _iter_table_cells(container, kind, parent):
+    for tbl in container.iterchildren(qn('w:tbl')):
+        table = Table(tbl, parent)
+        for tr in tbl.iterchildren(qn('w:tr')):
+            for tc in tr.iterchildren(qn('w:tc')):
+                yield DocNode(kind, tc, table, table=tbl)
+
+def walk_header_footer(hf):
+    """單一頁首頁尾的段落與表格儲存格節點"""
+    hf_element = hf._element
+    nodes = [DocNode(HEADER_FOOTER, p, hf) for p in hf_element.iterchildren(qn('w:p'))]
+    nodes.extend(_iter_table_cells(hf_element, HEADER_FOOTER_CELL, hf))
+    return nodes
+
+def walk_document(doc):
+    """單次走訪整份文件，依序回傳正文段落、表格儲存格、頁首頁尾、文字框節點"""
+    body = doc.element.body
+    nodes = []
+
+    para_index = 0
+    for p in body.iterchildren(qn('w:p')):
+        nodes.append(DocNode(BODY, p, doc._body, para_index))
+        para_index += 1
+
+    nodes.extend(_iter_table_cells(body, CELL, doc._body))
+
+    for hf in iter_header_footers(doc):
+        nodes.extend(walk_header_footer(hf))
+
+    for textbox in body.iter(qn('w:txbxContent')):
+        nodes.append(DocNode(TEXTBOX, textbox))
+
+    return nodes
+
+# ===================== 階段執行 =====================
+
+class DocumentWalker:
+    """
+    走訪一次文件後，依註冊順序把節點分派給各階段的 handler
+    timings 記錄每個階段（含走訪本身）的耗時（秒）
+    nodes 為最近一次走訪的節點（供管線模式依區域處理）
+    """
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.stages = []
+        self.timings = {}
+        self.nodes = []
+
+    def add_stage(self, name, handler=None, kinds=ALL_KINDS, before=None, after=None):
+        """
+        handler(node): 對每個符合 kinds 的節點呼叫
+        before() / after(): 階段開始前 / 結束後呼叫一次（例如結束最後一組、送出批次翻譯）
+        """
+        self.stages.append((name, handler, tuple(kinds), before, after))
+
+    def run(self):
+        """走訪一次並依序執行已註冊的階段，執行後清空階段清單"""
+        start = time.perf_counter()
+        nodes = self.nodes = walk_document(self.doc)
+        self._record('walk', start)
+
+        for name, handler, kinds, before, after in self.stages:
+            start = time.perf_counter()
+            if before is not None:
+                before()
+            if handler is not None:
+                for node in nodes:
+                    if node.kind in kinds:
+                        handler(node)
+            if after is not None:
+                after()
+            self._record(name, start)
+
+        self.stages = []
+        return self.timings
+
+    def _record(self, name, start):
+        self.add_timing(name, time.perf_counter() - start)
+
+    def add_timing(self, name, seconds):
+        """記錄走訪以外的階段耗時（例如批次翻譯）"""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def report(self):
+        """各階段耗時報告"""
+        total = sum(self.timings.values())
+        lines = [f"  {name:<12} {seconds:8.3f} 秒" for name, seconds in self.timings.items()]
+        lines.append(f"  {'total':<12} {total:8.3f} 秒")
+        return "\n".join(lines)
@@ -0,0 +1,108 @@
+"""
+精簡的欄位式元素儲存
+把 unstructured 元素（或其 dict）轉成：
+- 一個文字緩衝區 + 起訖位置陣列
+- 以編號表示的類型名稱（interned）
+- 以編號表示的元數據 dict（內容相同的元數據只存一份）
+- 元素 id 清單
+解析後只建立一次，元素類型統計、分塊、儲存都從這裡讀取，不再保留完整的 Element 物件
+"""
+
+import json
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List
+
+
+class ElementStore:
+    def __init__(self):
+        self._text = ""
+        self._offsets = array('q', [0])
+        self._type_ids = array('H')
+        self._meta_ids = array('I')
+        self._ids: List[str] = []
+        self.type_names: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+
+    @classmethod
+    def from_dicts(cls, elements: Iterable[Dict[str, Any]]) -> "ElementStore":
+        """
+        由元素 dict（elements_to_dicts 的格式：type / element_id / text / metadata）建立
+        輸入只走訪一次，元數據以排序後的 JSON 為鍵去重
+        """
+        store = cls()
+        texts = []
+        type_index: Dict[str, int] = {}
+        meta_index: Dict[str, int] = {}
+        position = 0
+
+        for element in elements:
+            text = element.get("text") or ""
+            texts.append(text)
+            position += len(text)
+            store._offsets.append(position)
+
+            type_name = element.get("type") or "Text"
+            type_id = type_index.get(type_name)
+            if type_id is None:
+                type_id = type_index[type_name] = len(store.type_names)
+                store.type_names.append(type_name)
+            store._type_ids.append(type_id)
+
+            metadata = element.get("metadata") or {}
+            meta_key = json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=str)
+            meta_id = meta_index.get(meta_key)
+            if meta_id is None:
+                meta_id = meta_index[meta_key] = len(store._metadatas)
+                store._metadatas.append(metadata)
+            store._meta_ids.append(meta_id)
+
+            store._ids.append(element.get("element_id") or "")
+
+        store._text = "".join(texts)
+        return store
+
+    def __len__(self) -> int:
+        return len(self._type_ids)
+
+    def text(self, index: int) -> str:
+        return self._text[self._offsets[index]:self._offsets[index + 1]]
+
+    def type_name(self, index: int) -> str:
+        return self.type_names[self._type_ids[index]]
+
+    def metadata(self, index: int) -> Dict[str, Any]:
+        """共用的元數據 dict（唯讀；需要修改時請先複製）"""
+        return self._metadatas[self._meta_ids[index]]
+
+    def type_counts(self) -> Dict[str, int]:
+        """元素類型統計（只計算編號，不建立字串）"""
+        return {self.type_names[type_id]: count for type_id, count in Counter(self._type_ids).items()}
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """逐一產生文檔格式 {id, text, type, metadata}（metadata 為淺複製）"""
+        for index in range(len(self)):
+            yield {
+                "id": index,
+                "text": self.text(index),
+                "type": self.type_name(index),
+                "metadata": dict(self.metadata(index)),
+            }
+
+    def iter_dicts(self) -> Iterator[Dict[str, Any]]:
+        """逐一產生元素 dict（可交給 elements_from_dicts 重建 Element）"""
+        for index in range(len(self)):
+            yield {
+                "type": self.type_name(index),
+                "element_id": self._ids[index],
+                "text": self.text(index),
+                "metadata": dict(self.metadata(index)),
+            }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "elements": len(self),
+            "text_chars": len(self._text),
+            "types": len(self.type_names),
+            "unique_metadata": len(self._metadatas),
+        }
@@ -0,0 +1,235 @@
+"""
+嵌入快取
+- OpenAIEmbedder: OpenAI 相容的 /embeddings HTTP 用戶端（base_url 可指向本地假伺服器）
+- EmbeddingStore: 以文字 SHA-256 定址的向量庫，向量存在 float32 memmap 檔，鍵存在 SQLite
+- CachedEmbedder: 去重 → 查快取 → 未命中的文字分批並行送出 → 寫回快取
+  重跑或重複的塊（警告、頁首、法律聲明等）不會再呼叫嵌入服務
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+import requests
+
+from vector_index import Embedder, HashEmbedder
+
+# 預設快取目錄（每個模型一個子目錄）
+DEFAULT_CACHE_DIR = "data/embedding_cache"
+# 每次請求的文字數與同時進行的請求數
+EMBED_BATCH_SIZE = 64
+EMBED_CONCURRENCY = 4
+# 請求失敗重試次數與指數退避起始秒數
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+# ===================== OpenAI 相容用戶端 =====================
+
+class OpenAIEmbedder(Embedder):
+    """
+    OpenAI 相容的嵌入服務用戶端（POST {base_url}/embeddings）
+    base_url / api_key 未指定時讀取 OPENAI_BASE_URL / OPENAI_API_KEY
+    每個執行緒各自持有一個 requests.Session
+    """
+
+    def __init__(self, model: str = "text-embedding-3-small", dim: int = 1536,
+                 base_url: Optional[str] = None, api_key: Optional[str] = None,
+                 timeout: float = 60, retries: int = RETRIES, backoff: float = RETRY_BACKOFF):
+        self.model = model
+        self.dim = dim
+        self.name = model
+        self.base_url = (base_url or os.getenv("OPENAI_BASE_URL") or "https://api.openai.com/v1").rstrip("/")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY", "")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            if self.api_key:
+                session.headers["Authorization"] = f"Bearer {self.api_key}"
+            self._local.session = session
+        return session
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """單次請求嵌入 texts（分批由呼叫端負責），429 / 5xx / 連線錯誤時指數退避重試"""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self._session().post(
+                    f"{self.base_url}/embeddings",
+                    json={"model": self.model, "input": list(texts)},
+                    timeout=self.timeout,
+                )
+                if response.status_code == 429 or response.status_code >= 500:
+                    raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+                response.raise_for_status()
+                break
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                retryable = not isinstance(e, requests.HTTPError) or e.response is None or \
+                    e.response.status_code == 429 or e.response.status_code >= 500
+                if not retryable or attempt >= self.retries:
+                    raise
+                delay = self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+                print(f"嵌入請求失敗，{delay:.1f} 秒後重試（{attempt + 1}/{self.retries}）- {str(e)}")
+                time.sleep(delay)
+
+        data = sorted(response.json()["data"], key=lambda item: item["index"])
+        vectors = np.asarray([item["embedding"] for item in data], dtype=np.float32)
+        if vectors.shape != (len(texts), self.dim):
+            raise ValueError(f"嵌入服務回傳的形狀 {vectors.shape} 與預期 {(len(texts), self.dim)} 不符")
+        return vectors
+
+
+# ===================== 內容定址向量庫 =====================
+
+class EmbeddingStore:
+    """
+    內容定址的向量庫
+    vectors.f32: float32 memmap（容量不足時加倍擴充），第 row 列為一個向量
+    keys.sqlite3: 文字雜湊 → row；向量先寫入 memmap 並 flush，再提交鍵，中斷時不會留下指向空向量的鍵
+    同一時間只應由一個行程寫入
+    """
+
+    def __init__(self, path: str, dim: int, initial_capacity: int = 1024):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        self.vectors_path = self.path / "vectors.f32"
+
+        self._conn = sqlite3.connect(str(self.path / "keys.sqlite3"))
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute('CREATE TABLE IF NOT EXISTS keys (key TEXT PRIMARY KEY, row INTEGER NOT NULL)')
+        stored_dim = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if stored_dim is None:
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+            self._conn.commit()
+        elif int(stored_dim[0]) != dim:
+            raise ValueError(f"向量庫 {self.path} 的維度為 {stored_dim[0]}，與目前的 {dim} 不符")
+
+        self.next_row = self._conn.execute('SELECT COALESCE(MAX(row) + 1, 0) FROM keys').fetchone()[0]
+        if not self.vectors_path.exists():
+            self._resize(initial_capacity)
+        self._open()
+
+    def _open(self):
+        capacity = self.vectors_path.stat().st_size // (self.dim * 4)
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def _resize(self, capacity: int):
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(capacity * self.dim * 4)
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        """批次查詢，回傳 {鍵: 向量}（只含命中的項目）"""
+        if not keys:
+            return {}
+        rows = self._conn.execute(
+            'SELECT key, row FROM keys WHERE key IN (SELECT value FROM json_each(?))',
+            (json.dumps(list(keys)),),
+        ).fetchall()
+        return {key: np.array(self._vectors[row]) for key, row in rows}
+
+    def put_many(self, vectors: Dict[str, np.ndarray]):
+        if not vectors:
+            return
+        capacity = len(self._vectors)
+        needed = self.next_row + len(vectors)
+        if needed > capacity:
+            self._vectors.flush()
+            del self._vectors
+            self._resize(max(needed, capacity * 2))
+            self._open()
+
+        rows = []
+        for offset, (key, vector) in enumerate(vectors.items()):
+            self._vectors[self.next_row + offset] = vector
+            rows.append((key, self.next_row + offset))
+        self._vectors.flush()
+
+        with self._conn:
+            self._conn.executemany('INSERT OR IGNORE INTO keys (key, row) VALUES (?, ?)', rows)
+        self.next_row += len(rows)
+
+    def close(self):
+        self._vectors.flush()
+        self._conn.close()
+
+
+# ===================== 帶快取的嵌入器 =====================
+
+class CachedEmbedder(Embedder):
+    """
+    包裝任一嵌入器：去重、查快取、未命中的文字每 batch_size 筆一批，
+    以 concurrency 個執行緒同時送出，結果寫回 EmbeddingStore
+    stats: requests（實際請求數）、texts（實際嵌入的文字數）、cache_hits、duplicates
+    """
+
+    def __init__(self, inner: Embedder, cache_dir: Optional[str] = DEFAULT_CACHE_DIR,
+                 batch_size: int = EMBED_BATCH_SIZE, concurrency: int = EMBED_CONCURRENCY):
+        self.inner = inner
+        self.name = inner.name
+        self.dim = inner.dim
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.store = None
+        if cache_dir is not None:
+            model_dir = re.sub(r'[^A-Za-z0-9._-]+', '_', inner.name)
+            self.store = EmbeddingStore(Path(cache_dir) / model_dir, inner.dim)
+        self.stats = {"requests": 0, "texts": 0, "cache_hits": 0, "duplicates": 0}
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        keys = [text_key(text) for text in texts]
+        unique = dict(zip(keys, texts))
+        self.stats["duplicates"] += len(keys) - len(unique)
+
+        found = self.store.get_many(list(unique)) if self.store is not None else {}
+        self.stats["cache_hits"] += len(found)
+
+        missing = [key for key in unique if key not in found]
+        if missing:
+            batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(pool.map(lambda batch: self.inner.embed([unique[key] for key in batch]), batches))
+
+            embedded = {}
+            for batch, vectors in zip(batches, results):
+                embedded.update(zip(batch, vectors))
+            self.stats["requests"] += len(batches)
+            self.stats["texts"] += len(missing)
+            if self.store is not None:
+                self.store.put_many(embedded)
+            found.update(embedded)
+
+        result = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, key in enumerate(keys):
+            result[i] = found[key]
+        return result
+
+    def close(self):
+        if self.store is not None:
+            self.store.close()
+        self.inner.close()
+
+
+def default_embedder() -> Embedder:
+    """有 OPENAI_API_KEY 時使用帶快取的 OpenAI 相容嵌入服務，否則使用本地確定性嵌入"""
+    if os.getenv("OPENAI_API_KEY"):
+        return CachedEmbedder(OpenAIEmbedder())
+    return HashEmbedder()
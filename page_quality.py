@@ -0,0 +1,114 @@
+"""
+以 PyMuPDF 快速評估 PDF 頁面
+- page_may_have_table: 有沒有足夠的格線可能構成表格
+- page_quality / needs_hi_res: 文字層是否可用（文字密度、圖片覆蓋率、亂碼比例、表格可能性），
+  決定該頁只用 fast 解析就好，還是需要 hi_res（版面偵測 + OCR）
+"""
+
+import re
+from typing import Any, Dict
+
+import fitz  # PyMuPDF
+
+# ===== 表格判斷門檻 =====
+# 表格至少有兩個相鄰儲存格：某條格線需與此數以上的垂直格線相交（單一矩形框只有 2 條）
+MIN_TABLE_RULES = 3
+# 覆蓋頁面面積超過此比例的矩形視為頁框 / 背景，不算格線
+PAGE_FRAME_COVERAGE = 0.8
+# 座標容差（點）：同一位置的格線合併、相交判斷、共線線段接合
+RULE_TOLERANCE = 2
+
+# ===== hi_res 判斷門檻 =====
+# 少於此字數視為沒有文字層（掃描頁）
+MIN_PAGE_CHARS = 50
+# 每 1000 平方點少於此字數視為文字稀疏（多半是圖片為主的頁面）
+MIN_TEXT_DENSITY = 0.2
+# 圖片覆蓋頁面的比例超過此值時需要 OCR
+MAX_IMAGE_COVERAGE = 0.5
+# 無法解碼的字元（U+FFFD、(cid:xx)）比例超過此值視為文字層損壞
+MAX_GARBLED_RATIO = 0.05
+
+_GARBLED = re.compile(r'\ufffd|\(cid:\d+\)')
+
+
+def _merge_rules(rules):
+    """同一位置（容差內）的共線線段接合成一條格線：[(位置, 起點, 終點)]"""
+    merged = []
+    for position, start, end in sorted(rules):
+        last = merged[-1] if merged else None
+        if last and position - last[0] <= RULE_TOLERANCE and start <= last[2] + RULE_TOLERANCE:
+            last[2] = max(last[2], end)
+        else:
+            merged.append([position, start, end])
+    return merged
+
+
+def _crossings(rule, others):
+    """與 rule 相交的垂直方向格線數"""
+    position, start, end = rule
+    return sum(1 for other, other_start, other_end in others
+               if start - RULE_TOLERANCE <= other <= end + RULE_TOLERANCE
+               and other_start - RULE_TOLERANCE <= position <= other_end + RULE_TOLERANCE)
+
+
+def page_may_have_table(page: "fitz.Page") -> bool:
+    """
+    以 PyMuPDF 的向量繪圖快速判斷頁面是否可能有表格
+    pdfplumber 預設（lines 策略）只會找出由格線構成的表格，沒有水平 + 垂直格線的頁面可直接略過
+    單一矩形（頁框、醒目提示框、背景色塊）不算表格：需有格線與至少 MIN_TABLE_RULES 條垂直格線相交，
+    也就是至少兩個相鄰的儲存格；覆蓋大半頁面的矩形直接忽略
+    """
+    page_area = max(page.rect.width * page.rect.height, 1.0)
+    horizontal, vertical = [], []
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            if item[0] in ("re", "qu"):
+                rect = item[1] if item[0] == "re" else item[1].rect
+                if rect.width * rect.height >= PAGE_FRAME_COVERAGE * page_area:
+                    continue
+                horizontal += [(rect.y0, rect.x0, rect.x1), (rect.y1, rect.x0, rect.x1)]
+                vertical += [(rect.x0, rect.y0, rect.y1), (rect.x1, rect.y0, rect.y1)]
+            elif item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1:
+                    horizontal.append((p1.y, min(p1.x, p2.x), max(p1.x, p2.x)))
+                elif abs(p1.x - p2.x) < 1:
+                    vertical.append((p1.x, min(p1.y, p2.y), max(p1.y, p2.y)))
+
+    horizontal, vertical = _merge_rules(horizontal), _merge_rules(vertical)
+    if len(horizontal) < 2 or len(vertical) < 2 or len(horizontal) + len(vertical) < 2 + MIN_TABLE_RULES:
+        return False
+    return (any(_crossings(rule, vertical) >= MIN_TABLE_RULES for rule in horizontal)
+            or any(_crossings(rule, horizontal) >= MIN_TABLE_RULES for rule in vertical))
+
+
+def page_quality(page: "fitz.Page") -> Dict[str, Any]:
+    """頁面文字層品質指標"""
+    rect = page.rect
+    area = max(rect.width * rect.height, 1.0)
+    text = page.get_text("text")
+    chars = sum(1 for ch in text if not ch.isspace())
+
+    image_area = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & rect
+        if not bbox.is_empty:
+            image_area += bbox.width * bbox.height
+
+    garbled = sum(len(match) for match in _GARBLED.findall(text))
+    return {
+        "chars": chars,
+        "text_density": chars / (area / 1000),
+        "image_coverage": min(image_area / area, 1.0),
+        "garbled_ratio": garbled / chars if chars else 0.0,
+        "has_table": page_may_have_table(page),
+    }
+
+
+def needs_hi_res(quality: Dict[str, Any]) -> bool:
+    """文字層不可用或可能有表格的頁面需要 hi_res"""
+    return (quality["chars"] < MIN_PAGE_CHARS
+            or quality["text_density"] < MIN_TEXT_DENSITY
+            or quality["image_coverage"] > MAX_IMAGE_COVERAGE
+            or quality["garbled_ratio"] > MAX_GARBLED_RATIO
+            or quality["has_table"])
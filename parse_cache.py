@@ -0,0 +1,120 @@
+"""
+PDF 解析快取
+以「檔案內容雜湊 + 解析器類型 + 解析選項」為鍵，把解析結果存成 gzip 壓縮的 pickle 紀錄串流，
+只改分塊參數（chunk_size / overlap）重跑時可直接載入，不必重新解析
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# 預設快取目錄
+DEFAULT_CACHE_DIR = "data/parse_cache"
+# 快取格式版本（解析結果結構變更時遞增，舊快取自動失效）
+CACHE_VERSION = 1
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _CacheWriter:
+    """逐筆寫入暫存檔，區塊正常結束才換成正式快取檔（中途中斷則捨棄）"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        self._file = None
+        self.count = 0
+
+    def __enter__(self):
+        self._file = gzip.open(self.tmp_path, 'wb', compresslevel=6)
+        return self
+
+    def write(self, record: Any):
+        pickle.dump(record, self._file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.count += 1
+
+    def __exit__(self, exc_type, exc, tb):
+        self._file.close()
+        if exc_type is None:
+            os.replace(self.tmp_path, self.path)
+        else:
+            self.tmp_path.unlink(missing_ok=True)
+        return False
+
+
+class ParseCache:
+    """
+    內容定址的解析快取
+    - key(): 由檔案 SHA-256、解析器類型與選項算出快取鍵（同一檔案的雜湊只計算一次）
+    - iter_records() / load(): 讀取快取，未命中回傳 None
+    - writer() / store(): 寫入快取
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._digests = {}
+
+    def _file_digest(self, path: str) -> str:
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(memo_key)
+        if digest is None:
+            digest = file_sha256(path)
+            self._digests[memo_key] = digest
+        return digest
+
+    def key(self, path: str, parser: str, **options) -> str:
+        payload = json.dumps({
+            "version": CACHE_VERSION,
+            "file": self._file_digest(path),
+            "parser": parser,
+            "options": options,
+        }, sort_keys=True, ensure_ascii=False, default=list)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.pkl.gz"
+
+    def iter_records(self, key: str) -> Optional[Iterator[Any]]:
+        """逐筆讀出快取紀錄（串流，不一次載入全部）；未命中回傳 None"""
+        path = self._path(key)
+        if not path.exists():
+            return None
+
+        def records():
+            with gzip.open(path, 'rb') as f:
+                while True:
+                    try:
+                        yield pickle.load(f)
+                    except EOFError:
+                        return
+
+        return records()
+
+    def load(self, key: str) -> Optional[List[Any]]:
+        records = self.iter_records(key)
+        return list(records) if records is not None else None
+
+    def writer(self, key: str) -> _CacheWriter:
+        return _CacheWriter(self._path(key))
+
+    def store(self, key: str, records: Iterable[Any]) -> int:
+        with self.writer(key) as writer:
+            for record in records:
+                writer.write(record)
+        return writer.count
+
+    def stats(self) -> Dict[str, int]:
+        files = list(self.cache_dir.glob("*.pkl.gz"))
+        return {"entries": len(files), "bytes": sum(f.stat().st_size for f in files)}
@@ -6,66 +6,186 @@
 import fitz  # PyMuPDF
 import pdfplumber
 import json
-from typing import List, Dict, Any
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple, Union
 from pathlib import Path
 
+from chunking import SentenceChunker
+from embedding_cache import default_embedder
+from page_quality import page_may_have_table
+from parse_cache import ParseCache
+from tokenizer import Tokenizer
+from vector_index import VectorIndex, index_dir_for
+
+
+# 多行程模式下每個工作單位的頁數上限（越小負載越平均，越大開檔成本越低）
+PAGES_PER_TASK = 32
+
+# 向量索引子目錄名稱（與 rag_solution2 分開，兩者以同一個 PDF 路徑為來源）
+VECTOR_INDEX_NAME = "pymupdf_pdfplumber"
+
+
+def _parse_page_range(pdf_path: str, skip_tableless_pages: bool,
+                      start: int, end: int) -> Tuple[List[tuple], Dict[str, int]]:
+    """工作行程：自行開啟 PDF，解析 [start, end) 頁"""
+    parser = PDFParser(pdf_path, skip_tableless_pages=skip_tableless_pages)
+    pages = list(parser._iter_pages(start=start, end=end))
+    return pages, parser.table_scan_stats
+
 
 class PDFParser:
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, skip_tableless_pages: bool = True, workers: int = 1,
+                 cache: Optional[ParseCache] = None):
+        """
+        skip_tableless_pages: 先以 PyMuPDF 判斷頁面有沒有格線，沒有的頁面不呼叫 pdfplumber.extract_tables
+        workers: 大於 1 時把頁面範圍分給多個行程平行解析，結果依頁序合併
+        cache: 選用的解析快取，同一檔案、同樣選項再次解析時直接載入
+        """
         self.pdf_path = pdf_path
+        self.skip_tableless_pages = skip_tableless_pages
+        self.workers = workers
+        self.cache = cache
+        self.cache_hit = False
         self.documents = []
+        self.table_scan_stats = {"scanned": 0, "skipped": 0}
+
+    def _text_document(self, page_num: int, text: str, total_pages: int) -> Dict[str, Any]:
+        return {
+            "page": page_num + 1,
+            "content": text,
+            "content_type": "text",
+            "metadata": {
+                "source": self.pdf_path,
+                "page": page_num + 1,
+                "total_pages": total_pages
+            }
+        }
 
-    def extract_text_with_pymupdf(self) -> List[Dict[str, Any]]:
-        """使用 PyMuPDF 快速提取文本"""
-        doc = fitz.open(self.pdf_path)
-        text_documents = []
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
+    def _table_documents(self, page_num: int, tables: List[List[List[str]]]) -> List[Dict[str, Any]]:
+        table_documents = []
+        for table_idx, table in enumerate(tables or []):
+            # 將表格轉換為文本格式
+            table_text = self._table_to_text(table)
 
-            # 提取元數據
-            text_documents.append({
+            table_documents.append({
                 "page": page_num + 1,
-                "content": text,
-                "content_type": "text",
+                "content": table_text,
+                "content_type": "table",
+                "table_data": table,
                 "metadata": {
                     "source": self.pdf_path,
                     "page": page_num + 1,
-                    "total_pages": len(doc)
+                    "table_index": table_idx,
+                    "doc_type": "technical_specification"
                 }
             })
+        return table_documents
 
-        doc.close()
-        return text_documents
-
-    def extract_tables_with_pdfplumber(self) -> List[Dict[str, Any]]:
-        """使用 pdfplumber 提取表格"""
-        table_documents = []
+    def _iter_pages(self, extract_text: bool = True, extract_tables: bool = True,
+                    start: int = 0, end: int = None) -> Iterator[tuple]:
+        """
+        單一迴圈逐頁處理：PyMuPDF 提取文本並判斷是否可能有表格，
+        只有可能有表格的頁面才交給 pdfplumber（第一次需要時才開啟，且只載入 [start, end) 範圍的頁面）
+        產生 (文本文檔或 None, 表格文檔清單)，可限定頁面範圍 [start, end)
+        """
+        plumber = None
+        try:
+            with fitz.open(self.pdf_path) as doc:
+                total_pages = len(doc)
+                end = total_pages if end is None else min(end, total_pages)
+                for page_num in range(start, end):
+                    page = doc[page_num]
+                    text_doc = self._text_document(page_num, page.get_text(), total_pages) if extract_text else None
+
+                    table_docs = []
+                    if extract_tables:
+                        if self.skip_tableless_pages and not page_may_have_table(page):
+                            self.table_scan_stats["skipped"] += 1
+                        else:
+                            if plumber is None:
+                                # pages 為 1 起算的頁碼；plumber.pages 只含這個範圍，索引從 start 開始算
+                                plumber = pdfplumber.open(self.pdf_path, pages=range(start + 1, end + 1))
+                            plumber_page = plumber.pages[page_num - start]
+                            table_docs = self._table_documents(page_num, plumber_page.extract_tables())
+                            plumber_page.close()
+                            self.table_scan_stats["scanned"] += 1
+
+                    yield text_doc, table_docs
+        finally:
+            if plumber is not None:
+                plumber.close()
+
+    def _iter_pages_parallel(self) -> Iterator[tuple]:
+        """
+        多行程版 _iter_pages：頁面切成多個範圍交給行程池，每個行程自行開檔，
+        依頁序產生結果；同時在途的範圍數有上限，記憶體不隨頁數成長
+        """
+        with fitz.open(self.pdf_path) as doc:
+            total_pages = len(doc)
+
+        pages_per_task = max(1, min(PAGES_PER_TASK, -(-total_pages // self.workers)))
+        ranges = [(start, min(start + pages_per_task, total_pages))
+                  for start in range(0, total_pages, pages_per_task)]
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = []
+            next_range = 0
+            while next_range < len(ranges) or in_flight:
+                while next_range < len(ranges) and len(in_flight) < self.workers * 2:
+                    start, end = ranges[next_range]
+                    in_flight.append(pool.submit(_parse_page_range, self.pdf_path,
+                                                 self.skip_tableless_pages, start, end))
+                    next_range += 1
+
+                pages, stats = in_flight.pop(0).result()
+                for key, value in stats.items():
+                    self.table_scan_stats[key] += value
+                yield from pages
+
+    def _pages(self) -> Iterator[tuple]:
+        """
+        逐頁產生 (文本文檔, 表格文檔清單)：有快取時直接讀出，
+        否則實際解析並同時寫入快取（中途停止讀取則不寫入）
+        """
+        pages = self._iter_pages_parallel() if self.workers > 1 else self._iter_pages()
+        if self.cache is None:
+            yield from pages
+            return
+
+        key = self.cache.key(self.pdf_path, type(self).__name__,
+                             skip_tableless_pages=self.skip_tableless_pages)
+        cached = self.cache.iter_records(key)
+        if cached is not None:
+            self.cache_hit = True
+            for text_doc, table_docs in cached:
+                # 內容相同但路徑不同的檔案共用快取，來源改為目前的路徑
+                for doc in (text_doc, *table_docs):
+                    doc["metadata"]["source"] = self.pdf_path
+                yield text_doc, table_docs
+            return
+
+        with self.cache.writer(key) as writer:
+            for page in pages:
+                writer.write(page)
+                yield page
 
-        with pdfplumber.open(self.pdf_path) as pdf:
-            for page_num, page in enumerate(pdf.pages):
-                tables = page.extract_tables()
-
-                if tables:
-                    for table_idx, table in enumerate(tables):
-                        # 將表格轉換為文本格式
-                        table_text = self._table_to_text(table)
-
-                        table_documents.append({
-                            "page": page_num + 1,
-                            "content": table_text,
-                            "content_type": "table",
-                            "table_data": table,
-                            "metadata": {
-                                "source": self.pdf_path,
-                                "page": page_num + 1,
-                                "table_index": table_idx,
-                                "doc_type": "technical_specification"
-                            }
-                        })
+    def extract_text_with_pymupdf(self) -> List[Dict[str, Any]]:
+        """使用 PyMuPDF 快速提取文本"""
+        return [text_doc for text_doc, _ in self._iter_pages(extract_tables=False)]
 
-        return table_documents
+    def extract_tables_with_pdfplumber(self) -> List[Dict[str, Any]]:
+        """使用 pdfplumber 提取表格（略過沒有格線的頁面）"""
+        return [table_doc for _, table_docs in self._iter_pages(extract_text=False) for table_doc in table_docs]
+
+    def iter_documents(self) -> Iterator[Dict[str, Any]]:
+        """
+        串流解析：逐頁產生該頁的文本與表格文檔
+        不保留在 self.documents，記憶體用量與頁數無關
+        """
+        for text_doc, table_docs in self._pages():
+            yield text_doc
+            yield from table_docs
 
     def _table_to_text(self, table: List[List[str]]) -> str:
         """將表格轉換為易於檢索的文本格式"""
@@ -90,101 +210,129 @@ class PDFParser:
         """執行完整的解析流程"""
         print(f"開始解析 PDF: {self.pdf_path}")
 
-        # 提取文本
-        print("步驟 1: 使用 PyMuPDF 提取文本...")
-        text_docs = self.extract_text_with_pymupdf()
+        # 單次逐頁處理：PyMuPDF 提取文本，有格線的頁面再以 pdfplumber 提取表格
+        print("步驟 1: 使用 PyMuPDF 提取文本、pdfplumber 提取表格...")
+        text_docs = []
+        table_docs = []
+        for text_doc, page_tables in self._pages():
+            text_docs.append(text_doc)
+            table_docs.extend(page_tables)
         print(f"  提取了 {len(text_docs)} 頁文本")
-
-        # 提取表格
-        print("步驟 2: 使用 pdfplumber 提取表格...")
-        table_docs = self.extract_tables_with_pdfplumber()
-        print(f"  提取了 {len(table_docs)} 個表格")
+        if self.cache_hit:
+            print(f"  提取了 {len(table_docs)} 個表格（使用解析快取）")
+        else:
+            print(f"  提取了 {len(table_docs)} 個表格"
+                  f"（掃描 {self.table_scan_stats['scanned']} 頁，略過 {self.table_scan_stats['skipped']} 頁）")
 
         # 合併所有文檔
         self.documents = text_docs + table_docs
 
         return self.documents
 
+    def save_to_jsonl(self, output_path: str, documents: Iterable[Dict[str, Any]] = None) -> int:
+        """逐行寫入 JSON Lines（documents 可為串流），回傳寫入筆數"""
+        count = 0
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for doc in (documents if documents is not None else self.documents):
+                f.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                count += 1
+        print(f"結果已保存到: {output_path}")
+        return count
+
     def save_to_json(self, output_path: str):
         """保存解析結果為 JSON"""
         with open(output_path, 'w', encoding='utf-8') as f:
             json.dump(self.documents, f, ensure_ascii=False, indent=2)
         print(f"結果已保存到: {output_path}")
 
-    def prepare_for_rag(self, chunk_size: int = 1000, overlap: int = 200) -> List[Dict[str, Any]]:
-        """準備用於 RAG 的文檔塊"""
-        chunks = []
-
-        for doc in self.documents:
-            content = doc["content"]
-
-            # 對長文本進行分塊
-            if len(content) > chunk_size:
-                # 簡單的滑動窗口分塊
-                start = 0
-                while start < len(content):
-                    end = start + chunk_size
-                    chunk_text = content[start:end]
-
-                    chunks.append({
-                        "text": chunk_text,
-                        "metadata": {
-                            **doc["metadata"],
-                            "content_type": doc["content_type"],
-                            "chunk_start": start,
-                            "chunk_end": end
-                        }
-                    })
-
-                    start += chunk_size - overlap
-            else:
-                chunks.append({
-                    "text": content,
-                    "metadata": {
-                        **doc["metadata"],
-                        "content_type": doc["content_type"]
-                    }
-                })
-
-        return chunks
+    def prepare_for_rag(self, chunk_size: int = 1000, overlap: int = 200,
+                        cross_page: bool = True,
+                        tokenizer: Union[str, Tokenizer, None] = None) -> List[Dict[str, Any]]:
+        """
+        準備用於 RAG 的文檔塊
+        依句子邊界（表格依列）打包到 chunk_size 字，overlap 以完整句子為單位，
+        cross_page=True 時文本可跨頁接續成同一塊
+        tokenizer 指定時（例如 "auto"、"tiktoken"、"hf:<model>"）chunk_size / overlap 改以 token 計算
+        """
+        return list(SentenceChunker(chunk_size, overlap, cross_page, tokenizer).chunk(self.documents))
+
+    def iter_chunks(self, chunk_size: int = 1000, overlap: int = 200,
+                    documents: Iterable[Dict[str, Any]] = None,
+                    cross_page: bool = True,
+                    tokenizer: Union[str, Tokenizer, None] = None) -> Iterator[Dict[str, Any]]:
+        """串流分塊：逐頁解析並產生 RAG 塊（documents 未指定時使用 iter_documents）"""
+        chunker = SentenceChunker(chunk_size, overlap, cross_page, tokenizer)
+        yield from chunker.chunk(documents if documents is not None else self.iter_documents())
+
+    def stream_to_jsonl(self, documents_path: str, chunks_path: str,
+                        chunk_size: int = 1000, overlap: int = 200,
+                        tokenizer: Union[str, Tokenizer, None] = None) -> Dict[str, int]:
+        """
+        單次串流解析，同時把原始文檔與 RAG 塊逐行寫入 JSON Lines
+        回傳統計數字（頁數、表格數、塊數）；tokenizer 指定時 chunk_size / overlap 以 token 計算
+        """
+        stats = {"documents": 0, "text": 0, "table": 0, "chunks": 0}
+        chunker = SentenceChunker(chunk_size, overlap, tokenizer=tokenizer)
+
+        def write_chunks(chunks):
+            for chunk in chunks:
+                chunk_file.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+                stats["chunks"] += 1
+
+        with open(documents_path, 'w', encoding='utf-8') as doc_file, \
+                open(chunks_path, 'w', encoding='utf-8') as chunk_file:
+            for doc in self.iter_documents():
+                doc_file.write(json.dumps(doc, ensure_ascii=False) + "\n")
+                stats["documents"] += 1
+                stats[doc["content_type"]] += 1
+
+                write_chunks(chunker.feed(doc))
+            write_chunks(chunker.flush())
+
+        print(f"結果已保存到: {documents_path}, {chunks_path}")
+        return stats
 
 
 def main():
     # 設定 PDF 路徑
     pdf_path = "ysm20r.pdf"
 
-    # 創建解析器
-    parser = PDFParser(pdf_path)
-
-    # 解析 PDF
-    documents = parser.parse()
-
-    # 保存原始解析結果
-    parser.save_to_json("parsed_documents.json")
-
-    # 準備 RAG 分塊
-    print("\n步驟 3: 準備 RAG 文檔塊...")
-    rag_chunks = parser.prepare_for_rag(chunk_size=1000, overlap=200)
-    print(f"  生成了 {len(rag_chunks)} 個文檔塊")
+    # 創建解析器（解析結果快取，只改分塊參數重跑時不必重新解析）
+    parser = PDFParser(pdf_path, cache=ParseCache())
 
-    # 保存 RAG 分塊
-    with open("rag_chunks.json", 'w', encoding='utf-8') as f:
-        json.dump(rag_chunks, f, ensure_ascii=False, indent=2)
-    print(f"RAG 分塊已保存到: rag_chunks.json")
+    # 逐頁串流解析，原始文檔與 RAG 分塊同時寫入 JSON Lines
+    print(f"開始串流解析 PDF: {pdf_path}")
+    stats = parser.stream_to_jsonl("parsed_documents.jsonl", "rag_chunks.jsonl",
+                                   chunk_size=1000, overlap=200)
 
     # 顯示統計信息
     print("\n=== 解析統計 ===")
-    print(f"總文檔數: {len(documents)}")
-    print(f"文本頁數: {len([d for d in documents if d['content_type'] == 'text'])}")
-    print(f"表格數量: {len([d for d in documents if d['content_type'] == 'table'])}")
-    print(f"RAG 塊數: {len(rag_chunks)}")
+    print(f"總文檔數: {stats['documents']}")
+    print(f"文本頁數: {stats['text']}")
+    print(f"表格數量: {stats['table']}")
+    if parser.cache_hit:
+        print("表格掃描: 使用解析快取")
+    else:
+        print(f"表格掃描: {parser.table_scan_stats['scanned']} 頁，略過: {parser.table_scan_stats['skipped']} 頁")
+    print(f"RAG 塊數: {stats['chunks']}")
+
+    # 建立 / 更新向量索引（只嵌入內容有變的塊，刪除已不存在的塊）；嵌入快取與索引用完即關閉
+    with closing(default_embedder()) as embedder, \
+            closing(VectorIndex(index_dir_for(VECTOR_INDEX_NAME, embedder), embedder=embedder)) as index, \
+            open("rag_chunks.jsonl", 'r', encoding='utf-8') as f:
+        index_stats = index.upsert(json.loads(line) for line in f)
+    print(f"向量索引: 新嵌入 {index_stats['embedded']} 塊，沿用 {index_stats['reused']} 塊，"
+          f"刪除 {index_stats['deleted']} 塊，共 {index_stats['total']} 塊")
 
     # 顯示第一個文檔塊的示例
-    if rag_chunks:
+    with open("rag_chunks.jsonl", 'r', encoding='utf-8') as f:
+        first_line = f.readline()
+    if first_line:
+        first_chunk = json.loads(first_line)
         print("\n=== 第一個 RAG 塊示例 ===")
-        print(f"文本長度: {len(rag_chunks[0]['text'])}")
-        print(f"元數據: {rag_chunks[0]['metadata']}")
-        print(f"文本預覽: {rag_chunks[0]['text'][:200]}...")
+        print(f"文本長度: {len(first_chunk['text'])}")
+        print(f"元數據: {first_chunk['metadata']}")
+        print(f"文本預覽: {first_chunk['text'][:200]}...")
 
 
 if __name__ == "__main__":
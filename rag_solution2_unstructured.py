@@ -6,89 +6,304 @@
 
 from unstructured.partition.pdf import partition_pdf
 from unstructured.chunking.title import chunk_by_title
-from typing import List, Dict, Any
+from unstructured.staging.base import elements_to_dicts, elements_from_dicts
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contextlib import closing
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Optional, Tuple, Union
+import fitz  # PyMuPDF
+import hashlib
 import json
+import os
+import tempfile
 from pathlib import Path
 
+from chunking import SentenceChunker
+from element_store import ElementStore
+from embedding_cache import default_embedder
+from page_quality import (MAX_GARBLED_RATIO, MAX_IMAGE_COVERAGE, MIN_PAGE_CHARS, MIN_TEXT_DENSITY,
+                          needs_hi_res, page_quality)
+from parse_cache import ParseCache
+from tokenizer import Tokenizer
+from vector_index import VectorIndex, index_dir_for
+
+
+# hi_res 解析選項（整份 hi_res 與 hybrid 弱頁重跑共用）
+HI_RES_OPTIONS = {
+    "infer_table_structure": True,  # 推斷表格結構
+    "extract_images_in_pdf": False,  # 不提取圖像（加快速度）
+    "extract_image_block_types": ["Image", "Table"],
+    "extract_image_block_to_payload": False,
+    "languages": ["chi_tra", "eng"],  # 繁體中文和英文
+}
+# 分頁平行解析（hi_res / auto 與 hybrid 弱頁重跑）的行程數（hi_res 很吃記憶體，不宜太多）
+PARTITION_WORKERS = 2
+# 分頁平行解析時每個工作單位的頁數上限（限制每個行程的記憶體峰值）
+PARTITION_PAGES_PER_TASK = 8
+# hybrid 策略每個工作單位最多的連續頁數
+HI_RES_PAGES_PER_TASK = 4
+# 向量索引子目錄名稱（與 rag_solution1 分開，兩者以同一個 PDF 路徑為來源）
+VECTOR_INDEX_NAME = "unstructured"
+
+
+def _page_ranges(pages: List[int], max_pages: int) -> List[Tuple[int, int]]:
+    """把排序後的頁碼合併成連續區間 [first, last]，每段不超過 max_pages 頁"""
+    ranges = []
+    for page in pages:
+        if ranges and ranges[-1][1] == page - 1 and page - ranges[-1][0] < max_pages:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return [tuple(r) for r in ranges]
+
+
+def _partition_page_range(pdf_path: str, first_page: int, last_page: int,
+                          options: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """工作行程：把第 first_page~last_page 頁抽成暫存 PDF 後解析，回傳元素 dict（頁碼為原檔頁碼）"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        part_path = os.path.join(tmp_dir, f"pages_{first_page}_{last_page}.pdf")
+        with fitz.open(pdf_path) as source, fitz.open() as part:
+            part.insert_pdf(source, from_page=first_page - 1, to_page=last_page - 1)
+            part.save(part_path)
+        elements = partition_pdf(filename=part_path, starting_page_number=first_page, **options)
+        return elements_to_dicts(elements)
+
+
+def _renumber_elements(groups: Iterable[Tuple[Any, Dict[str, Any]]], pdf_path: str) -> List[Dict[str, Any]]:
+    """
+    合併多段解析結果：依合併後的順序重新產生 element_id，parent_id 在同一段內對應到新 id
+    （找不到父元素時移除），檔名改為原 PDF
+    groups: (段落鍵, 元素 dict)，不同段的舊 id 可能重複，因此以 (段落鍵, 舊 id) 對應
+    """
+    filename = os.path.basename(pdf_path)
+    directory = os.path.dirname(pdf_path) or None
+    mapping = {}
+    renumbered = []
+    for seq, (group, element) in enumerate(groups):
+        new_id = hashlib.sha256(f"{filename}|{seq}|{element.get('text', '')}".encode('utf-8')).hexdigest()[:32]
+        mapping[(group, element.get("element_id"))] = new_id
+        element["element_id"] = new_id
+        metadata = element.setdefault("metadata", {})
+        metadata["filename"] = filename
+        metadata["file_directory"] = directory
+        renumbered.append((group, element))
+
+    for group, element in renumbered:
+        parent_id = element["metadata"].get("parent_id")
+        if parent_id is not None:
+            if (group, parent_id) in mapping:
+                element["metadata"]["parent_id"] = mapping[(group, parent_id)]
+            else:
+                del element["metadata"]["parent_id"]
+    return [element for _, element in renumbered]
+
 
 class UnstructuredPDFParser:
-    def __init__(self, pdf_path: str):
+    def __init__(self, pdf_path: str, cache: Optional[ParseCache] = None, workers: int = PARTITION_WORKERS):
+        """
+        cache: 選用的解析快取，同一檔案、同樣選項（strategy / languages / infer_table_structure）
+               再次解析時直接載入元素，不重新執行 partition_pdf
+        workers: hi_res / auto 分頁平行解析與 hybrid 重跑 hi_res 的行程數（1 表示不平行）
+        """
         self.pdf_path = pdf_path
-        self.elements = []
+        self.cache = cache
+        self.cache_hit = False
+        self.workers = workers
+        self.hybrid_stats = {}
+        # 解析結果以欄位式儲存（文字緩衝區 + 位置陣列），類型統計、分塊、儲存共用
+        self.store = ElementStore()
         self.chunks = []
 
-    def parse(self, strategy: str = "hi_res") -> List[Any]:
+    @property
+    def elements(self) -> List[Any]:
+        """需要 unstructured Element 物件時（例如 chunk_by_title）才由 store 重建"""
+        return elements_from_dicts(list(self.store.iter_dicts()))
+
+    def _restore_source(self, elements: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """快取解析出的元素 dict，檔名改為目前的 PDF 路徑"""
+        for element in elements:
+            metadata = element.setdefault("metadata", {})
+            metadata["filename"] = os.path.basename(self.pdf_path)
+            metadata["file_directory"] = os.path.dirname(self.pdf_path) or None
+        return elements
+
+    def _cached_elements(self, compute: Callable[[], List[Dict[str, Any]]],
+                         **key_options) -> List[Dict[str, Any]]:
+        """執行 compute 取得元素 dict，結果存入 / 讀出解析快取"""
+        if self.cache is None:
+            return compute()
+
+        key = self.cache.key(self.pdf_path, type(self).__name__, **key_options)
+        cached = self.cache.load(key)
+        if cached is not None:
+            self.cache_hit = True
+            print("使用解析快取")
+            # 內容相同但路徑不同的檔案共用快取
+            return self._restore_source(cached)
+
+        elements = compute()
+        self.cache.store(key, elements)
+        return elements
+
+    def _partition_parallel(self, options: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        分頁平行解析：每 PARTITION_PAGES_PER_TASK 頁一段交給行程池，
+        同時在途的段數有上限，依頁序串接後重新編號元素 id
+        """
+        with fitz.open(self.pdf_path) as doc:
+            total_pages = len(doc)
+        ranges = [(first, min(first + PARTITION_PAGES_PER_TASK - 1, total_pages))
+                  for first in range(1, total_pages + 1, PARTITION_PAGES_PER_TASK)]
+        print(f"分頁平行解析: {total_pages} 頁分成 {len(ranges)} 段，{self.workers} 個行程")
+
+        groups = []
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            in_flight = []
+            next_range = 0
+            while next_range < len(ranges) or in_flight:
+                while next_range < len(ranges) and len(in_flight) < self.workers * 2:
+                    first, last = ranges[next_range]
+                    in_flight.append((first, pool.submit(_partition_page_range, self.pdf_path, first, last, options)))
+                    next_range += 1
+                first, future = in_flight.pop(0)
+                groups.extend((first, element) for element in future.result())
+
+        return _renumber_elements(groups, self.pdf_path)
+
+    def _should_split(self, strategy: str) -> bool:
+        """hi_res / auto 且頁數超過一段時才分頁平行解析（fast 本身夠快，不值得開行程）"""
+        if self.workers <= 1 or strategy not in ("hi_res", "auto"):
+            return False
+        with fitz.open(self.pdf_path) as doc:
+            return len(doc) > PARTITION_PAGES_PER_TASK
+
+    def _partition(self, **options) -> List[Dict[str, Any]]:
+        """執行 partition_pdf 並回傳元素 dict（經過解析快取，hi_res / auto 時分頁平行）"""
+        def compute():
+            if self._should_split(options.get("strategy")):
+                return self._partition_parallel(options)
+            return elements_to_dicts(partition_pdf(filename=self.pdf_path, **options))
+
+        return self._cached_elements(
+            compute,
+            strategy=options.get("strategy"),
+            languages=options.get("languages"),
+            infer_table_structure=options.get("infer_table_structure"),
+        )
+
+    def _parse_hybrid(self) -> List[Dict[str, Any]]:
         """
-        解析 PDF 文檔
+        hybrid 策略：先以 fast 解析全部頁面，再以 PyMuPDF 評估每頁文字層，
+        只把掃描頁、圖片為主、亂碼或可能有表格的頁面以 hi_res 在行程池中重跑，依頁序合併
+        某段 hi_res 失敗時該段保留 fast 結果
+        """
+        fast_elements = self._partition(strategy="fast")
+
+        with fitz.open(self.pdf_path) as doc:
+            total_pages = len(doc)
+            weak_pages = [page_num + 1 for page_num, page in enumerate(doc) if needs_hi_res(page_quality(page))]
+        ranges = _page_ranges(weak_pages, HI_RES_PAGES_PER_TASK)
+        self.hybrid_stats = {"pages": total_pages, "hi_res_pages": len(weak_pages), "failed_pages": 0}
+        print(f"hybrid: {total_pages} 頁中 {len(weak_pages)} 頁需要 hi_res")
+        if not ranges:
+            return fast_elements
+
+        hi_res_by_page = {}
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(ranges))) as pool:
+            futures = [(first, last, pool.submit(_partition_page_range, self.pdf_path, first, last,
+                                                 {"strategy": "hi_res", **HI_RES_OPTIONS}))
+                       for first, last in ranges]
+            for first, last, future in futures:
+                try:
+                    elements = future.result()
+                except Exception as e:
+                    print(f"第 {first}-{last} 頁 hi_res 解析失敗，保留 fast 結果: {e}")
+                    self.hybrid_stats["failed_pages"] += last - first + 1
+                    continue
+                for page in range(first, last + 1):
+                    hi_res_by_page[page] = []
+                for element in elements:
+                    page = element.get("metadata", {}).get("page_number") or first
+                    hi_res_by_page.setdefault(page, []).append((first, element))
+
+        # 依頁序合併：hi_res 成功的頁面用 hi_res 元素，其餘沿用 fast 元素（沒有頁碼的元素跟隨前一個元素的頁面）
+        fast_by_page = {}
+        page = 1
+        for element in fast_elements:
+            page = element.get("metadata", {}).get("page_number") or page
+            fast_by_page.setdefault(page, []).append(("fast", element))
+
+        merged = []
+        for page in sorted(set(fast_by_page) | set(hi_res_by_page)):
+            merged.extend(hi_res_by_page[page] if page in hi_res_by_page else fast_by_page[page])
+        return _renumber_elements(merged, self.pdf_path)
+
+    def _parse_hybrid_cached(self) -> List[Dict[str, Any]]:
+        return self._cached_elements(
+            self._parse_hybrid,
+            strategy="hybrid",
+            languages=HI_RES_OPTIONS["languages"],
+            infer_table_structure=HI_RES_OPTIONS["infer_table_structure"],
+            thresholds=[MIN_PAGE_CHARS, MIN_TEXT_DENSITY, MAX_IMAGE_COVERAGE, MAX_GARBLED_RATIO],
+        )
+
+    def parse(self, strategy: str = "hi_res") -> ElementStore:
+        """
+        解析 PDF 文檔，結果存入 self.store（欄位式元素儲存）並回傳
 
         參數:
             strategy: 解析策略
                 - "auto": 自動選擇
                 - "fast": 快速模式（僅文本）
                 - "hi_res": 高精度模式（包含 OCR，處理圖像）
+                - "hybrid": 全部頁面先用 fast，只有文字層不可用或可能有表格的頁面以 hi_res 重跑
         """
         print(f"開始解析 PDF: {self.pdf_path}")
         print(f"使用策略: {strategy}")
 
+        if strategy == "hybrid":
+            self.store = ElementStore.from_dicts(self._parse_hybrid_cached())
+            print(f"成功解析，提取了 {len(self.store)} 個元素")
+            return self.store
+
         try:
-            self.elements = partition_pdf(
-                filename=self.pdf_path,
-                strategy=strategy,
-                infer_table_structure=True,  # 推斷表格結構
-                extract_images_in_pdf=False,  # 不提取圖像（加快速度）
-                extract_image_block_types=["Image", "Table"],
-                extract_image_block_to_payload=False,
-                languages=["chi_tra", "eng"],  # 繁體中文和英文
-            )
+            self.store = ElementStore.from_dicts(self._partition(strategy=strategy, **HI_RES_OPTIONS))
 
-            print(f"成功解析，提取了 {len(self.elements)} 個元素")
-            return self.elements
+            print(f"成功解析，提取了 {len(self.store)} 個元素")
+            return self.store
 
         except Exception as e:
             print(f"解析時發生錯誤: {e}")
             print("嘗試使用 fast 策略...")
 
             # 降級到 fast 策略
-            self.elements = partition_pdf(
-                filename=self.pdf_path,
-                strategy="fast"
-            )
-            print(f"使用 fast 策略成功解析，提取了 {len(self.elements)} 個元素")
-            return self.elements
+            self.store = ElementStore.from_dicts(self._partition(strategy="fast"))
+            print(f"使用 fast 策略成功解析，提取了 {len(self.store)} 個元素")
+            return self.store
 
     def analyze_elements(self) -> Dict[str, int]:
         """分析文檔元素類型"""
-        element_types = {}
-
-        for element in self.elements:
-            element_type = type(element).__name__
-            element_types[element_type] = element_types.get(element_type, 0) + 1
-
-        return element_types
+        return self.store.type_counts()
 
     def convert_to_documents(self) -> List[Dict[str, Any]]:
-        """將元素轉換為文檔格式"""
-        documents = []
-
-        for idx, element in enumerate(self.elements):
-            doc = {
-                "id": idx,
-                "text": str(element),
-                "type": type(element).__name__,
-                "metadata": element.metadata.to_dict() if hasattr(element, 'metadata') else {}
-            }
-            documents.append(doc)
-
-        return documents
+        """將元素轉換為文檔格式（內部流程直接使用 self.store.iter_documents()，不建立完整清單）"""
+        return list(self.store.iter_documents())
 
     def chunk_documents(self,
                        max_characters: int = 1000,
                        new_after_n_chars: int = 800,
-                       overlap: int = 200) -> List[Dict[str, Any]]:
+                       overlap: int = 200,
+                       max_tokens: Optional[int] = None,
+                       overlap_tokens: int = 0,
+                       tokenizer: Union[str, Tokenizer, None] = "auto") -> List[Dict[str, Any]]:
         """
         使用智能分塊策略
         根據文檔標題結構進行分塊
+        max_tokens 指定時改以 token 數分塊（tokenizer 見 tokenizer.get_tokenizer）
         """
+        if max_tokens is not None:
+            return self._token_chunk(max_tokens, overlap_tokens, tokenizer)
+
         print("\n開始智能分塊...")
 
         try:
@@ -125,57 +340,102 @@ class UnstructuredPDFParser:
             # 降級到簡單分塊
             return self._simple_chunk(max_characters, overlap)
 
-    def _simple_chunk(self, chunk_size: int, overlap: int) -> List[Dict[str, Any]]:
-        """簡單的滑動窗口分塊"""
-        documents = self.convert_to_documents()
-        chunks = []
+    def _token_chunk(self, max_tokens: int, overlap_tokens: int,
+                     tokenizer: Union[str, Tokenizer, None]) -> List[Dict[str, Any]]:
+        """
+        以 token 數分塊：元素依句子（表格依列）切分後貪婪打包到 max_tokens，
+        遇到標題（Title）時開始新塊，與 chunk_by_title 的分段方式一致
+        """
+        print(f"\n開始 token 分塊（每塊上限 {max_tokens} tokens）...")
+        chunker = SentenceChunker(max_tokens, overlap_tokens, tokenizer=tokenizer)
+
+        documents = (
+            {
+                "page": doc["metadata"].get("page_number"),
+                "content": doc["text"],
+                "content_type": "table" if doc["type"] == "Table" else "text",
+                "new_section": doc["type"] == "Title",
+                "metadata": {**doc["metadata"], "source": self.pdf_path},
+            }
+            for doc in self.store.iter_documents()
+        )
 
-        current_chunk = ""
-        current_metadata = {}
-        chunk_id = 0
+        self.chunks = []
+        for idx, chunk in enumerate(chunker.chunk(documents)):
+            metadata = chunk["metadata"]
+            self.chunks.append({
+                "chunk_id": idx,
+                "text": chunk["text"],
+                "type": "Table" if metadata.pop("content_type") == "table" else "CompositeElement",
+                "metadata": {
+                    **metadata,
+                    "chunk_index": idx,
+                    "source": self.pdf_path
+                }
+            })
 
-        for doc in documents:
-            text = doc["text"]
+        print(f"生成了 {len(self.chunks)} 個 token 塊（tokenizer: {chunker.tokenizer.name}）")
+        return self.chunks
 
-            if len(current_chunk) + len(text) <= chunk_size:
-                current_chunk += text + "\n"
-                current_metadata.update(doc["metadata"])
-            else:
-                if current_chunk:
-                    chunks.append({
-                        "chunk_id": chunk_id,
-                        "text": current_chunk.strip(),
-                        "metadata": {
-                            **current_metadata,
-                            "chunk_index": chunk_id,
-                            "source": self.pdf_path
-                        }
-                    })
-                    chunk_id += 1
-
-                current_chunk = text + "\n"
-                current_metadata = doc["metadata"].copy()
+    def _iter_simple_chunks(self, documents: Iterable[Dict[str, Any]], chunk_size: int,
+                            overlap: int) -> Iterator[Dict[str, Any]]:
+        """
+        滑動窗口分塊（逐塊產生）
+        元素依序打包到 chunk_size（每個元素另計一個換行），文字先收集在 deque、輸出時才 join，整體為線性時間
+        overlap：上一塊尾端總長不超過 overlap 的完整元素帶到下一塊
+        元數據取塊內第一個元素，page_number / page_end 為塊涵蓋的頁碼範圍
+        """
+        pending = deque()  # (文字, 元數據)
+        length = 0
+        chunk_id = 0
 
-        # 添加最後一個塊
-        if current_chunk:
-            chunks.append({
+        def emit():
+            pages = [metadata["page_number"] for _, metadata in pending
+                     if metadata.get("page_number") is not None]
+            return {
                 "chunk_id": chunk_id,
-                "text": current_chunk.strip(),
+                "text": "\n".join(text for text, _ in pending).strip(),
                 "metadata": {
-                    **current_metadata,
+                    **pending[0][1],
+                    "page_number": min(pages) if pages else None,
+                    "page_end": max(pages) if pages else None,
                     "chunk_index": chunk_id,
                     "source": self.pdf_path
                 }
-            })
+            }
+
+        for doc in documents:
+            text = doc["text"]
+            if not text.strip():
+                continue
+
+            if pending and length + len(text) > chunk_size:
+                yield emit()
+                chunk_id += 1
+                # 只保留重疊部分，且必須騰出放入目前元素的空間（確保前進）
+                while pending and (length > overlap or length + len(text) > chunk_size):
+                    length -= len(pending.popleft()[0]) + 1
 
-        self.chunks = chunks
-        return chunks
+            pending.append((text, doc["metadata"]))
+            length += len(text) + 1
+
+        # 添加最後一個塊
+        if pending:
+            yield emit()
+
+    def _simple_chunk(self, chunk_size: int, overlap: int) -> List[Dict[str, Any]]:
+        """簡單的滑動窗口分塊"""
+        self.chunks = list(self._iter_simple_chunks(self.store.iter_documents(), chunk_size, overlap))
+        return self.chunks
 
     def save_elements(self, output_path: str):
-        """保存原始元素"""
-        documents = self.convert_to_documents()
+        """保存原始元素（逐筆寫出，輸出與 json.dump(..., indent=2) 相同）"""
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(documents, f, ensure_ascii=False, indent=2)
+            f.write("[")
+            for idx, doc in enumerate(self.store.iter_documents()):
+                f.write(("," if idx else "") + "\n  " +
+                        json.dumps(doc, ensure_ascii=False, indent=2).replace("\n", "\n  "))
+            f.write("\n]" if len(self.store) else "]")
         print(f"原始元素已保存到: {output_path}")
 
     def save_chunks(self, output_path: str):
@@ -189,11 +449,11 @@ def main():
     # 設定 PDF 路徑
     pdf_path = "ysm20r.pdf"
 
-    # 創建解析器
-    parser = UnstructuredPDFParser(pdf_path)
+    # 創建解析器（解析結果快取，只改分塊參數重跑時不必重新解析）
+    parser = UnstructuredPDFParser(pdf_path, cache=ParseCache())
 
-    # 解析 PDF（使用 fast 策略以加快速度，如需更高精度可改為 "hi_res"）
-    elements = parser.parse(strategy="fast")
+    # 解析 PDF（hybrid：文字層完好的頁面用 fast，掃描頁 / 表格頁才用 hi_res；全部高精度可改為 "hi_res"）
+    store = parser.parse(strategy="hybrid")
 
     # 分析元素類型
     print("\n=== 文檔元素類型統計 ===")
@@ -218,9 +478,16 @@ def main():
 
     # 顯示統計信息
     print("\n=== 解析統計 ===")
-    print(f"總元素數: {len(elements)}")
+    print(f"總元素數: {len(store)}")
     print(f"RAG 塊數: {len(chunks)}")
 
+    # 建立 / 更新向量索引（只嵌入內容有變的塊，刪除已不存在的塊）；嵌入快取與索引用完即關閉
+    with closing(default_embedder()) as embedder, \
+            closing(VectorIndex(index_dir_for(VECTOR_INDEX_NAME, embedder), embedder=embedder)) as index:
+        index_stats = index.upsert(chunks, source=pdf_path)
+    print(f"向量索引: 新嵌入 {index_stats['embedded']} 塊，沿用 {index_stats['reused']} 塊，"
+          f"刪除 {index_stats['deleted']} 塊，共 {index_stats['total']} 塊")
+
     # 顯示第一個塊的示例
     if chunks:
         print("\n=== 第一個 RAG 塊示例 ===")
@@ -232,12 +499,12 @@ def main():
     # 顯示不同類型元素的示例
     print("\n=== 元素類型示例 ===")
     shown_types = set()
-    for element in elements[:50]:  # 只檢查前50個元素
-        elem_type = type(element).__name__
+    for idx in range(min(50, len(store))):  # 只檢查前50個元素
+        elem_type = store.type_name(idx)
         if elem_type not in shown_types:
             shown_types.add(elem_type)
             print(f"\n{elem_type}:")
-            print(f"  {str(element)[:100]}...")
+            print(f"  {store.text(idx)[:100]}...")
             if len(shown_types) >= 5:  # 只顯示前5種類型
                 break
 
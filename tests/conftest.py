@@ -0,0 +1,43 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+class RecordingTranslator:
+    """記錄每次請求的假翻譯器：逐行加上 EN[...]，可指定含某些文字時失敗"""
+
+    def __init__(self, fail_on=()):
+        self.requests = []
+        self.fail_on = fail_on
+        self._lock = threading.Lock()
+
+    def translate(self, text):
+        with self._lock:
+            self.requests.append(text)
+        if any(bad in text for bad in self.fail_on):
+            raise RuntimeError(f"fail: {text}")
+        return '\n'.join(f"EN[{line}]" for line in text.split('\n'))
+
+    def lines(self):
+        """所有請求中送出的各行（批次以換行分隔）"""
+        with self._lock:
+            return [line for text in self.requests for line in text.split('\n')]
+
+
+@pytest.fixture
+def recorder():
+    return RecordingTranslator()
+
+
+@pytest.fixture
+def tdt(monkeypatch, tmp_path):
+    """translate_deep_translator：停用翻譯記憶庫與固定對照表，不讀寫 data/"""
+    pytest.importorskip("deep_translator")
+    import translate_deep_translator
+    monkeypatch.setattr(translate_deep_translator, "TRANSLATION_MEMORY_PATH", None)
+    monkeypatch.setattr(translate_deep_translator, "FIXED_MAP_PATH", tmp_path / "fixed_translation.json")
+    return translate_deep_translator
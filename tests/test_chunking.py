@@ -0,0 +1,79 @@
+from chunking import SentenceChunker, sentence_spans
+
+SENTENCES = [f"第{i}句說明設備的保養步驟與注意事項。" for i in range(30)]
+
+
+def text_doc(content, page, source="manual.pdf", **extra):
+    return {"page": page, "content": content, "content_type": "text",
+            "metadata": {"source": source, "page": page}, **extra}
+
+
+def test_sentence_spans_split_on_sentence_ends():
+    text = "  第一句。第二句！  第三句？\n\n最後一段沒有標點"
+
+    spans = [text[start:end] for start, end in sentence_spans(text, 100)]
+
+    assert spans == ["第一句。", "第二句！", "第三句？", "最後一段沒有標點"]
+    long_sentence = "甲" * 25  # 沒有標點、超過上限時硬切
+    assert [long_sentence[s:e] for s, e in sentence_spans(long_sentence, 10)] == ["甲" * 10, "甲" * 10, "甲" * 5]
+
+
+def test_chunks_end_on_sentence_boundaries_within_size():
+    doc = text_doc("".join(SENTENCES), 1)
+
+    chunks = list(SentenceChunker(chunk_size=100, overlap=0).chunk([doc]))
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert len(chunk["text"]) <= 100
+        assert chunk["text"].endswith("。")
+        meta = chunk["metadata"]
+        assert doc["content"][meta["chunk_start"]:meta["chunk_end"]] == chunk["text"]
+    # 沒有重疊時各塊首尾相接，涵蓋全文
+    assert "".join(chunk["text"] for chunk in chunks) == doc["content"]
+
+
+def test_overlap_carries_whole_trailing_sentences():
+    sentence = len(SENTENCES[0])
+    chunks = list(SentenceChunker(chunk_size=100, overlap=sentence * 2).chunk([text_doc("".join(SENTENCES), 1)]))
+
+    for previous, current in zip(chunks, chunks[1:]):
+        previous_sentences = [s + "。" for s in previous["text"].split("。") if s]
+        current_sentences = [s + "。" for s in current["text"].split("。") if s]
+        shared = [s for s in previous_sentences if s in current_sentences]
+        assert 1 <= len(shared) <= 2
+        assert previous_sentences[-len(shared):] == current_sentences[:len(shared)]
+
+
+def test_text_continues_across_pages_but_not_sources():
+    docs = [text_doc("第一頁的最後一句。", 1), text_doc("第二頁的第一句。", 2),
+            text_doc("另一份文件。", 1, source="other.pdf")]
+
+    chunks = list(SentenceChunker(chunk_size=100, overlap=0).chunk(docs))
+
+    assert [chunk["text"] for chunk in chunks] == ["第一頁的最後一句。\n第二頁的第一句。", "另一份文件。"]
+    assert (chunks[0]["metadata"]["page"], chunks[0]["metadata"]["page_end"]) == (1, 2)
+    assert chunks[1]["metadata"]["source"] == "other.pdf"
+
+
+def test_table_rows_are_chunked_separately():
+    table = {"page": 3, "content": "項目 | 狀態\n閥門 | 開\n幫浦 | 關", "content_type": "table",
+             "metadata": {"source": "manual.pdf", "page": 3}}
+    docs = [text_doc("前言。", 3), table, text_doc("後記。", 3)]
+
+    chunks = list(SentenceChunker(chunk_size=14, overlap=0).chunk(docs))
+
+    tables = [chunk["text"] for chunk in chunks if chunk["metadata"]["content_type"] == "table"]
+    assert tables == ["項目 | 狀態\n閥門 | 開", "幫浦 | 關"]
+    texts = [chunk["text"] for chunk in chunks if chunk["metadata"]["content_type"] == "text"]
+    assert texts == ["前言。\n後記。"]  # 表格不打斷文本的延續
+
+
+def test_token_mode_counts_tokens():
+    chunker = SentenceChunker(chunk_size=40, overlap=0, tokenizer="estimate")
+
+    chunks = list(chunker.chunk([text_doc("".join(SENTENCES), 1)]))
+
+    assert all(0 < chunk["metadata"]["tokens"] <= 40 for chunk in chunks)
+    assert chunker.tokenizer.count("".join(chunk["text"] for chunk in chunks)) == \
+        chunker.tokenizer.count("".join(SENTENCES))
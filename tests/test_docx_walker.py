@@ -0,0 +1,102 @@
+import copy
+from collections import Counter
+
+from docx import Document
+from docx.enum.section import WD_HEADER_FOOTER, WD_SECTION
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+from docx_walker import (BODY, CELL, HEADER_FOOTER, HEADER_FOOTER_CELL, TEXTBOX, DocumentWalker,
+                         iter_header_footers, walk_document)
+
+TEXTBOX_XML = (
+    f'<w:r {nsdecls("w")} xmlns:v="urn:schemas-microsoft-com:vml"><w:pict><v:shape><v:textbox><w:txbxContent>'
+    '<w:p><w:r><w:t>開始</w:t></w:r></w:p><w:p><w:r><w:t>結束</w:t></w:r></w:p>'
+    '</w:txbxContent></v:textbox></v:shape></w:pict></w:r>'
+)
+
+
+def make_document():
+    doc = Document()
+    doc.add_paragraph("第一段")
+    table = doc.add_table(rows=2, cols=3)
+    table.cell(0, 0).merge(table.cell(0, 1)).text = "合併"
+    table.cell(0, 2).text = "右上"
+    table.cell(1, 0).text = "左下"
+    doc.add_paragraph("流程圖")._p.append(parse_xml(TEXTBOX_XML))
+
+    first = doc.sections[0]
+    first.header.paragraphs[0].text = "公司名稱"
+    first.header.add_table(rows=1, cols=2, width=first.page_width).cell(0, 0).text = "文件編號"
+    first.different_first_page_header_footer = True
+    first.first_page_header.paragraphs[0].text = "封面頁首"
+
+    linked = doc.add_section(WD_SECTION.NEW_PAGE)  # 沿用前一節的頁首
+    doc.add_paragraph("第二節")
+    assert linked.header.is_linked_to_previous
+
+    unlinked = doc.add_section(WD_SECTION.NEW_PAGE)
+    unlinked.header.is_linked_to_previous = False
+    unlinked.header.paragraphs[0].text = "附錄頁首"
+    doc.add_paragraph("第三節")
+    return doc
+
+
+def texts_of(nodes, kind):
+    result = []
+    for node in nodes:
+        if node.kind != kind:
+            continue
+        if kind in (BODY, HEADER_FOOTER):
+            result.append(node.paragraph.text)
+        elif kind == TEXTBOX:
+            result.append("".join(t.text for t in node.element.iter() if t.tag.endswith("}t")))
+        else:
+            result.append(node.cell.text)
+    return result
+
+
+def test_walk_covers_every_node_kind():
+    doc = make_document()
+
+    nodes = walk_document(doc)
+
+    assert texts_of(nodes, BODY) == [p.text for p in doc.paragraphs]
+    assert [node.index for node in nodes if node.kind == BODY] == list(range(len(doc.paragraphs)))
+    # 水平合併的儲存格只有一個 w:tc
+    assert texts_of(nodes, CELL) == ["合併", "右上", "左下", "", ""]
+    # 未定義的頁尾、連結到前一節的頁首都不走訪
+    assert sorted(texts_of(nodes, HEADER_FOOTER)) == sorted(["公司名稱", "封面頁首", "附錄頁首"])
+    assert texts_of(nodes, HEADER_FOOTER_CELL) == ["文件編號", ""]
+    assert texts_of(nodes, TEXTBOX) == ["開始結束"]
+    # 文字框內的段落不當作正文段落
+    assert "開始" not in texts_of(nodes, BODY)
+
+
+def test_linked_and_shared_header_footers_are_visited_once():
+    doc = make_document()
+    # 第二節不連結，但直接引用第一節的頁首 part（同一個 rId）
+    first, second = doc.sections[0], doc.sections[1]
+    second._sectPr.insert(0, copy.deepcopy(first.header._sectPr.get_headerReference(WD_HEADER_FOOTER.PRIMARY)))
+    assert not second.header.is_linked_to_previous and second.header.part is first.header.part
+
+    parts = [hf.part for hf in iter_header_footers(doc)]
+
+    assert len(parts) == len({id(part) for part in parts})
+    texts = Counter(hf.paragraphs[0].text for hf in iter_header_footers(doc))
+    assert texts["公司名稱"] == 1 and texts["附錄頁首"] == 1 and texts["封面頁首"] == 1
+
+
+def test_walker_dispatches_stages_by_kind():
+    walker = DocumentWalker(make_document())
+    seen = []
+    events = []
+    walker.add_stage("collect", seen.append, kinds=(CELL, TEXTBOX),
+                     before=lambda: events.append("before"), after=lambda: events.append("after"))
+
+    timings = walker.run()
+
+    assert {node.kind for node in seen} == {CELL, TEXTBOX}
+    assert events == ["before", "after"]
+    assert set(timings) == {"walk", "collect"}
+    assert walker.stages == []
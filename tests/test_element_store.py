@@ -0,0 +1,39 @@
+from element_store import ElementStore
+
+ELEMENTS = [
+    {"type": "Title", "element_id": "e1", "text": "保養手冊", "metadata": {"page_number": 1, "filename": "m.pdf"}},
+    {"type": "NarrativeText", "element_id": "e2", "text": "每月檢查油壓。",
+     "metadata": {"page_number": 1, "filename": "m.pdf"}},
+    {"type": "Table", "element_id": "e3", "text": "項目 狀態", "metadata": {"page_number": 2, "filename": "m.pdf",
+                                                                          "text_as_html": "<table></table>"}},
+    {"type": "NarrativeText", "element_id": "e4", "text": "", "metadata": {}},
+    {"element_id": "e5", "text": None, "metadata": None},
+]
+
+
+def test_round_trip_preserves_elements():
+    store = ElementStore.from_dicts(ELEMENTS)
+
+    dicts = list(store.iter_dicts())
+
+    assert len(store) == len(ELEMENTS)
+    assert [d["text"] for d in dicts] == ["保養手冊", "每月檢查油壓。", "項目 狀態", "", ""]
+    assert [d["type"] for d in dicts] == ["Title", "NarrativeText", "Table", "NarrativeText", "Text"]
+    assert [d["element_id"] for d in dicts] == ["e1", "e2", "e3", "e4", "e5"]
+    assert [d["metadata"] for d in dicts[:4]] == [e["metadata"] for e in ELEMENTS[:4]]
+    assert dicts[4]["metadata"] == {}
+    assert ElementStore.from_dicts(dicts).stats() == store.stats()
+
+
+def test_shared_metadata_and_type_counts():
+    store = ElementStore.from_dicts(ELEMENTS)
+
+    assert store.stats() == {"elements": 5, "text_chars": len("保養手冊每月檢查油壓。項目 狀態"),
+                             "types": 4, "unique_metadata": 3}
+    assert store.type_counts() == {"Title": 1, "NarrativeText": 2, "Table": 1, "Text": 1}
+    assert store.metadata(0) is store.metadata(1)
+
+    # iter_documents 回傳的元數據是複本，修改不影響共用的 dict
+    document = next(store.iter_documents())
+    document["metadata"]["page_number"] = 99
+    assert store.metadata(1)["page_number"] == 1
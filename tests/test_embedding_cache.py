@@ -0,0 +1,59 @@
+import numpy as np
+
+from embedding_cache import CachedEmbedder, EmbeddingStore
+from vector_index import HashEmbedder
+
+
+class CountingEmbedder(HashEmbedder):
+    def __init__(self, dim=32):
+        super().__init__(dim)
+        self.batches = []
+        self.closed = False
+
+    def embed(self, texts):
+        self.batches.append(list(texts))
+        return super().embed(texts)
+
+    def close(self):
+        self.closed = True
+
+
+def test_hits_misses_and_duplicates(tmp_path):
+    inner = CountingEmbedder()
+    embedder = CachedEmbedder(inner, cache_dir=str(tmp_path), batch_size=2, concurrency=2)
+
+    first = embedder.embed(["液壓", "濾網", "液壓", "馬達", "電源"])
+
+    assert embedder.stats == {"requests": 2, "texts": 4, "cache_hits": 0, "duplicates": 1}
+    assert np.array_equal(first[0], first[2])
+    assert np.allclose(first, HashEmbedder(32).embed(["液壓", "濾網", "液壓", "馬達", "電源"]))
+
+    second = embedder.embed(["濾網", "新文字"])
+
+    assert embedder.stats == {"requests": 3, "texts": 5, "cache_hits": 1, "duplicates": 1}
+    assert inner.batches[-1] == ["新文字"]
+    assert np.array_equal(second[0], first[1])
+    embedder.close()
+    assert inner.closed
+
+
+def test_cache_persists_across_instances(tmp_path):
+    embedder = CachedEmbedder(CountingEmbedder(), cache_dir=str(tmp_path))
+    expected = embedder.embed(["液壓", "濾網"])
+    embedder.close()
+
+    inner = CountingEmbedder()
+    reopened = CachedEmbedder(inner, cache_dir=str(tmp_path))
+    assert np.array_equal(reopened.embed(["濾網", "液壓"]), expected[::-1])
+    assert inner.batches == [] and reopened.stats["cache_hits"] == 2
+    reopened.close()
+
+
+def test_store_grows_past_initial_capacity(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=4, initial_capacity=2)
+    vectors = {f"key{i}": np.full(4, i, dtype=np.float32) for i in range(5)}
+
+    store.put_many(vectors)
+
+    assert all(np.array_equal(store.get_many([key])[key], vector) for key, vector in vectors.items())
+    store.close()
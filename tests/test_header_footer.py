@@ -0,0 +1,59 @@
+from collections import Counter
+
+from docx import Document
+from docx.enum.section import WD_SECTION
+from docx.oxml.ns import qn
+
+SECTIONS = 12
+HEADER_TEXTS = ["台灣精密機械股份有限公司", "文件名稱", "機密文件 請勿外流"]
+
+
+def make_docx(path):
+    """每節都取消連結頁首頁尾，內容相同：公司名稱 + 兩格文字相同的表格，頁尾一行"""
+    doc = Document()
+    for s in range(SECTIONS):
+        section = doc.sections[0] if s == 0 else doc.add_section(WD_SECTION.NEW_PAGE)
+        doc.add_paragraph(f"第{s}章 操作說明")
+        section.header.is_linked_to_previous = False
+        section.footer.is_linked_to_previous = False
+        section.header.paragraphs[0].text = HEADER_TEXTS[0]
+        table = section.header.add_table(rows=1, cols=2, width=section.page_width - section.left_margin * 2)
+        table.cell(0, 0).text = HEADER_TEXTS[1]
+        table.cell(0, 1).text = HEADER_TEXTS[1]
+        section.footer.paragraphs[0].text = HEADER_TEXTS[2]
+    doc.save(path)
+
+
+def header_footer_texts(path):
+    doc = Document(path)
+    parts = [part for part in doc.part.package.parts if "/header" in str(part.partname) or "/footer" in str(part.partname)]
+    return [[node.text for node in part.element.iter(qn('w:t'))] for part in parts]
+
+
+def test_each_header_string_is_translated_once_across_sections(tdt, recorder, tmp_path):
+    source, output = tmp_path / "in.docx", tmp_path / "out.docx"
+    make_docx(source)
+
+    result = tdt.translate_document(str(source), str(output), backend_factory=lambda: recorder)
+
+    sent = Counter(recorder.lines())
+    assert {text: sent[text] for text in HEADER_TEXTS} == {text: 1 for text in HEADER_TEXTS}
+    assert result["requests"] == len(recorder.requests) == 1
+
+    # 每一節的頁首頁尾（包括表格內文字相同的兩格）都加上英文
+    parts = header_footer_texts(output)
+    assert len(parts) == 2 * SECTIONS
+    for texts in parts:
+        assert any(text.startswith("EN[") for text in texts)
+    headers = [texts for texts in parts if HEADER_TEXTS[0] in texts]
+    assert all(texts.count(f"EN[{HEADER_TEXTS[1]}]") == 2 for texts in headers)
+
+
+def test_staged_mode_matches(tdt, recorder, tmp_path):
+    source, output = tmp_path / "in.docx", tmp_path / "out.docx"
+    make_docx(source)
+
+    tdt.translate_document(str(source), str(output), backend_factory=lambda: recorder, pipelined=False)
+
+    sent = Counter(recorder.lines())
+    assert all(sent[text] == 1 for text in HEADER_TEXTS)
@@ -0,0 +1,76 @@
+import json
+
+import pytest
+from docx import Document
+
+from conftest import RecordingTranslator
+
+PARAGRAPHS = ["檢查油壓是否正常", "關閉主電源後再進行保養", "更換濾網並記錄日期", "確認安全門已經關閉"]
+
+
+def make_docx(path, paragraphs=PARAGRAPHS):
+    doc = Document()
+    for text in paragraphs:
+        doc.add_paragraph(text)
+    table = doc.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "項目"
+    table.cell(0, 1).text = "狀態"
+    doc.save(path)
+
+
+def run(tdt, source, output, use_asyncio):
+    backend = RecordingTranslator()
+    result = tdt.translate_document(str(source), str(output), backend_factory=lambda: backend,
+                                    use_asyncio=use_asyncio, incremental=True)
+    return result, backend
+
+
+def body_texts(path):
+    return [paragraph.text for paragraph in Document(str(path)).paragraphs if paragraph.text]
+
+
+@pytest.mark.parametrize("use_asyncio", [False, True])
+def test_unchanged_document_reuses_manifest(tdt, tmp_path, use_asyncio):
+    source, output = tmp_path / "in.docx", tmp_path / "out.docx"
+    make_docx(source)
+
+    first, _ = run(tdt, source, output, use_asyncio)
+    assert first["requests"] >= 1
+    first_output = body_texts(output)
+    manifest = json.loads(tdt.manifest_path_for(output).read_text(encoding="utf-8"))
+    assert len(manifest["nodes"]) == first["changed_nodes"] > 0
+
+    second, backend = run(tdt, source, output, use_asyncio)
+
+    assert second["changed_nodes"] == 0
+    assert second["requests"] == 0 and backend.requests == []
+    assert body_texts(output) == first_output
+
+
+@pytest.mark.parametrize("use_asyncio", [False, True])
+def test_edited_paragraph_is_the_only_change(tdt, tmp_path, use_asyncio):
+    source, output = tmp_path / "in.docx", tmp_path / "out.docx"
+    make_docx(source)
+    run(tdt, source, output, use_asyncio)
+
+    edited = PARAGRAPHS[:2] + ["更換濾網並記錄更換人員"] + PARAGRAPHS[3:]
+    make_docx(source, edited)
+    result, backend = run(tdt, source, output, use_asyncio)
+
+    assert result["changed_nodes"] == 1
+    assert backend.lines() == ["更換濾網並記錄更換人員"]
+    assert any("EN[更換濾網並記錄更換人員]" in text for text in body_texts(output))
+    assert any("EN[檢查油壓是否正常]" in text for text in body_texts(output))  # 未變更的節點沿用上次譯文
+
+
+def test_failed_node_is_retried_next_run(tdt, tmp_path):
+    source, output = tmp_path / "in.docx", tmp_path / "out.docx"
+    make_docx(source)
+    failing = RecordingTranslator(fail_on=("更換濾網",))
+    tdt.translate_document(str(source), str(output), backend_factory=lambda: failing, incremental=True)
+
+    # 翻譯失敗的節點不寫入指紋清單，下次重新翻譯
+    result, backend = run(tdt, source, output, use_asyncio=False)
+
+    assert result["changed_nodes"] == 1
+    assert backend.lines() == ["更換濾網並記錄日期"]
@@ -0,0 +1,51 @@
+import sys
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from page_quality import needs_hi_res, page_may_have_table, page_quality
+
+TEXT = "Check the pump pressure and confirm that every valve is closed before starting the machine. " * 12
+
+
+def text_page():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(72, 72, 523, 500), TEXT, fontsize=11)
+    return doc, page
+
+
+def test_framed_text_page_stays_on_fast_path():
+    doc, page = text_page()
+    page.draw_rect(page.rect + (20, 20, -20, -20))  # 頁框
+    highlight = fitz.Rect(60, 520, 535, 600)
+    page.draw_rect(highlight, color=None, fill=(1, 1, 0.8))  # 醒目提示框：填色 + 外框各畫一次
+    page.draw_rect(highlight)
+    page.draw_rect(fitz.Rect(60, 620, 200, 700))  # 另一個獨立的框
+
+    assert not page_may_have_table(page)
+    assert not needs_hi_res(page_quality(page))
+    doc.close()
+
+
+def test_ruled_grid_is_table():
+    doc, page = text_page()
+    for y in (520, 560, 600):
+        page.draw_line((72, y), (523, y))
+    for x in (72, 300, 523):
+        page.draw_line((x, 520), (x, 600))
+
+    assert page_may_have_table(page)
+    assert needs_hi_res(page_quality(page))
+    doc.close()
+
+
+def test_table_drawn_as_cell_rects_is_table():
+    doc, page = text_page()
+    page.draw_rect(fitz.Rect(72, 520, 300, 560))
+    page.draw_rect(fitz.Rect(300, 520, 523, 560))
+
+    assert page_may_have_table(page)
+    doc.close()
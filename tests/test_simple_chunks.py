@@ -0,0 +1,51 @@
+import pytest
+
+pytest.importorskip("unstructured")
+
+from element_store import ElementStore
+from rag_solution2_unstructured import UnstructuredPDFParser
+
+
+def element(text, page):
+    metadata = {"filename": "manual.pdf"}
+    if page is not None:
+        metadata["page_number"] = page
+    return {"type": "NarrativeText", "element_id": text, "text": text, "metadata": metadata}
+
+
+def simple_chunks(elements, chunk_size, overlap):
+    parser = UnstructuredPDFParser("manual.pdf")
+    parser.store = ElementStore.from_dicts(elements)
+    return list(parser._iter_simple_chunks(parser.store.iter_documents(), chunk_size, overlap))
+
+
+def test_page_range_covers_every_element_in_the_chunk():
+    elements = [element("甲" * 8, 1), element("乙" * 8, 2), element("丙" * 8, None), element("丁" * 8, 4),
+                element("戊" * 8, 4)]
+
+    chunks = simple_chunks(elements, chunk_size=20, overlap=0)
+
+    assert [chunk["text"] for chunk in chunks] == ["甲" * 8 + "\n" + "乙" * 8, "丙" * 8 + "\n" + "丁" * 8,
+                                                   "戊" * 8]
+    # 沒有頁碼的元素不影響頁碼範圍
+    assert [(c["metadata"]["page_number"], c["metadata"]["page_end"]) for c in chunks] == [(1, 2), (4, 4), (4, 4)]
+    assert [c["metadata"]["chunk_index"] for c in chunks] == [0, 1, 2]
+    assert all(c["metadata"]["source"] == "manual.pdf" for c in chunks)
+
+
+def test_chunk_without_page_numbers():
+    chunks = simple_chunks([element("甲" * 8, None)], chunk_size=20, overlap=0)
+
+    assert (chunks[0]["metadata"]["page_number"], chunks[0]["metadata"]["page_end"]) == (None, None)
+
+
+def test_overlap_keeps_trailing_elements_and_their_pages():
+    elements = [element(f"{i}" * 5, i) for i in range(1, 7)]
+
+    chunks = simple_chunks(elements, chunk_size=18, overlap=6)
+
+    for previous, current in zip(chunks, chunks[1:]):
+        assert current["text"].split("\n")[0] == previous["text"].split("\n")[-1]
+        assert current["metadata"]["page_number"] == previous["metadata"]["page_end"]
+    assert chunks[-1]["metadata"]["page_end"] == 6
+    assert all(len(chunk["text"]) <= 18 for chunk in chunks)
@@ -0,0 +1,54 @@
+from tokenizer import CachedTokenizer, EstimateTokenizer, Tokenizer, get_tokenizer
+
+
+class CountingTokenizer(Tokenizer):
+    """以字元數當作 token 數，記錄實際計算過的文字"""
+
+    name = "counting"
+
+    def __init__(self):
+        self.seen = []
+
+    def count_many(self, texts):
+        self.seen.extend(texts)
+        return [len(text) for text in texts]
+
+
+def test_cache_hits_skip_inner_tokenizer():
+    inner = CountingTokenizer()
+    cached = CachedTokenizer(inner, maxsize=10)
+
+    assert cached.count_many(["頁首", "第一句。", "頁首"]) == [2, 4, 2]
+    assert cached.count_many(["頁首", "第二句。"]) == [2, 4]
+
+    assert inner.seen == ["頁首", "第一句。", "第二句。"]
+
+
+def test_lru_evicts_least_recently_used():
+    inner = CountingTokenizer()
+    cached = CachedTokenizer(inner, maxsize=2)
+    cached.count_many(["甲", "乙"])
+    cached.count("甲")  # 甲變成最近使用
+
+    cached.count("丙")  # 淘汰乙
+    inner.seen.clear()
+    cached.count_many(["甲", "丙", "乙"])
+
+    assert inner.seen == ["乙"]
+    assert list(cached._cache) == ["丙", "乙"]
+
+
+def test_batch_larger_than_cache_is_counted_once():
+    inner = CountingTokenizer()
+    cached = CachedTokenizer(inner, maxsize=2)
+    texts = ["一", "二二", "三三三", "四四四四", "二二"]
+
+    assert cached.count_many(texts) == [1, 2, 3, 4, 2]
+    assert inner.seen == ["一", "二二", "三三三", "四四四四"]
+    assert len(cached._cache) == 2
+
+
+def test_named_tokenizers_are_shared():
+    assert get_tokenizer("estimate") is get_tokenizer("estimate")
+    assert get_tokenizer(None) is None
+    assert EstimateTokenizer().count("設備 maintenance") == 2 + 3
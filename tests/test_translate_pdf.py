@@ -0,0 +1,74 @@
+import fitz  # PyMuPDF
+import pytest
+from docx import Document
+
+pytest.importorskip("pdf2docx")
+pytest.importorskip("googletrans")
+
+import translate_pdf
+
+PAGES = 3
+
+
+def make_pdf(path):
+    doc = fitz.open()
+    for number in range(PAGES):
+        page = doc.new_page()
+        page.insert_text((72, 100), f"Chapter {number + 1} Maintenance", fontsize=16)
+        page.insert_textbox(fitz.Rect(72, 130, 523, 300),
+                            "Check the pump pressure before starting the machine. " * 4, fontsize=11)
+        for y in (340, 380, 420):
+            page.draw_line((72, y), (523, y))
+        for x in (72, 300, 523):
+            page.draw_line((x, 340), (x, 420))
+        page.insert_text((80, 365), "Valve", fontsize=11)
+        page.insert_text((308, 365), f"Open {number}", fontsize=11)
+    doc.save(str(path))
+
+
+def docx_texts(path):
+    paragraphs, cells = translate_pdf.collect_translatable(Document(str(path)))
+    return [paragraph.text for paragraph in paragraphs] + [cell.text for cell in cells]
+
+
+def convert(tmp_path, name):
+    source = tmp_path / "in.pdf"
+    if not source.exists():
+        make_pdf(source)
+    parts = []
+    page_times = translate_pdf.pdf_to_docx(str(source), str(tmp_path / name), workers=1, pages_per_part=1,
+                                           on_part=parts.append)
+    return page_times, parts, docx_texts(tmp_path / name)
+
+
+def test_parts_report_the_texts_of_the_merged_docx(tmp_path):
+    page_times, parts, texts = convert(tmp_path, "out.docx")
+
+    assert sorted(page_times) == list(range(1, PAGES + 1))
+    assert len(parts) == PAGES
+    assert sorted(text for part in parts for text in part) == sorted(texts)
+    assert any("Chapter 3" in text for text in texts)
+
+
+def test_falls_back_to_public_api_without_internals(tmp_path, monkeypatch):
+    _, _, expected = convert(tmp_path, "split.docx")
+    monkeypatch.setattr(translate_pdf, "RawPageFactory", None)
+
+    page_times, parts, texts = convert(tmp_path, "whole.docx")
+
+    assert page_times == {}
+    assert len(parts) == 1 and sorted(parts[0]) == sorted(texts)
+    assert sorted(texts) == sorted(expected)
+
+
+def test_convert_and_translate(tmp_path, recorder):
+    source = tmp_path / "in.pdf"
+    make_pdf(source)
+    output = tmp_path / "translated.docx"
+
+    translate_pdf.convert_and_translate(str(source), str(tmp_path / "temp.docx"), str(output), workers=1,
+                                        rate=1000, backend_factory=lambda: recorder)
+
+    texts = docx_texts(output)
+    assert texts and all(text.startswith("EN[") for text in texts)
+    assert len(recorder.requests) == len(set(recorder.requests))  # 已預先翻譯的文字不再送出
@@ -0,0 +1,222 @@
+import asyncio
+import random
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from conftest import RecordingTranslator
+from translation_engine import MAX_LENGTH, TranslationEngine, gather_futures, pack_batches
+
+
+def make_engine(backend, **kwargs):
+    return TranslationEngine(lambda: backend, rate=None, **kwargs)
+
+
+def test_prefetch_deduplicates_and_batches(recorder):
+    engine = make_engine(recorder)
+
+    engine.prefetch(["關閉閥門", "開啟電源", "關閉閥門", "", "檢查壓力"])
+
+    assert recorder.requests == ["關閉閥門\n開啟電源\n檢查壓力"]
+    assert engine.stats["texts"] == 3
+    assert engine.results["開啟電源"] == "EN[開啟電源]"
+
+    engine.prefetch(["開啟電源"])  # 已翻譯過的字串不再送出
+    assert len(recorder.requests) == 1
+
+
+def test_pack_batches_stays_within_limit():
+    rng = random.Random(0)
+    texts = ["字" * rng.randint(1, 900) for _ in range(200)]
+    texts += ["多行\n段落", "長" * (MAX_LENGTH + 10)]
+
+    batches = pack_batches(texts)
+
+    assert sorted(text for batch in batches for text in batch) == sorted(texts)  # 不遺漏、不重複
+    for batch in batches:
+        if len(batch) > 1:
+            assert len("\n".join(batch)) <= MAX_LENGTH
+            assert all("\n" not in text for text in batch)
+    assert ["多行\n段落"] in batches
+    assert ["長" * (MAX_LENGTH + 10)] in batches
+
+
+def test_multiline_text_is_sent_whole_by_default(recorder):
+    engine = make_engine(recorder)
+
+    engine.prefetch(["第一行\n第二行", "單行"])
+
+    assert sorted(recorder.requests) == ["單行", "第一行\n第二行"]
+    assert engine.results["第一行\n第二行"] == "EN[第一行]\nEN[第二行]"
+
+
+def test_split_lines_round_trip(recorder):
+    engine = make_engine(recorder, split_lines=True)
+    text = "  第一行 \n\n\t第二行\n第一行"
+
+    engine.prefetch([text, "單行"])
+
+    # 各行與其他字串共用一個批次，重複的行只送一次
+    assert recorder.requests == ["第一行\n第二行\n單行"]
+    assert engine.results[text] == "  EN[第一行] \n\n\tEN[第二行]\nEN[第一行]"
+
+
+def test_split_lines_keeps_source_when_a_line_fails():
+    backend = RecordingTranslator(fail_on=("第二行",))
+    engine = make_engine(backend, split_lines=True)
+
+    engine.prefetch(["第一行\n第二行", "單行"])
+
+    # 批次失敗後逐筆重試：失敗的行與其所在的多行字串都沒有譯文（寫回時保留原文）
+    assert engine.stats["fallbacks"] == 1
+    assert engine.results["第一行"] == "EN[第一行]"
+    assert "第二行" not in engine.results
+    assert "第一行\n第二行" not in engine.results
+
+
+def test_submit_many_completes_each_group(recorder):
+    engine = make_engine(recorder, split_lines=True)
+    try:
+        futures = engine.submit_many([["甲", "乙"], ["乙", "丙\n丁"], []])
+        for future in futures:
+            assert future.result(timeout=5) is None
+    finally:
+        engine.close()
+
+    assert sorted(line for text in recorder.requests for line in text.split("\n")) == ["丁", "丙", "乙", "甲"]
+    assert engine.results["丙\n丁"] == "EN[丙]\nEN[丁]"
+
+
+def test_submit_many_falls_back_to_single_texts():
+    backend = RecordingTranslator(fail_on=("壞",))
+    engine = make_engine(backend)
+    try:
+        future, = engine.submit_many([["好", "壞", "也好"]])
+        future.result(timeout=5)
+    finally:
+        engine.close()
+
+    assert engine.stats["fallbacks"] == 1
+    assert engine.results == {"好": "EN[好]", "也好": "EN[也好]"}
+
+
+def test_submit_waits_for_texts_already_in_flight():
+    release = threading.Event()
+
+    class Blocking:
+        def __init__(self):
+            self.requests = []
+
+        def translate(self, text):
+            self.requests.append(text)
+            release.wait(5)
+            return f"EN[{text}]"
+
+    backend = Blocking()
+    engine = make_engine(backend)
+    try:
+        first = engine.submit(["甲"])
+        second = engine.submit(["甲"])
+        assert not second.done()
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+    finally:
+        engine.close()
+
+    assert backend.requests == ["甲"]
+
+
+def test_gather_futures_propagates_failures():
+    ok, failed = Future(), Future()
+    gathered = gather_futures({ok, failed})
+    ok.set_result(None)
+    failed.set_exception(RuntimeError("batch failed"))
+    with pytest.raises(RuntimeError, match="batch failed"):
+        gathered.result(timeout=1)
+
+    def broken():
+        raise ValueError("join failed")
+
+    with pytest.raises(ValueError, match="join failed"):
+        gather_futures([], before_done=broken).result(timeout=1)
+
+    calls = []
+    gather_futures([], before_done=lambda: calls.append(1)).result(timeout=1)
+    assert calls == [1]
+
+
+class Flaky:
+    """前 failures 次請求失敗，之後成功的非同步翻譯器"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def atranslate(self, text):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise ConnectionError("temporary")
+        return f"EN[{text}]"
+
+
+def test_aprefetch_retries_failed_requests():
+    backend = Flaky(failures=2)
+    engine = make_engine(backend)
+
+    asyncio.run(engine.aprefetch(["關閉閥門"], retries=2, backoff=0))
+
+    assert engine.results["關閉閥門"] == "EN[關閉閥門]"
+    assert engine.stats["requests"] == 3
+
+
+def test_aprefetch_gives_up_after_retries():
+    backend = Flaky(failures=5)
+    engine = make_engine(backend)
+
+    asyncio.run(engine.aprefetch(["關閉閥門"], retries=1, backoff=0))
+
+    assert "關閉閥門" not in engine.results
+    assert engine.stats["requests"] == 2
+
+
+def test_async_detection_runs_once_without_a_loop_thread_instance():
+    created = []
+
+    def factory():
+        created.append(threading.current_thread())
+        return RecordingTranslator()
+
+    async def run(engine):
+        await engine.aprefetch(["甲"], backoff=0)
+        await engine.aprefetch(["乙"], backoff=0)
+        return threading.current_thread()
+
+    engine = make_engine(None)
+    engine.backend_factory = factory
+    loop_thread = asyncio.run(run(engine))
+
+    # 同步翻譯器只在工作執行緒建立，事件迴圈執行緒上不為了判斷而多建一個
+    assert engine._is_async is False
+    assert created and loop_thread not in created
+    assert engine.results == {"甲": "EN[甲]", "乙": "EN[乙]"}
+
+
+def test_async_detection_checks_the_class_without_instantiating():
+    instances = []
+
+    class AsyncBackend:
+        def __init__(self):
+            instances.append(self)
+
+        async def atranslate(self, text):
+            return "\n".join(f"EN[{line}]" for line in text.split("\n"))
+
+    engine = TranslationEngine(AsyncBackend, rate=None)
+    assert asyncio.run(engine._detect_async()) is True
+    assert instances == []
+
+    asyncio.run(engine.aprefetch(["甲", "乙"]))
+    assert len(instances) == 1
+    assert engine.results["乙"] == "EN[乙]"
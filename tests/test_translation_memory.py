@@ -0,0 +1,94 @@
+import sqlite3
+import time
+
+from translation_memory import TranslationMemory, normalize_text
+
+
+def actual_totals(path):
+    conn = sqlite3.connect(str(path))
+    row = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM tm').fetchone()
+    conn.close()
+    return row
+
+
+def assert_stats_consistent(tm):
+    stats = tm.stats()
+    assert (stats["entries"], stats["bytes"]) == actual_totals(tm.path)
+
+
+def test_get_many_hits_and_misses(tmp_path):
+    tm = TranslationMemory(tmp_path / "tm.db")
+    tm.put_many({"關閉閥門": "Close the valve", "開啟電源": "Turn on the power"})
+
+    found = tm.get_many(["關閉閥門", " 關閉閥門 ", "檢查壓力", ""])
+
+    # 正規化後相同的原文都命中，空字串不查詢
+    assert found == {"關閉閥門": "Close the valve", " 關閉閥門 ": "Close the valve"}
+    assert (tm.stats()["hits"], tm.stats()["misses"]) == (1, 1)
+    assert normalize_text("  Ａ  B ") == "A B"
+    tm.close()
+
+
+def test_stats_follow_overwrite_and_reopen(tmp_path):
+    path = tmp_path / "tm.db"
+    tm = TranslationMemory(path)
+    tm.put_many({f"第{i}項": f"Item {i}" for i in range(20)})
+    assert_stats_consistent(tm)
+
+    tm.put("第3項", "A much longer translation for item three")  # 覆寫只改變大小
+    assert tm.stats()["entries"] == 20
+    assert_stats_consistent(tm)
+    tm.close()
+
+    reopened = TranslationMemory(path)
+    assert_stats_consistent(reopened)
+    assert reopened.get("第3項") == "A much longer translation for item three"
+    reopened.close()
+
+
+def test_stats_seeded_for_existing_memory(tmp_path):
+    """沒有 tm_stats 的舊記憶庫第一次開啟時掃描一次補上計數"""
+    path = tmp_path / "tm.db"
+    tm = TranslationMemory(path)
+    tm.put_many({"甲": "A", "乙": "B", "丙": "C"})
+    tm.close()
+    conn = sqlite3.connect(str(path))
+    conn.executescript('DROP TRIGGER tm_stats_insert; DROP TRIGGER tm_stats_delete;'
+                       ' DROP TRIGGER tm_stats_update; DROP TABLE tm_stats;')
+    conn.close()
+
+    tm = TranslationMemory(path)
+    assert tm.stats()["entries"] == 3
+    assert_stats_consistent(tm)
+    tm.close()
+
+
+def test_evicts_least_recently_used_by_entries(tmp_path):
+    tm = TranslationMemory(tmp_path / "tm.db", max_entries=3)
+    for i in range(3):
+        tm.put(f"原文{i}", f"text {i}")
+        time.sleep(0.01)
+    tm.get("原文0")  # 最近使用過，不應被淘汰
+    time.sleep(0.01)
+
+    tm.put("原文3", "text 3")
+
+    assert tm.get_many(["原文0", "原文1", "原文2", "原文3"]) == {
+        "原文0": "text 0", "原文2": "text 2", "原文3": "text 3"}
+    assert tm.stats()["entries"] == 3
+    assert_stats_consistent(tm)
+    tm.close()
+
+
+def test_evicts_by_bytes(tmp_path):
+    entry = len("原文0".encode('utf-8')) + len("x" * 50)
+    tm = TranslationMemory(tmp_path / "tm.db", max_bytes=entry * 2)
+    for i in range(5):
+        tm.put(f"原文{i}", "x" * 50)
+        time.sleep(0.01)
+
+    stats = tm.stats()
+    assert stats["entries"] == 2 and stats["bytes"] <= entry * 2
+    assert set(tm.get_many([f"原文{i}" for i in range(5)])) == {"原文3", "原文4"}
+    assert_stats_consistent(tm)
+    tm.close()
@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from vector_index import HashEmbedder, VectorIndex, index_dir_for
+
+
+class CountingEmbedder(HashEmbedder):
+    """記錄實際嵌入過的文字"""
+
+    def __init__(self, dim=64):
+        super().__init__(dim)
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return super().embed(texts)
+
+
+def chunks(source, texts):
+    return [{"text": text, "metadata": {"source": source, "chunk_index": i}} for i, text in enumerate(texts)]
+
+
+A_TEXTS = ["液壓系統的保養步驟", "更換濾網的方法", "緊急停機程序"]
+B_TEXTS = ["電氣配線圖說明", "馬達規格表"]
+
+
+def test_upsert_replaces_only_the_affected_source(tmp_path):
+    embedder = CountingEmbedder()
+    index = VectorIndex(str(tmp_path), embedder)
+    index.upsert(chunks("a.pdf", A_TEXTS))
+    index.upsert(chunks("b.pdf", B_TEXTS))
+    b_file = index._vectors_path("b.pdf")
+    b_bytes, b_mtime = b_file.read_bytes(), b_file.stat().st_mtime_ns
+    embedder.embedded.clear()
+
+    stats = index.upsert(chunks("a.pdf", [A_TEXTS[0], "更換濾網與油品的方法", A_TEXTS[0]]))
+
+    assert stats == {"embedded": 1, "reused": 2, "deleted": 2, "total": 5}
+    assert embedder.embedded == ["更換濾網與油品的方法"]
+    assert (b_file.read_bytes(), b_file.stat().st_mtime_ns) == (b_bytes, b_mtime)
+    assert len(index) == 5
+    index.close()
+
+    # 重新開啟後兩個來源的塊與向量都還在，且向量與重新嵌入的結果相同
+    reopened = VectorIndex(str(tmp_path), CountingEmbedder())
+    assert reopened.search("馬達規格表", k=1)[0]["id"] == "b.pdf#1"
+    assert reopened.search("更換濾網與油品的方法", k=1)[0]["text"] == "更換濾網與油品的方法"
+    expected = reopened._embed(["緊急停機程序"])
+    assert not np.isclose(reopened.vectors @ expected[0], 1.0).any()  # 已刪除的塊不在索引中
+    reopened.close()
+
+
+def test_delete_source(tmp_path):
+    index = VectorIndex(str(tmp_path), CountingEmbedder())
+    index.upsert(chunks("a.pdf", A_TEXTS))
+    index.upsert(chunks("b.pdf", B_TEXTS))
+
+    assert index.delete_source("a.pdf") == 3
+    assert not index._vectors_path("a.pdf").exists()
+    assert {result["metadata"]["source"] for result in index.search("保養", k=5)} == {"b.pdf"}
+    index.close()
+
+
+def test_embedder_mismatch_is_rejected(tmp_path):
+    VectorIndex(str(tmp_path), HashEmbedder(64)).close()
+
+    with pytest.raises(ValueError):
+        VectorIndex(str(tmp_path), HashEmbedder(128))
+    assert index_dir_for("pymupdf", HashEmbedder(64), str(tmp_path)) != \
+        index_dir_for("unstructured", HashEmbedder(64), str(tmp_path))
@@ -0,0 +1,144 @@
+"""
+分塊用的 Tokenizer
+- TiktokenTokenizer / HFTokenizer：安裝了 tiktoken / transformers 時使用真正的 tokenizer
+- EstimateTokenizer：都沒有安裝時的估算（中日韓字元約 1 token、其他文字約 4 字元 1 token）
+- CachedTokenizer：快取每段文字的 token 數，重複的句子（頁首、表頭等）不重算
+所有 tokenizer 都以 count_many(texts) 批次計算
+"""
+
+import functools
+import math
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Union
+
+# 預設 tiktoken 編碼（OpenAI 嵌入模型使用 cl100k_base）
+DEFAULT_ENCODING = "cl100k_base"
+# CachedTokenizer 預設快取筆數
+DEFAULT_CACHE_SIZE = 200_000
+
+_CJK = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]')
+_NON_CJK_WORD = re.compile(r'[^\s\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]+')
+
+
+class Tokenizer:
+    """tokenizer 介面：count_many 批次回傳每段文字的 token 數"""
+
+    name = "tokenizer"
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        raise NotImplementedError
+
+    def count(self, text: str) -> int:
+        return self.count_many([text])[0]
+
+
+class EstimateTokenizer(Tokenizer):
+    """不需額外套件的估算：中日韓字元各算 1 token，其他連續文字每 4 字元算 1 token"""
+
+    name = "estimate"
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        counts = []
+        for text in texts:
+            cjk = len(_CJK.findall(text))
+            other = sum(math.ceil(len(word) / 4) for word in _NON_CJK_WORD.findall(text))
+            counts.append(cjk + other)
+        return counts
+
+
+class TiktokenTokenizer(Tokenizer):
+    """tiktoken（encode_ordinary_batch 以多執行緒批次編碼）"""
+
+    def __init__(self, encoding: str = DEFAULT_ENCODING):
+        import tiktoken
+        self.name = f"tiktoken:{encoding}"
+        self._encoding = tiktoken.get_encoding(encoding)
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        return [len(tokens) for tokens in self._encoding.encode_ordinary_batch(list(texts))]
+
+
+class HFTokenizer(Tokenizer):
+    """Hugging Face tokenizer（fast tokenizer 一次批次編碼）"""
+
+    def __init__(self, model_name: str):
+        from transformers import AutoTokenizer
+        self.name = f"hf:{model_name}"
+        self._tokenizer = AutoTokenizer.from_pretrained(model_name)
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        encoded = self._tokenizer(list(texts), add_special_tokens=False,
+                                  return_attention_mask=False, return_token_type_ids=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+class CachedTokenizer(Tokenizer):
+    """
+    以 LRU 快取包裝任一 tokenizer，未命中的文字合併成一批計算
+    get_tokenizer 依名稱共用同一個實例（可能跨執行緒），快取的讀寫以鎖保護
+    """
+
+    def __init__(self, inner: Tokenizer, maxsize: int = DEFAULT_CACHE_SIZE):
+        self.inner = inner
+        self.name = inner.name
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        with self._lock:
+            return self._count_many(texts)
+
+    def _count_many(self, texts: Sequence[str]) -> List[int]:
+        # 先取出命中的項目並移到最近使用，再寫入新算的項目，淘汰不會丟掉本批次剛讀到的文字
+        counts = {}
+        missing = []
+        for text in dict.fromkeys(texts):
+            count = self._cache.get(text)
+            if count is None:
+                missing.append(text)
+            else:
+                self._cache.move_to_end(text)
+                counts[text] = count
+
+        if missing:
+            for text, count in zip(missing, self.inner.count_many(missing)):
+                counts[text] = self._cache[text] = count
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+        # 本批次文字多於快取容量時，結果仍取自 counts，不必重算
+        return [counts[text] for text in texts]
+
+
+def get_tokenizer(spec: Union[str, Tokenizer, None] = "auto") -> Optional[Tokenizer]:
+    """
+    依名稱取得（帶快取的）tokenizer；同一名稱共用同一個實例，快取跨分塊器 / 解析器 / 文件累積
+    - "auto": 有 tiktoken 用 tiktoken，否則用估算
+    - "tiktoken" / "tiktoken:<encoding>"、"hf:<model>"、"estimate"
+    - 傳入 Tokenizer 物件時原樣回傳，None 回傳 None（以字元計算）
+    """
+    if spec is None or isinstance(spec, Tokenizer):
+        return spec
+    return _named_tokenizer(spec)
+
+
+@functools.lru_cache(maxsize=None)
+def _named_tokenizer(spec: str) -> Tokenizer:
+    kind, _, arg = spec.partition(":")
+    if kind == "auto":
+        try:
+            inner = TiktokenTokenizer()
+        except ImportError:
+            inner = EstimateTokenizer()
+    elif kind == "tiktoken":
+        inner = TiktokenTokenizer(arg or DEFAULT_ENCODING)
+    elif kind == "hf":
+        inner = HFTokenizer(arg)
+    elif kind == "estimate":
+        inner = EstimateTokenizer()
+    else:
+        raise ValueError(f"未知的 tokenizer: {spec}")
+    return CachedTokenizer(inner)
@@ -2,8 +2,6 @@
 # 使用 deep_translator 進行雙語處理（保留中文，下方添加英文）
 
 import os
-os.system('cls' if os.name == 'nt' else 'clear')
-
 from docx import Document
 from docx.oxml.ns import qn
 from docx.oxml import OxmlElement
@@ -13,20 +11,60 @@ from pathlib import Path
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 import json
+import glob
+import hashlib
+import argparse
+import asyncio
+import contextlib
+import contextvars
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 from deep_translator import GoogleTranslator
+from translation_engine import TranslationEngine, SharedTokenBucket
+from translation_memory import TranslationMemory
+from docx_walker import (DocumentWalker, DocNode, BODY, CELL, HEADER_FOOTER, HEADER_FOOTER_CELL, TEXTBOX,
+                         iter_header_footers, walk_header_footer)
 
 #! 固定對照表讀取 get_fixed_or_translator
 #! 新增英文行 add_english_below
 #! 調整字體大小 set_paragraph_font_size
 
 # ==================== 設定區 ====================
-# Deep Translator 設定
-translator = GoogleTranslator(source='zh-TW', target='en')
+# Deep Translator 設定（每個工作執行緒各自建立翻譯器）
+def make_translator():
+    return GoogleTranslator(source='zh-TW', target='en')
+
+# 併發與限速設定
+MAX_WORKERS = 4                 # 同時進行的翻譯請求數
+REQUESTS_PER_SECOND = 5         # 令牌桶限速（每秒請求數）
+USE_ASYNCIO = False             # 以 asyncio 管線翻譯（需要時可用 --asyncio 開啟）
+ASYNC_CONCURRENCY = 8           # asyncio 模式同時進行的請求數
+PIPELINED = True                # 管線模式：每個區域的譯文到齊就先寫入與調整格式（--no-pipeline 關閉）
+BODY_BLOCK_PARAGRAPHS = 50      # 管線模式下正文每個區塊的段落數（不切開縮排群組）
+
+# 單獨呼叫翻譯函式時的預設引擎與固定對照表；
+# 文件翻譯（BilingualTranslation）執行期間改用該份文件自己的引擎與對照表，見 _current_job
+engine = TranslationEngine(make_translator, max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND)
 
 # 固定翻譯對照表
 FIXED_MAP_PATH = Path('data/fixed_translation.json')
 FIXED_MAP = {}
 
+# 目前執行中的文件翻譯工作（contextvars：巢狀呼叫結束後還原，不同執行緒互不影響）
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+# 翻譯記憶庫（跨執行重複使用譯文，None 表示停用）
+TRANSLATION_MEMORY_PATH = Path('data/translation_memory.sqlite3')
+
+# 增量翻譯：輸出檔旁保存每個節點的內容指紋與譯文，改版時只翻譯有變更的節點
+INCREMENTAL = False
+MANIFEST_SUFFIX = '.manifest.json'
+
+# 批次模式設定
+BATCH_PROCESSES = 4                           # 同時處理的文件數（行程數）
+BATCH_REPORT_NAME = 'translation_report.jsonl'  # 每份文件一行的耗時報告
+BATCH_STATE_NAME = '.translate_state.json'    # 已完成文件的原檔雜湊（續跑用）
+
 # ===================== 中文偵測與翻譯 =====================
 
 def is_chinese(text):
@@ -36,48 +74,21 @@ def translate_to_english(text):
     if not text or not text.strip() or not is_chinese(text):
         return text  # 空的或沒中文的直接跳過
 
-    try:
-        # deep_translator 有字數限制（通常 5000 字），需要分段處理
-        max_length = 4500
-        if len(text) > max_length:
-            # 分段翻譯
-            chunks = []
-            sentences = text.split('\n')
-            current_chunk = ""
-
-            for sentence in sentences:
-                if len(current_chunk) + len(sentence) + 1 <= max_length:
-                    current_chunk += sentence + '\n'
-                else:
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                    current_chunk = sentence + '\n'
-
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-
-            translated_chunks = []
-            for chunk in chunks:
-                if chunk:
-                    translated = translator.translate(chunk)
-                    translated_chunks.append(translated)
-                    time.sleep(0.1)  # 避免請求過快
-
-            return '\n'.join(translated_chunks)
-        else:
-            translated = translator.translate(text)
-            return translated
-    except Exception as e:
-        print(f"翻譯錯誤: {text[:50]}... - {str(e)}")
-        return text  # 翻譯失敗時返回原文
+    # 已預先批次翻譯的直接取用，否則由引擎即時翻譯（過長自動分段、失敗返回原文）
+    job = _current_job.get()
+    return (job.engine if job is not None else engine).translate(text)
 
 # ===================== 固定對照表讀取 =====================
+def fixed_map():
+    job = _current_job.get()
+    return job.fixed_map if job is not None else FIXED_MAP
+
 def get_fixed_or_translator(text):
     stripped = text.strip()
-    fixed = FIXED_MAP.get(stripped)
+    fixed = fixed_map().get(stripped)
     if fixed:
         return fixed
-    return translate_to_english(text)  # 沒有才呼叫翻譯器
+    return translate_to_english(text)  # 沒有才查翻譯記憶庫 / 呼叫翻譯器
 
 # ===================== 判斷是否包含圖片 =====================
 def has_picture(run):
@@ -178,42 +189,82 @@ def check_colon_format(text):
         return True, bool(after_colon), before_colon, after_colon
     return False, False, "", ""
 
+# ==================== 去掉步驟編號 ====================
+def strip_step_number(text, step_number):
+    """去掉開頭的步驟編號及其後的分隔符號，只留下要翻譯的內容"""
+    if not step_number:
+        return text
+    content_start = text.find(step_number) + len(step_number)
+    while content_start < len(text) and text[content_start] in '. :：\u3000\t ':
+        content_start += 1
+    return text[content_start:]
+
+# ==================== 縮排群組狀態 =====================
+class IndentGroups:
+    """
+    單一文件的縮排群組狀態
+    groups: 已完成的群組；current: 正在累積的群組
+    index: para_index -> (group, is_first)，分組時同步建立，查詢 O(1)
+    translated_ids: 已整組翻譯完成的 group_id
+    """
+
+    def __init__(self):
+        self.groups = []
+        self.current = None
+        self.index = {}
+        self.translated_ids = set()
+
+    def _add(self, paragraph, para_index, count):
+        is_first = not self.current["paragraphs"]
+        self.current["paragraphs"].append({
+            "para_index": para_index,
+            'para': paragraph,
+            "full_text": paragraph.text.strip(),
+            "space_count": count
+        })
+        self.index[para_index] = (self.current, is_first)
+
+    def start(self, paragraph, para_index, count):
+        """結束舊組，以此段落開新組"""
+        self.finish()
+        self.current = {"group_id": len(self.groups) + 1, "paragraphs": []}
+        self._add(paragraph, para_index, count)
+
+    def extend(self, paragraph, para_index, count):
+        """添加到當前組（沒有當前組時為單獨的縮排段落，不處理）"""
+        if self.current is not None:
+            self._add(paragraph, para_index, count)
+
+    def finish(self):
+        """結束當前組"""
+        if self.current is not None:
+            self.current["merged_text"] = merge_group_text(self.current["paragraphs"])
+            self.groups.append(self.current)
+            self.current = None
+
+    def lookup(self, para_index):
+        """回傳 (所屬群組, 是否為第一段)；不屬於任何未翻譯群組時回傳 (None, False)"""
+        group, is_first = self.index.get(para_index, (None, False))
+        if group is None or group["group_id"] in self.translated_ids:
+            return None, False
+        return group, is_first
+
 # ==================== 記錄長空格段落 =====================
-def record_long_space_paragraph(paragraph, para_index=None):
+def record_long_space_paragraph(paragraph, groups, para_index=None):
     """
     修正原則：段落開頭有項目編號且後續段落的開頭有多空格的情況下合併
     如果後續段落遇到項目編號開頭，停止合併
     """
-    global current_group, continuous_abnormal_groups
     has_abnormal, count = has_long_spaces_in_runs(paragraph)
     step_number = get_step_number(paragraph)
 
     if has_abnormal and para_index is not None:
         if step_number:
             # 有項目編號 → 結束舊組，開新組
-            if current_group is not None:
-                current_group["merged_text"] = merge_group_text(current_group["paragraphs"])
-                continuous_abnormal_groups.append(current_group)
-                current_group = None
-
-            # 開新組
-            current_group = {"group_id": len(continuous_abnormal_groups) + 1, "paragraphs": []}
-            current_group["paragraphs"].append({
-                "para_index": para_index,
-                'para': paragraph,
-                "full_text": paragraph.text.strip(),
-                "space_count": count
-            })
+            groups.start(paragraph, para_index, count)
         else:
             # 沒有項目編號，但有多空格 → 添加到當前組（如果存在）
-            if current_group is not None:
-                current_group["paragraphs"].append({
-                    "para_index": para_index,
-                    'para': paragraph,
-                    "full_text": paragraph.text.strip(),
-                    "space_count": count
-                })
-            # 如果沒有當前組，說明這是單獨的縮排段落，不處理
+            groups.extend(paragraph, para_index, count)
 
 # ==================== 合併同組縮排段落 ====================
 def merge_group_text(paragraphs_list):
@@ -237,6 +288,12 @@ def merge_group_text(paragraphs_list):
     else:
         return " ".join(lines)               # 用空格連接
 
+def group_source_text(group):
+    """整組合併後實際送去翻譯的文字（去掉第一段的步驟編號）"""
+    merged_chinese = merge_group_text(group["paragraphs"])
+    step_number = get_step_number(group["paragraphs"][0]["full_text"])
+    return strip_step_number(merged_chinese, step_number)
+
 # ============================================================
 
 def add_english_below(paragraph, english_text, font_size=None, font_name='Times New Roman', alignment=None):
@@ -348,30 +405,20 @@ def set_paragraph_font_size(paragraph, font_size_pt, target='all'):
 
 # ===================== 翻譯段落函式（雙語版）=====================
 
-def translate_paragraph_bilingual(paragraph, para_index=None):
+def translate_paragraph_bilingual(paragraph, para_index=None, groups=None):
     """
     雙語翻譯：保留中文，下方添加英文
     根據 format.txt 的格式要求處理
+    groups: 正文段落所屬文件的 IndentGroups（表格內段落不需要）
     """
     if not paragraph.text.strip() or not is_chinese(paragraph.text):
         return
 
-    global continuous_abnormal_groups, translated_group_ids
-
     # ========= 判斷此 paragraph 是否屬於某個縮排群組 =========
     belonging_group = None
     is_first_para_in_group = False
-
-    for group in continuous_abnormal_groups:
-        if group["group_id"] in translated_group_ids:
-            continue
-        for item in group["paragraphs"]:
-            if item["para_index"] == para_index:
-                belonging_group = group
-                is_first_para_in_group = (item["para_index"] == group["paragraphs"][0]["para_index"])
-                break
-        if belonging_group:
-            break
+    if groups is not None:
+        belonging_group, is_first_para_in_group = groups.lookup(para_index)
 
     # ========= 如果是縮排群組的「非第一段」→ 跳過（已在第一段處理時刪除）=========
     if belonging_group and not is_first_para_in_group:
@@ -383,10 +430,6 @@ def translate_paragraph_bilingual(paragraph, para_index=None):
         # 合併所有段落內容
         merged_chinese = merge_group_text(belonging_group["paragraphs"])
 
-        # 提取編號（如果有）
-        first_full_text = belonging_group["paragraphs"][0]["full_text"]
-        step_number = get_step_number(first_full_text)
-
         # 保留原始縮排
         raw_text = paragraph.text
         leading_spaces = len(raw_text) - len(raw_text.lstrip())
@@ -412,16 +455,7 @@ def translate_paragraph_bilingual(paragraph, para_index=None):
             paragraph.add_run(final_chinese)
 
         # 去掉編號翻譯
-        if step_number:
-            content_start = merged_chinese.find(step_number) + len(step_number)
-            while content_start < len(merged_chinese) and merged_chinese[content_start] in '. :：\u3000\t ':
-                content_start += 1
-            pure_content = merged_chinese[content_start:]
-        else:
-            pure_content = merged_chinese
-
-        # 翻譯
-        translated_full = translate_to_english(pure_content)
+        translated_full = translate_to_english(group_source_text(belonging_group))
 
         # 組合英文文字（不包含編號，保留縮進）
         final_english = indent + translated_full.strip()
@@ -434,7 +468,7 @@ def translate_paragraph_bilingual(paragraph, para_index=None):
             # 清空後續段落的內容（保留圖片）
             clear_paragraph_text_keep_images(item["para"])
 
-        translated_group_ids.add(belonging_group["group_id"])
+        groups.translated_ids.add(belonging_group["group_id"])
         return
 
     # ========= 非縮排群組的普通段落 =========
@@ -479,10 +513,7 @@ def translate_paragraph_bilingual(paragraph, para_index=None):
 
         if step_number:
             # 有編號，去掉編號部分翻譯
-            content_start = stripped_text.find(step_number) + len(step_number)
-            while content_start < len(stripped_text) and stripped_text[content_start] in '. :：\u3000\t ':
-                content_start += 1
-            pure_content = stripped_text[content_start:]
+            pure_content = strip_step_number(stripped_text, step_number)
             translated = translate_to_english(pure_content)
 
             # 保留縮排（不包含編號）
@@ -507,10 +538,7 @@ def translate_paragraph_bilingual(paragraph, para_index=None):
 
         if step_number:
             # 有編號
-            content_start = stripped_text.find(step_number) + len(step_number)
-            while content_start < len(stripped_text) and stripped_text[content_start] in '. :：\u3000\t ':
-                content_start += 1
-            pure_content = stripped_text[content_start:]
+            pure_content = strip_step_number(stripped_text, step_number)
             translated = translate_to_english(pure_content)
 
             leading_spaces = len(raw_text) - len(raw_text.lstrip())
@@ -529,421 +557,782 @@ def translate_paragraph_bilingual(paragraph, para_index=None):
 
 # ===================== 翻譯表格函式（雙語版）=====================
 
-def translate_table_bilingual(table):
+def translate_cell_bilingual(cell_paragraphs):
     """
-    表格雙語翻譯
+    單一儲存格雙語翻譯
     根據 format.txt 要求：如果有編號，所有中文段落保留，譯文在最後合併添加
     """
-    for row in table.rows:
-        for cell in row.cells:
-            # 收集所有段落
-            paragraphs = [p for p in cell.paragraphs if p.text.strip() and is_chinese(p.text)]
+    # 收集所有段落
+    paragraphs = [p for p in cell_paragraphs if p.text.strip() and is_chinese(p.text)]
 
-            if not paragraphs:
-                continue
+    if not paragraphs:
+        return
+
+    # 檢查是否有編號格式
+    has_numbers = any(get_step_number(p.text) for p in paragraphs)
+
+    if has_numbers and len(paragraphs) > 1:
+        # 表格內有多個編號段落 → 合併翻譯，添加在最後
+        all_chinese = []
+        all_numbers = []
 
-            # 檢查是否有編號格式
-            has_numbers = any(get_step_number(p.text) for p in paragraphs)
-
-            if has_numbers and len(paragraphs) > 1:
-                # 表格內有多個編號段落 → 合併翻譯，添加在最後
-                all_chinese = []
-                all_numbers = []
-
-                for p in paragraphs:
-                    stripped = p.text.strip()
-                    step_num = get_step_number(stripped)
-
-                    if step_num:
-                        content_start = stripped.find(step_num) + len(step_num)
-                        while content_start < len(stripped) and stripped[content_start] in '. :：\u3000\t ':
-                            content_start += 1
-                        pure_content = stripped[content_start:]
-                        all_chinese.append(pure_content)
-                        all_numbers.append(step_num)
-                    else:
-                        all_chinese.append(stripped)
-                        all_numbers.append("")
-
-                # 合併翻譯
-                merged_chinese = " ".join(all_chinese)
-                translated_full = translate_to_english(merged_chinese)
-
-                # 將譯文按編號拆分（簡化處理：按句號拆分）
-                translated_parts = translated_full.split('.')
-                translated_parts = [p.strip() for p in translated_parts if p.strip()]
-
-                # 組合英文編號段落（表格內保留編號）
-                english_lines = []
-                for i, num in enumerate(all_numbers):
-                    if i < len(translated_parts):
-                        if num:
-                            english_lines.append(f"{num}.{translated_parts[i]}")
-                        else:
-                            english_lines.append(translated_parts[i])
-                    else:
-                        break
-
-                # 如果有剩餘的譯文，加到最後
-                if len(translated_parts) > len(all_numbers):
-                    english_lines.extend(translated_parts[len(all_numbers):])
-
-                # 在最後一個段落後添加英文
-                last_para = paragraphs[-1]
-                combined_english = "\n".join(english_lines)
-                add_english_below(last_para, combined_english)
+        for p in paragraphs:
+            stripped = p.text.strip()
+            step_num = get_step_number(stripped)
 
+            if step_num:
+                all_chinese.append(strip_step_number(stripped, step_num))
+                all_numbers.append(step_num)
             else:
-                # 單個段落或無編號 → 正常處理
-                for p in paragraphs:
-                    translate_paragraph_bilingual(p)
+                all_chinese.append(stripped)
+                all_numbers.append("")
+
+        # 合併翻譯
+        merged_chinese = " ".join(all_chinese)
+        translated_full = translate_to_english(merged_chinese)
+
+        # 將譯文按編號拆分（簡化處理：按句號拆分）
+        translated_parts = translated_full.split('.')
+        translated_parts = [p.strip() for p in translated_parts if p.strip()]
+
+        # 組合英文編號段落（表格內保留編號）
+        english_lines = []
+        for i, num in enumerate(all_numbers):
+            if i < len(translated_parts):
+                if num:
+                    english_lines.append(f"{num}.{translated_parts[i]}")
+                else:
+                    english_lines.append(translated_parts[i])
+            else:
+                break
 
-# ===================== 翻譯頁首頁尾函式 =====================
+        # 如果有剩餘的譯文，加到最後
+        if len(translated_parts) > len(all_numbers):
+            english_lines.extend(translated_parts[len(all_numbers):])
 
-def translate_header_footer_full(doc):
-    """完全通用版：翻譯頁首頁尾的「文字 + 表格 + 表格內文字」"""
-    for section in doc.sections:
-
-        # 所有可能的頁首
-        headers = [
-            section.header,
-            section.first_page_header,
-            section.even_page_header
-        ]
-        # 所有可能的頁尾
-        footers = [
-            section.footer,
-            section.first_page_footer,
-            section.even_page_footer
-        ]
-
-        for hf in headers + footers:
-            if not hf or hf.is_linked_to_previous:
+        # 在最後一個段落後添加英文
+        last_para = paragraphs[-1]
+        combined_english = "\n".join(english_lines)
+        add_english_below(last_para, combined_english)
+
+    else:
+        # 單個段落或無編號 → 正常處理
+        for p in paragraphs:
+            translate_paragraph_bilingual(p)
+
+def translate_table_bilingual(table):
+    """表格雙語翻譯（逐一處理每個儲存格，合併儲存格只處理一次）"""
+    seen = set()
+    for row in table.rows:
+        for cell in row.cells:
+            if cell._tc in seen:
                 continue
+            seen.add(cell._tc)
+            translate_cell_bilingual(cell.paragraphs)
+
+# ===================== 翻譯頁首頁尾函式 =====================
 
-            # 1. 翻頁首頁尾內的一般段落
-            for para in hf.paragraphs:
-                if para.text.strip() and is_chinese(para.text):
-                    set_paragraph_font_size(para, 10, 'chinese')
-                    print(f"讀取: {para.text}")
-                    translated = get_fixed_or_translator(para.text)
-                    if translated:
-                        add_english_below(para, translated, font_size=6, alignment='center')
-
-            # 2. 翻頁首頁尾內的「表格」
-            for table in hf.tables:
-                processed_texts = set()
-                for row in table.rows:
-                    for cell in row.cells:
-                        for para in cell.paragraphs:
-                            full_text = para.text.strip()
-                            if para.text.strip() and is_chinese(para.text):
-                                set_paragraph_font_size(para, 10, 'chinese')
-                                if full_text in processed_texts:
-                                    continue
-
-                                print(f"讀取: {para.text}")
-                                translated = get_fixed_or_translator(para.text)
-                                if translated:
-                                    add_english_below(para, translated, font_size=8, alignment='center')
-                                    processed_texts.add(full_text)
+def translate_header_footer_paragraph(para, font_size):
+    """翻譯頁首頁尾的單一段落，英文置中加在下方；有處理時回傳 True"""
+    if not (para.text.strip() and is_chinese(para.text)):
+        return False
+
+    set_paragraph_font_size(para, 10, 'chinese')
+    print(f"讀取: {para.text}")
+    translated = get_fixed_or_translator(para.text)
+    if translated:
+        add_english_below(para, translated, font_size=font_size, alignment='center')
+        return True
+    return False
+
+def translate_header_footer_node(node):
+    """
+    頁首頁尾節點：一般段落英文 6pt，表格內英文 8pt
+    重複字串的翻譯請求已由 engine 在整份文件層級去重（共用的頁首頁尾只走訪一次），
+    這裡不再跳過同一表格內文字相同的儲存格：每個儲存格都加上英文，與正文表格一致
+    """
+    if node.kind == HEADER_FOOTER:
+        translate_header_footer_paragraph(node.paragraph, font_size=6)
+        return
+
+    for para in node.paragraphs:
+        translate_header_footer_paragraph(para, font_size=8)
 
 # ===================== 翻譯流程圖文字函式 =====================
 
+def textbox_paragraph_texts(textbox):
+    """文字框內每個段落的 (w:t 清單, 合併後文字)，跳過空白段落"""
+    result = []
+    for p in textbox.iter(qn('w:p')):
+        text_elems = list(p.iter(qn('w:t')))
+        joined = ''.join(t.text or '' for t in text_elems)
+        if joined.strip():
+            result.append((text_elems, joined))
+    return result
+
+def restyle_textbox(textbox, half_points=11):
+    """統一文字框字體大小、行高與置中（每個文字框只掃描一次）"""
+    for r in textbox.iter(qn('w:r')):
+        rPr = r.find(qn('w:rPr'))
+        if rPr is None:
+            rPr = OxmlElement('w:rPr')
+            r.append(rPr)
+        sz = rPr.find(qn('w:sz'))
+        if sz is None:
+            sz = OxmlElement('w:sz')
+            rPr.append(sz)
+        sz.set(qn('w:val'), str(half_points))
+
+    for p in textbox.iter(qn('w:p')):
+        pPr = p.find(qn('w:pPr'))
+        if pPr is None:
+            pPr = OxmlElement('w:pPr')
+            p.insert(0, pPr)
+
+        # 調整行高
+        spacing = pPr.find(qn('w:spacing'))
+        if spacing is None:
+            spacing = OxmlElement('w:spacing')
+            pPr.append(spacing)
+        spacing.set(qn('w:line'), '130')
+        spacing.set(qn('w:lineRule'), 'exact')
+
+        # 調整對齊
+        jc = pPr.find(qn('w:jc'))
+        if jc is None:
+            jc = OxmlElement('w:jc')
+            pPr.append(jc)
+        jc.set(qn('w:val'), 'center')
+
+def translate_textbox(textbox):
+    """
+    翻譯單一文字框（w:txbxContent）
+    同一段落被拆成多個 w:t 時先合併再翻譯，譯文寫回第一個 w:t；
+    有中文時整個文字框只重設一次樣式
+    """
+    has_chinese_text = False
+    for text_elems, joined in textbox_paragraph_texts(textbox):
+        if not is_chinese(joined):
+            continue
+        has_chinese_text = True
+
+        translated_text = translate_to_english(joined)
+        if translated_text:
+            text_elems[0].text = translated_text
+            for text_elem in text_elems[1:]:
+                text_elem.text = ''
+
+    if has_chinese_text:
+        restyle_textbox(textbox)
+
 def translate_textboxes_in_doc(doc):
     body = doc.element.body
     if body is None:
         return
 
-    textboxes = body.findall('.//' + qn('w:txbxContent'))
+    for textbox in body.findall('.//' + qn('w:txbxContent')):
+        translate_textbox(textbox)
 
-    if not textboxes:
-        return
+# ===================== 縮小表格內英文文字函式 =====================
+def shrink_paragraphs_english_font(paragraphs, ratio=0.82):
+    """
+    縮小「純英文」段落的文字大小
+    """
+    for paragraph in paragraphs:
+        text = paragraph.text.strip()
+        if not text or any('\u4e00' <= c <= '\u9fff' for c in text):
+            continue
 
-    for textbox in textboxes:
-        # 翻譯所有文字
-        text_elements = textbox.findall('.//' + qn('w:t'))
-        for text_elem in text_elements:
-            if text_elem.text and text_elem.text.strip():
-                original_text = text_elem.text
-                translated_text = translate_to_english(original_text)
-                if translated_text:
-                    text_elem.text = translated_text
-
-                if is_chinese(original_text):
-                    half_points = 11
-                    # 調整字體大小
-                    for r in textbox.findall('.//' + qn('w:r')):
-                        rPr = r.find(qn('w:rPr'))
-                        if rPr is None:
-                            rPr = OxmlElement('w:rPr')
-                            r.append(rPr)
-                        sz = rPr.find(qn('w:sz'))
-                        if sz is None:
-                            sz = OxmlElement('w:sz')
-                            rPr.append(sz)
-                        sz.set(qn('w:val'), str(half_points))
-
-                    # 調整行高
-                    for p in textbox.findall('.//' + qn('w:p')):
-                        pPr = p.find(qn('w:pPr'))
-                        if pPr is None:
-                            pPr = OxmlElement('w:pPr')
-                            p.insert(0, pPr)
-                        spacing = pPr.find(qn('w:spacing'))
-                        if spacing is None:
-                            spacing = OxmlElement('w:spacing')
-                            pPr.append(spacing)
-                        spacing.set(qn('w:line'), '130')
-                        spacing.set(qn('w:lineRule'), 'exact')
-
-                    # 調整對齊
-                    for p in textbox.findall('.//' + qn('w:p')):
-                        pPr = p.find(qn('w:pPr'))
-                        if pPr is None:
-                            pPr = OxmlElement('w:pPr')
-                            p.insert(0, pPr)
-
-                        jc = pPr.find(qn('w:jc'))
-                        if jc is None:
-                            jc = OxmlElement('w:jc')
-                            pPr.append(jc)
-                        jc.set(qn('w:val'), 'center')
+        for run in paragraph.runs:
+            if not run.text.strip():
+                continue
+
+            r = run._r
+            rPr = r.find(qn('w:rPr'))
+            if rPr is None:
+                rPr = OxmlElement('w:rPr')
+                r.insert(0, rPr)
+
+            # 處理 w:sz
+            sz = rPr.find(qn('w:sz'))
+            if sz is None:
+                sz = OxmlElement('w:sz')
+                rPr.insert(0, sz)
+
+            if sz.get(qn('w:val')):
+                current = int(sz.get(qn('w:val')))
+                new_val = max(20, int(current * ratio))
+            else:
+                new_val = max(20, int(22 * ratio))
+
+            sz.set(qn('w:val'), str(new_val))
+
+            # 處理 w:szCs
+            szCs = rPr.find(qn('w:szCs'))
+            if szCs is None:
+                szCs = OxmlElement('w:szCs')
+                rPr.insert(0, szCs)
+            szCs.set(qn('w:val'), str(new_val))
+
+            # 處理 w:szFarEast
+            szFarEast = rPr.find(qn('w:szFarEast'))
+            if szFarEast is None:
+                szFarEast = OxmlElement('w:szFarEast')
+                rPr.insert(0, szFarEast)
+            szFarEast.set(qn('w:val'), str(new_val))
 
-# ===================== 縮小表格內英文文字函式 =====================
 def shrink_table_english_font(table, ratio=0.82):
     """
     縮小表格內「純英文」文字大小
     """
+    seen = set()
     for row in table.rows:
         for cell in row.cells:
-            for paragraph in cell.paragraphs:
-                text = paragraph.text.strip()
-                if not text or any('\u4e00' <= c <= '\u9fff' for c in text):
-                    continue
-
-                for run in paragraph.runs:
-                    if not run.text.strip():
-                        continue
-
-                    r = run._r
-                    rPr = r.find(qn('w:rPr'))
-                    if rPr is None:
-                        rPr = OxmlElement('w:rPr')
-                        r.insert(0, rPr)
-
-                    # 處理 w:sz
-                    sz = rPr.find(qn('w:sz'))
-                    if sz is None:
-                        sz = OxmlElement('w:sz')
-                        rPr.insert(0, sz)
-
-                    if sz.get(qn('w:val')):
-                        current = int(sz.get(qn('w:val')))
-                        new_val = max(20, int(current * ratio))
-                    else:
-                        new_val = max(20, int(22 * ratio))
-
-                    sz.set(qn('w:val'), str(new_val))
-
-                    # 處理 w:szCs
-                    szCs = rPr.find(qn('w:szCs'))
-                    if szCs is None:
-                        szCs = OxmlElement('w:szCs')
-                        rPr.insert(0, szCs)
-                    szCs.set(qn('w:val'), str(new_val))
-
-                    # 處理 w:szFarEast
-                    szFarEast = rPr.find(qn('w:szFarEast'))
-                    if szFarEast is None:
-                        szFarEast = OxmlElement('w:szFarEast')
-                        rPr.insert(0, szFarEast)
-                    szFarEast.set(qn('w:val'), str(new_val))
+            if cell._tc in seen:
+                continue
+            seen.add(cell._tc)
+            shrink_paragraphs_english_font(cell.paragraphs, ratio)
 
 # ===================== 強制 Times New Roman 字體函式 =====================
+def set_run_times_new_roman(r):
+    """w:r 不含中文時，英文字型改為 Times New Roman（中文保留原始字體）"""
+    rPr = r.find(qn('w:rPr'))
+    if rPr is None:
+        rPr = OxmlElement('w:rPr')
+        r.insert(0, rPr)
+
+    # 判斷 run 內的文字是否包含中文
+    text = r.text.strip()
+    has_chinese = bool(re.search('[\u4e00-\u9fff]', text)) if text else False
+
+    if not has_chinese and text:
+        rFonts = rPr.find(qn('w:rFonts'))
+        if rFonts is None:
+            rFonts = OxmlElement('w:rFonts')
+            rPr.insert(0, rFonts)
+        rFonts.set(qn('w:ascii'), 'Times New Roman')
+        rFonts.set(qn('w:hAnsi'), 'Times New Roman')
+        rFonts.set(qn('w:cs'), 'Times New Roman')
+
+def force_node_times_new_roman(node):
+    for r in node.runs:
+        set_run_times_new_roman(r)
+
 def force_times_new_roman(doc):
     """強制全文件所有文字改成 Times New Roman（只針對英文，中文保留原始字體）"""
-    def _set_font(run):
-        r = run._r
-        rPr = r.find(qn('w:rPr'))
-        if rPr is None:
-            rPr = OxmlElement('w:rPr')
-            r.insert(0, rPr)
-
-        # 判斷 run 內的文字是否包含中文
-        text = run.text.strip()
-        has_chinese = bool(re.search('[\u4e00-\u9fff]', text)) if text else False
-
-        if not has_chinese and text:
-            rFonts = rPr.find(qn('w:rFonts'))
-            if rFonts is None:
-                rFonts = OxmlElement('w:rFonts')
-                rPr.insert(0, rFonts)
-            rFonts.set(qn('w:ascii'), 'Times New Roman')
-            rFonts.set(qn('w:hAnsi'), 'Times New Roman')
-            rFonts.set(qn('w:cs'), 'Times New Roman')
-
-    # 正文
-    for paragraph in doc.paragraphs:
-        for run in paragraph.runs:
-            _set_font(run)
-
-    # 表格
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                for paragraph in cell.paragraphs:
-                    for run in paragraph.runs:
-                        _set_font(run)
-
-    # 頁首頁尾
-    for section in doc.sections:
-        for hf in (section.header, section.footer,
-                   section.first_page_header, section.first_page_footer,
-                   section.even_page_header, section.even_page_footer):
-            if hf:
-                for paragraph in hf.paragraphs:
-                    for run in paragraph.runs:
-                        _set_font(run)
-                for table in hf.tables:
-                    for row in table.rows:
-                        for cell in row.cells:
-                            for paragraph in cell.paragraphs:
-                                for run in paragraph.runs:
-                                    _set_font(run)
-
-    # 流程圖文字框
-    for textbox in doc.element.body.findall('.//' + qn('w:txbxContent')):
-        for run in textbox.findall('.//' + qn('w:r')):
-            rPr = run.find(qn('w:rPr'))
-            if rPr is None:
-                rPr = OxmlElement('w:rPr')
-                run.insert(0, rPr)
+    walker = DocumentWalker(doc)
+    walker.add_stage('font', force_node_times_new_roman)
+    walker.run()
 
-            # 同樣判斷中文
-            text = run.text.strip()
-            has_chinese = bool(re.search('[\u4e00-\u9fff]', text)) if text else False
-
-            if not has_chinese and text:
-                rFonts = rPr.find(qn('w:rFonts'))
-                if rFonts is None:
-                    rFonts = OxmlElement('w:rFonts')
-                    rPr.insert(0, rFonts)
-                rFonts.set(qn('w:ascii'), 'Times New Roman')
-                rFonts.set(qn('w:hAnsi'), 'Times New Roman')
-                rFonts.set(qn('w:cs'), 'Times New Roman')
+# ===================== 清理空段落函式 =====================
+def remove_paragraph_if_empty(paragraph):
+    """段落文字為空且不含圖片時刪除"""
+    if paragraph.text.strip():
+        return
+    if any(has_picture(run) for run in paragraph.runs):
+        return
 
+    p_element = paragraph._element
+    parent = p_element.getparent()
+    if parent is not None:
+        parent.remove(p_element)
 
-# ===================== 清理空段落函式 =====================
 def remove_empty_paragraphs(doc):
     """刪除文檔中的空白段落（保留包含圖片的段落）"""
-    paragraphs_to_remove = []
-
     for paragraph in doc.paragraphs:
-        # 如果段落文字為空，但檢查是否包含圖片
-        if not paragraph.text.strip():
-            # 檢查是否有圖片
-            has_images = any(has_picture(run) for run in paragraph.runs)
-            if not has_images:
-                # 沒有圖片才刪除
-                paragraphs_to_remove.append(paragraph)
-
-    for para in paragraphs_to_remove:
-        p_element = para._element
-        parent = p_element.getparent()
-        if parent is not None:
-            parent.remove(p_element)
-
-# ==================== 主翻譯函式（雙語版）====================
-def translate_document(input_file, output_file):
-    global continuous_abnormal_groups, current_group, translated_group_ids, FIXED_MAP, FIXED_MAP_PATH
-    continuous_abnormal_groups = []
-    current_group = None
-    translated_group_ids = set()
-
-    # 載入固定翻譯對照表
-    if FIXED_MAP_PATH.exists():
-        with FIXED_MAP_PATH.open('r', encoding='utf-8') as f:
-            FIXED_MAP = json.load(f)
-    print(f"載入固定翻譯對照表，共 {len(FIXED_MAP)} 筆資料")
-
-    print(f"="*90)
-    print(f"載入檔案：{input_file}\n")
-    doc = Document(input_file)
-
-    print("開始正文段落合併...")
-    # 先記錄全部的長空格段落跟合併
-    for i, paragraph in enumerate(doc.paragraphs):
-        if paragraph.text.strip():
-            if not paragraph.text.strip() or not is_chinese(paragraph.text):
-                continue
-            record_long_space_paragraph(paragraph, para_index=i)
-
-    # 結束最後一組
-    if current_group is not None:
-        current_group["merged_text"] = merge_group_text(current_group["paragraphs"])
-        continuous_abnormal_groups.append(current_group)
-
-    print("開始翻譯正文段落（雙語模式）...")
-    # 進行雙語翻譯
-    for i, paragraph in enumerate(doc.paragraphs):
-        if paragraph.text.strip():
-            translate_paragraph_bilingual(paragraph, para_index=i)
+        remove_paragraph_if_empty(paragraph)
 
-    print("\n開始翻譯表格內容（雙語模式）...")
-    for table in doc.tables:
-        translate_table_bilingual(table)
-
-    print("\n開始翻譯頁首頁尾...")
-    translate_header_footer_full(doc)
+# ===================== 收集待翻譯字串 =====================
+def paragraph_source_text(raw_text):
+    """一般段落實際送去翻譯的文字（規則與 translate_paragraph_bilingual 相同）"""
+    stripped_text = raw_text.strip()
+    has_colon, has_content, colon_part, _ = check_colon_format(stripped_text)
+    if has_colon and not has_content:
+        return colon_part
+    return strip_step_number(stripped_text, get_step_number(stripped_text))
 
-    print(f"翻譯流程圖.....\n")
-    translate_textboxes_in_doc(doc)
+def collect_node_texts(node, groups):
+    """
+    節點實際送去翻譯的字串（規則與各翻譯函式相同）
+    需在 record_long_space_paragraph 分組完成後、實際翻譯前呼叫
+    """
+    texts = []
+
+    if node.kind == BODY:
+        text = node.paragraph.text
+        if text.strip() and is_chinese(text):
+            group, is_first = groups.lookup(node.index)
+            if group is None:
+                texts.append(paragraph_source_text(text))
+            elif is_first:
+                texts.append(group_source_text(group))
+
+    elif node.kind == CELL:
+        paragraphs = [p.text for p in node.paragraphs if p.text.strip() and is_chinese(p.text)]
+        if len(paragraphs) > 1 and any(get_step_number(t) for t in paragraphs):
+            texts.append(" ".join(
+                strip_step_number(t.strip(), get_step_number(t.strip())) for t in paragraphs
+            ))
+        else:
+            texts.extend(paragraph_source_text(t) for t in paragraphs)
+
+    elif node.kind in (HEADER_FOOTER, HEADER_FOOTER_CELL):
+        # 固定對照表有的不送翻譯
+        for para in node.paragraphs:
+            if para.text.strip() and is_chinese(para.text) and not fixed_map().get(para.text.strip()):
+                texts.append(para.text)
+
+    elif node.kind == TEXTBOX:
+        texts.extend(joined for _, joined in textbox_paragraph_texts(node.element))
+
+    return [t for t in texts if t and t.strip() and is_chinese(t)]
+
+def node_fingerprint(kind, node_texts):
+    """節點內容指紋：節點類型 + 待翻譯字串"""
+    digest = hashlib.sha1(kind.encode('utf-8'))
+    for text in node_texts:
+        digest.update(b'\x1e')
+        digest.update(text.encode('utf-8'))
+    return digest.hexdigest()
+
+# ===================== 各階段節點處理 =====================
+def record_body_node(node, groups):
+    paragraph = node.paragraph
+    if paragraph.text.strip() and is_chinese(paragraph.text):
+        record_long_space_paragraph(paragraph, groups, para_index=node.index)
+
+def translate_node(node, groups):
+    if node.kind == BODY:
+        if node.paragraph.text.strip():
+            translate_paragraph_bilingual(node.paragraph, para_index=node.index, groups=groups)
+    elif node.kind == CELL:
+        translate_cell_bilingual(node.paragraphs)
+    elif node.kind in (HEADER_FOOTER, HEADER_FOOTER_CELL):
+        translate_header_footer_node(node)
+    elif node.kind == TEXTBOX:
+        translate_textbox(node.element)
 
-    print("開始縮小表格內英文字體（82%）...")
-    for table in doc.tables:
-        shrink_table_english_font(table, ratio=0.82)
+# ==================== 主翻譯函式（雙語版）====================
+class BilingualTranslation:
+    """
+    單份文件的翻譯流程，分為三個階段：
+    1. extract：段落合併、收集所有待翻譯字串
+    2. resolve / aresolve：批次翻譯（執行緒池或 asyncio）
+    3. apply：寫入雙語內容、調整字體、清理空白段落
+    pipeline() 以區域為單位重疊 2、3 階段
+    """
 
-    # 頁首頁尾表格也要
-    for section in doc.sections:
-        for hf in (section.header, section.footer,
-                section.first_page_header, section.first_page_footer,
-                section.even_page_header, section.even_page_footer):
-            if hf and hf.tables:
-                for t in hf.tables:
-                    shrink_table_english_font(t, ratio=0.82)
+    def __init__(self, input_file, backend_factory=None, limiter=None):
+        self.memory = TranslationMemory(TRANSLATION_MEMORY_PATH) if TRANSLATION_MEMORY_PATH else None
+        self.engine = TranslationEngine(backend_factory or make_translator,
+                                        max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                                        memory=self.memory, limiter=limiter)
+
+        # 載入固定翻譯對照表
+        self.fixed_map = dict(FIXED_MAP)
+        if FIXED_MAP_PATH.exists():
+            with FIXED_MAP_PATH.open('r', encoding='utf-8') as f:
+                self.fixed_map = json.load(f)
+        print(f"載入固定翻譯對照表，共 {len(self.fixed_map)} 筆資料")
+
+        print(f"="*90)
+        print(f"載入檔案：{input_file}\n")
+        self.doc = Document(input_file)
+        self.walker = DocumentWalker(self.doc)
+        self.groups = IndentGroups()
+        self.texts = []
+        self.fingerprints = {}  # 節點指紋 -> 該節點的待翻譯字串
+        self.node_texts = {}    # 節點元素 -> 該節點的待翻譯字串（管線模式依區域送出）
+        self.changed_nodes = None
+
+    @contextlib.contextmanager
+    def _active(self):
+        """區塊內的翻譯函式（translate_to_english、固定對照表）使用這份文件的引擎與對照表，結束後還原"""
+        token = _current_job.set(self)
+        try:
+            yield
+        finally:
+            _current_job.reset(token)
+
+    def _collect(self, node):
+        node_texts = collect_node_texts(node, self.groups)
+        if node_texts:
+            self.node_texts[node.element] = node_texts
+            self.texts.extend(node_texts)
+            self.fingerprints[node_fingerprint(node.kind, node_texts)] = node_texts
+
+    def extract(self):
+        """第一階段：段落合併 → 收集待翻譯字串（同時計算每個節點的內容指紋）"""
+        print("開始正文段落合併與收集待翻譯字串...")
+        groups = self.groups
+        self.walker.add_stage('grouping', lambda node: record_body_node(node, groups), kinds=(BODY,),
+                              after=groups.finish)
+        self.walker.add_stage('collect', self._collect)
+        with self._active():
+            self.walker.run()
+        return self.texts
+
+    def reuse_manifest(self, manifest_path):
+        """
+        增量模式：與上一版的指紋清單比對，未變更節點直接沿用上次的譯文，
+        之後的 resolve 只會翻譯有變更的節點
+        """
+        manifest_path = Path(manifest_path)
+        previous = {}
+        if manifest_path.exists():
+            previous = json.loads(manifest_path.read_text(encoding='utf-8')).get("nodes", {})
+
+        self.changed_nodes = 0
+        for fingerprint in self.fingerprints:
+            stored = previous.get(fingerprint)
+            if stored is None:
+                self.changed_nodes += 1
+                continue
+            for source, translated in stored.items():
+                self.engine.results.setdefault(source, translated)
+        print(f"增量翻譯：{len(self.fingerprints)} 個節點中 {self.changed_nodes} 個有變更")
+
+    def write_manifest(self, manifest_path):
+        """
+        保存本次每個節點的指紋與譯文，供下次增量翻譯
+        是否沿用以節點指紋判斷（內容相同的節點即可沿用，與原檔是否整份相同無關），因此不記錄原檔雜湊
+        """
+        nodes = {}
+        for fingerprint, node_texts in self.fingerprints.items():
+            translations = {t: self.engine.results[t] for t in node_texts if t in self.engine.results}
+            if len(translations) == len(set(node_texts)):
+                nodes[fingerprint] = translations
+        manifest = {"nodes": nodes}
+        Path(manifest_path).write_text(json.dumps(manifest, ensure_ascii=False), encoding='utf-8')
+
+    def resolve(self):
+        """第二階段（執行緒池）：批次翻譯全部字串"""
+        start = time.perf_counter()
+        self.engine.prefetch(self.texts)
+        self.walker.add_timing('resolve', time.perf_counter() - start)
+        self._print_resolve_stats()
+
+    async def aresolve(self, concurrency=ASYNC_CONCURRENCY):
+        """第二階段（asyncio）：所有批次同時送出，含重試與退避"""
+        start = time.perf_counter()
+        await self.engine.aprefetch(self.texts, concurrency=concurrency)
+        self.walker.add_timing('resolve', time.perf_counter() - start)
+        self._print_resolve_stats()
+
+    def _print_resolve_stats(self):
+        print(f"  共 {len(self.texts)} 筆字串，需翻譯 {self.engine.stats['texts']} 筆，"
+              f"送出 {self.engine.stats['requests']} 次請求")
+
+    def apply(self):
+        """第三階段：寫入雙語內容 → 表格英文縮小（82%）→ 強制 Times New Roman → 清理空白段落"""
+        print("開始寫入雙語內容...")
+        groups = self.groups
+        self.walker.add_stage('translate', lambda node: translate_node(node, groups))
+        with self._active():  # translate_to_english 由此取得已翻譯結果
+            self.walker.run()
+
+        print("開始調整字體與清理空白段落...")
+        self.walker.add_stage('font_size',
+                              lambda node: shrink_paragraphs_english_font(node.paragraphs, ratio=0.82),
+                              kinds=(CELL, HEADER_FOOTER_CELL))
+        self.walker.add_stage('font', force_node_times_new_roman)
+        self.walker.add_stage('cleanup', lambda node: remove_paragraph_if_empty(node.paragraph), kinds=(BODY,))
+        self.walker.run()
+
+    # ---------- 管線模式 ----------
+
+    def _body_block_nodes(self, block, originals):
+        """區塊內的原段落及翻譯時插入在其後的英文段落（寫入後才需要調整格式 / 清理）"""
+        nodes = []
+        for node in block:
+            nodes.append(node)
+            sibling = node.element.getnext()
+            while sibling is not None and sibling.tag == qn('w:p') and sibling not in originals:
+                nodes.append(DocNode(BODY, sibling, node.parent))
+                sibling = sibling.getnext()
+        return nodes
+
+    def _regions(self):
+        """
+        管線模式的處理單位：正文段落區塊（不切開縮排群組）、每個表格、每個頁首頁尾、每個文字框
+        回傳 [(要翻譯的節點, 寫入後回傳需調整格式節點的函式)]
+        """
+        nodes = self.walker.nodes
+        regions = []
+
+        body = [node for node in nodes if node.kind == BODY]
+        originals = {node.element for node in body}
+        block = []
+        for node in body:
+            group, is_first = self.groups.lookup(node.index)
+            # 縮排群組的第一段會清空同組其他段落，區塊只在群組開頭或群組外切開
+            if len(block) >= BODY_BLOCK_PARAGRAPHS and (group is None or is_first):
+                regions.append((block, lambda block=block: self._body_block_nodes(block, originals)))
+                block = []
+            block.append(node)
+        if block:
+            regions.append((block, lambda block=block: self._body_block_nodes(block, originals)))
+
+        tables = {}
+        for node in nodes:
+            if node.kind == CELL:
+                tables.setdefault(node.table, []).append(node)
+        for cells in tables.values():
+            regions.append((cells, lambda cells=cells: cells))
+
+        # 儲存格 / 段落在寫入英文後會多出段落，頁首頁尾整個重新走訪一次
+        for hf in iter_header_footers(self.doc):
+            regions.append((walk_header_footer(hf), lambda hf=hf: walk_header_footer(hf)))
+
+        for node in nodes:
+            if node.kind == TEXTBOX:
+                regions.append(([node], lambda node=node: [node]))
+        return regions
+
+    def _apply_region(self, region_nodes, format_nodes):
+        """寫入一個區域的雙語內容 → 表格英文縮小（82%）→ 強制 Times New Roman → 清理空白段落"""
+        for node in region_nodes:
+            translate_node(node, self.groups)
+        for node in format_nodes():
+            if node.kind in (CELL, HEADER_FOOTER_CELL):
+                shrink_paragraphs_english_font(node.paragraphs, ratio=0.82)
+            force_node_times_new_roman(node)
+            if node.kind == BODY:
+                remove_paragraph_if_empty(node.paragraph)
+
+    def pipeline(self):
+        """
+        第二 + 三階段重疊：每個區域的字串各自送出翻譯，哪個區域先翻譯完就先寫入並調整格式，
+        CPU 格式處理與其他區域的網路等待同時進行，總耗時約為 max(網路, CPU) 而非兩者相加
+        """
+        print("開始管線翻譯（各區域翻譯完成即寫入雙語內容並調整格式）...")
+        start = time.perf_counter()
+        regions = self._regions()
+        region_texts = [[text for node in region_nodes for text in self.node_texts.get(node.element, ())]
+                        for region_nodes, _ in regions]
+        futures = dict(zip(self.engine.submit_many(region_texts), regions))
+
+        apply_seconds = 0.0
+        try:
+            with self._active():  # translate_to_english 由此取得已翻譯結果
+                for future in as_completed(futures):
+                    future.result()  # 區域翻譯失敗（例如組回多行譯文時出錯）時在此拋出，不寫入半成品
+                    apply_start = time.perf_counter()
+                    self._apply_region(*futures[future])
+                    apply_seconds += time.perf_counter() - apply_start
+        finally:
+            self.engine.close()
+
+        self.walker.add_timing('apply', apply_seconds)
+        self.walker.add_timing('pipeline', time.perf_counter() - start - apply_seconds)
+        print(f"  {len(regions)} 個區域")
+        self._print_resolve_stats()
+
+    def save(self, output_file):
+        """儲存並回傳統計（各階段耗時、字串數、請求數、翻譯記憶庫命中數）"""
+        print("各階段耗時：")
+        print(self.walker.report())
+
+        print(f"="*90)
+        print(f"儲存翻譯結果 → {output_file}")
+        self.doc.save(output_file)
+
+        result = {
+            "timings": {name: round(seconds, 4) for name, seconds in self.walker.timings.items()},
+            "texts": len(self.texts),
+            "translated": self.engine.stats["texts"],
+            "requests": self.engine.stats["requests"],
+        }
+        if self.changed_nodes is not None:
+            result["changed_nodes"] = self.changed_nodes
+        if self.memory is not None:
+            stats = self.memory.stats()
+            print(f"翻譯記憶庫：命中 {stats['hits']}，未命中 {stats['misses']}，共 {stats['entries']} 筆")
+            result["memory_hits"] = stats["hits"]
+            self.memory.close()
+        print("翻譯完成！")
+        return result
 
-    print("強制全文件字體為 Times New Roman...")
-    force_times_new_roman(doc)
+def manifest_path_for(output_file):
+    """增量翻譯指紋清單的位置：與輸出檔同名，副檔名為 .manifest.json"""
+    return Path(output_file).with_suffix(MANIFEST_SUFFIX)
 
-    print("清理空白段落...")
-    remove_empty_paragraphs(doc)
+def translate_document(input_file, output_file, backend_factory=None, limiter=None,
+                       use_asyncio=USE_ASYNCIO, incremental=INCREMENTAL, pipelined=PIPELINED):
+    """
+    backend_factory: 自訂翻譯器建立函式（例如 translation_engine.FakeTranslator 用於基準測試），
+                     預設為 Google 翻譯
+    limiter: 外部限速器（批次模式下各行程共用），預設依 REQUESTS_PER_SECOND 建立
+    use_asyncio: 以 asyncio 管線進行第二階段翻譯
+    incremental: 只翻譯與上一版指紋清單不同的節點
+    pipelined: 以區域為單位重疊翻譯與格式處理（asyncio 模式不適用）
+    回傳本次執行的統計（各階段耗時、字串數、請求數、翻譯記憶庫命中數）
+    """
+    if use_asyncio:
+        return asyncio.run(translate_document_async(input_file, output_file, backend_factory, limiter,
+                                                    incremental=incremental))
+
+    job = BilingualTranslation(input_file, backend_factory, limiter)
+    job.extract()
+    if incremental:
+        job.reuse_manifest(manifest_path_for(output_file))
+    if pipelined:
+        job.pipeline()
+    else:
+        job.resolve()
+        job.apply()
+    result = job.save(output_file)
+    if incremental:
+        job.write_manifest(manifest_path_for(output_file))
+    return result
+
+async def translate_document_async(input_file, output_file, backend_factory=None, limiter=None,
+                                   concurrency=ASYNC_CONCURRENCY, incremental=INCREMENTAL):
+    """
+    asyncio 版本：抽取全部翻譯工作 → 以非同步翻譯器併發處理（上限 concurrency，失敗重試）
+    → 套用結果；網路延遲完全重疊，總耗時取決於最慢的批次
+    """
+    job = BilingualTranslation(input_file, backend_factory, limiter)
+    job.extract()
+    if incremental:
+        job.reuse_manifest(manifest_path_for(output_file))
+    await job.aresolve(concurrency)
+    job.apply()
+    result = job.save(output_file)
+    if incremental:
+        job.write_manifest(manifest_path_for(output_file))
+    return result
+
+# ==================== 批次翻譯（多行程）====================
+def expand_inputs(patterns):
+    """把目錄 / glob / 檔案路徑展開為 .docx 清單（略過 Word 暫存檔與已輸出的雙語檔）"""
+    files = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            candidates = sorted(path.glob('*.docx'))
+        elif glob.has_magic(pattern):
+            candidates = sorted(Path(p) for p in glob.glob(pattern, recursive=True))
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            if candidate.name.startswith('~$') or candidate.stem.endswith('_bilingual'):
+                continue
+            if candidate not in files:
+                files.append(candidate)
+    return files
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+_shared_limiter = None
+
+def _init_batch_worker(limiter):
+    """工作行程初始化：取得共用限速器"""
+    global _shared_limiter
+    _shared_limiter = limiter
+
+def _translate_batch_item(input_file, output_file, use_asyncio=USE_ASYNCIO, incremental=INCREMENTAL,
+                          pipelined=PIPELINED):
+    start_time = time.time()
+    result = translate_document(input_file, output_file, limiter=_shared_limiter,
+                                use_asyncio=use_asyncio, incremental=incremental, pipelined=pipelined)
+    result["seconds"] = round(time.time() - start_time, 3)
+    return result
 
-    print(f"="*90)
-    print(f"儲存翻譯結果 → {output_file}")
-    doc.save(output_file)
-    print("翻譯完成！")
+def batch_translate(patterns, output_dir, processes=BATCH_PROCESSES, force=False,
+                    use_asyncio=USE_ASYNCIO, incremental=INCREMENTAL, pipelined=PIPELINED):
+    """
+    批次翻譯多份文件
+    - 以行程池分配文件，所有行程共用同一個限速器與翻譯記憶庫（SQLite）
+    - 原檔雜湊與上次相同且輸出存在時略過（續跑），force=True 時全部重做
+    - 每份文件寫一行 JSON 到 output_dir/translation_report.jsonl
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_path = output_dir / BATCH_REPORT_NAME
+    state_path = output_dir / BATCH_STATE_NAME
+    state = json.loads(state_path.read_text(encoding='utf-8')) if state_path.exists() else {}
+
+    def write_report(record):
+        record["time"] = f"{datetime.now():%Y-%m-%d %H:%M:%S}"
+        with report_path.open('a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    jobs = {}
+    summary = {"done": 0, "skipped": 0, "failed": 0}
+    for input_file in expand_inputs(patterns):
+        output_file = output_dir / f"{input_file.stem}_bilingual.docx"
+        source_hash = file_sha256(input_file)
+        key = str(input_file.resolve())
+        if not force and output_file.exists() and state.get(key, {}).get("sha256") == source_hash:
+            summary["skipped"] += 1
+            write_report({"input": str(input_file), "output": str(output_file),
+                          "status": "skipped", "sha256": source_hash})
+            continue
+        jobs[input_file] = (output_file, source_hash)
+
+    print(f"共 {len(jobs) + summary['skipped']} 份文件，略過未變更 {summary['skipped']} 份，"
+          f"以 {processes} 個行程處理 {len(jobs)} 份")
+
+    if jobs:
+        limiter = SharedTokenBucket(REQUESTS_PER_SECOND)
+        with ProcessPoolExecutor(max_workers=min(processes, len(jobs)),
+                                 initializer=_init_batch_worker, initargs=(limiter,)) as pool:
+            futures = {
+                pool.submit(_translate_batch_item, input_file, output_file, use_asyncio, incremental,
+                            pipelined): input_file
+                for input_file, (output_file, _) in jobs.items()
+            }
+            for future in as_completed(futures):
+                input_file = futures[future]
+                output_file, source_hash = jobs[input_file]
+                record = {"input": str(input_file), "output": str(output_file), "sha256": source_hash}
+                try:
+                    record.update(future.result())
+                    record["status"] = "done"
+                    summary["done"] += 1
+                    state[str(input_file.resolve())] = {"sha256": source_hash, "output": str(output_file)}
+                    state_path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
+                except Exception as e:
+                    record.update({"status": "failed", "error": str(e)})
+                    summary["failed"] += 1
+                    print(f"翻譯失敗: {input_file} - {e}")
+                write_report(record)
+
+    return summary
 
 # ==================== 一鍵執行 ====================
 if __name__ == "__main__":
+    os.system('cls' if os.name == 'nt' else 'clear')
 
     print(f'多語文檔轉譯專案 (使用 Deep Translator - 雙語版本)\n')
 
     # ===================== 主程式執行 =====================
-    test_file = Path(("document_cn.docx"))
-
-
-    output_file = Path(("out_bilingual.docx"))
-    print(f"輸出檔案：{output_file}\n")
+    arg_parser = argparse.ArgumentParser(description='DOCX 中英雙語翻譯（可批次處理整個資料夾）')
+    arg_parser.add_argument('inputs', nargs='*', default=['document_cn.docx'],
+                            help='DOCX 檔案、資料夾或 glob（例如 "docs/**/*.docx"）')
+    arg_parser.add_argument('-o', '--output-dir', default='.', help='輸出資料夾')
+    arg_parser.add_argument('-j', '--processes', type=int, default=BATCH_PROCESSES, help='同時處理的文件數')
+    arg_parser.add_argument('--force', action='store_true', help='忽略續跑紀錄，全部重新翻譯')
+    arg_parser.add_argument('--asyncio', action='store_true', help='以 asyncio 管線併發翻譯')
+    arg_parser.add_argument('--incremental', action='store_true',
+                            help='增量翻譯：只重新翻譯與上一版輸出相比有變更的段落')
+    arg_parser.add_argument('--no-pipeline', action='store_true',
+                            help='停用管線模式：全部翻譯完成後才統一寫入與調整格式')
+    args = arg_parser.parse_args()
 
     start_time = time.time()
 
-    translate_document(test_file, output_file)
+    summary = batch_translate(args.inputs, args.output_dir, processes=args.processes, force=args.force,
+                              use_asyncio=args.asyncio, incremental=args.incremental,
+                              pipelined=not args.no_pipeline)
 
     total_time = time.time() - start_time
+    print(f"完成 {summary['done']} 份，略過 {summary['skipped']} 份，失敗 {summary['failed']} 份")
     print(f"總耗時：{total_time:.2f} 秒（{total_time/60:.2f} 分鐘）")
-
-    from datetime import datetime
-    with open("翻譯時間紀錄.log", "a", encoding="utf-8") as f:
-        f.write(f"{datetime.now():%Y-%m-%d %H:%M:%S} | [DeepTranslator-Bilingual] | 總耗時: {total_time/60:.2f} 分鐘\n")
-
+    print(f"耗時報告：{Path(args.output_dir) / BATCH_REPORT_NAME}")
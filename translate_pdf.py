@@ -2,82 +2,429 @@
 """
 PDF 轉換與翻譯腳本
 將 PDF 轉換為 DOCX，然後翻譯成繁體中文
+--direct 時不經 DOCX，直接以 PyMuPDF 擷取文字層翻譯，輸出覆蓋譯文的 PDF、左右對照 PDF 或純文字
 """
 
 from pdf2docx import Converter
 from docx import Document
 from googletrans import Translator
-import time
+from translation_engine import TranslationEngine
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import argparse
+import fitz  # PyMuPDF
+import os
 import sys
+import tempfile
+import time
 
-def pdf_to_docx(pdf_path, docx_path):
-    """將 PDF 轉換為 DOCX"""
-    print(f"正在將 {pdf_path} 轉換為 DOCX...")
+# 分段平行轉換用到 pdf2docx 0.5 的內部模組（見 requirements.txt 的版本限制），
+# 其他版本缺少時改用公開的 Converter.convert
+try:
+    from pdf2docx.font.Fonts import Fonts
+    from pdf2docx.page.RawPageFactory import RawPageFactory
+except ImportError:
+    Fonts = RawPageFactory = None
+
+# ==================== 設定區 ====================
+MAX_WORKERS = 4                 # 同時進行的翻譯請求數
+REQUESTS_PER_SECOND = 2         # 令牌桶限速（每秒請求數，取代每次請求後固定 sleep 0.5 秒）
+TARGET_LANGUAGE = 'zh-tw'
+CONVERT_WORKERS = 4             # PDF 轉 DOCX 的工作行程數
+PAGES_PER_PART = 10             # 每個工作行程一次轉換的頁數（每段完成後即可開始翻譯）
+SLOW_PAGES_SHOWN = 5            # 轉換完成後列出最慢的頁數
+DIRECT_MODES = ('overlay', 'side_by_side', 'text')  # 直接翻譯 PDF 文字層的輸出方式
+MIN_OVERLAY_FONT_SIZE = 4       # 譯文放不進原區塊時最多縮小到的字級
+
+class GoogleTransBackend:
+    """googletrans 翻譯器包裝成 TranslationEngine 需要的 translate(text) -> str"""
+
+    def __init__(self, dest=TARGET_LANGUAGE):
+        self.translator = Translator()
+        self.dest = dest
+
+    def translate(self, text):
+        return self.translator.translate(text, src='auto', dest=self.dest).text
+
+def _block_text(block):
+    """文字區塊寫入 DOCX 後的段落文字（與 pdf2docx 的 Line.make_docx 相同：定位點 + 各 span + 換行）"""
+    if not block.is_text_block:
+        return ""  # 行內圖片段落沒有文字
+    return "".join("\t" * line.tab_stop + line.raw_text + ("\n" if line.line_break else "")
+                   for line in block.lines)
+
+def _layout_texts(blocks, paragraphs, cells):
+    """
+    從已解析的版面收集 DOCX 中會出現的段落文字與儲存格文字（與 collect_translatable 的結果相同），
+    不必另外產生一份 DOCX 再讀回
+    """
+    for block in blocks:
+        if block.is_text_image_block:
+            paragraphs.append(_block_text(block))
+        elif block.is_table_block:
+            for row in block:
+                for cell in row:
+                    if not cell:  # 被合併的儲存格
+                        continue
+                    # 儲存格文字 = 各段落以換行相接（巢狀表格的段落不計入，與 python-docx 的 cell.text 相同）
+                    cells.append("\n".join(_block_text(b) for b in cell.blocks if b.is_text_image_block))
+                    _layout_texts([b for b in cell.blocks if b.is_table_block], [], cells)
+
+def _has_pdf2docx_internals():
+    """分段轉換需要的 pdf2docx 內部介面是否都存在"""
+    if Fonts is None or RawPageFactory is None:
+        return False
+    return (hasattr(Fonts, 'extract') and hasattr(RawPageFactory, 'create')
+            and all(hasattr(Converter, name) for name in
+                    ('load_pages', 'serialize', 'deserialize', 'make_docx', 'default_settings')))
+
+def _convert_whole(pdf_path, docx_path, workers, total_pages, on_part):
+    """以公開的 Converter.convert 一次轉換整份 PDF（無法分段時使用），轉換完成後一次交出全部文字"""
     cv = Converter(pdf_path)
-    cv.convert(docx_path, start=0, end=None)
-    cv.close()
-    print(f"轉換完成，保存為 {docx_path}")
+    try:
+        cv.convert(docx_path, multi_processing=workers > 1 and total_pages > 1, cpu_count=workers)
+    finally:
+        cv.close()
+    if on_part is not None:
+        paragraphs, cells = collect_translatable(Document(docx_path))
+        on_part([paragraph.text for paragraph in paragraphs] + [cell.text for cell in cells])
 
-def translate_docx(input_docx, output_docx):
-    """翻譯 DOCX 文件內容為繁體中文"""
-    print(f"正在讀取 {input_docx}...")
-    doc = Document(input_docx)
-    translator = Translator()
+def _convert_page_range(pdf_path, start, end, fonts, json_path, collect_texts=False):
+    """
+    工作行程：解析第 start ~ end-1 頁（0 起算），結果以 pdf2docx 的 JSON 格式序列化到 json_path
+    fonts: 主行程擷取一次的字型資訊；pdf2docx 的 parse_document 每次都會掃描整份 PDF 的字型，
+           各段各自呼叫時總成本會隨頁數平方成長，因此這裡逐頁進行與 Pages.parse 相同的文件分析步驟
+    回傳 (每頁耗時 {頁碼: (原始內容擷取秒數, 版面解析秒數)}, 該段可翻譯的文字（collect_texts 為 True 時）)
+    """
+    cv = Converter(pdf_path)
+    try:
+        settings = cv.default_settings
+        cv.load_pages(start, end)
 
-    print("開始翻譯...")
-    total_paragraphs = len(doc.paragraphs)
+        page_times = {}
+        for page in cv.pages:
+            if page.skip_parsing:
+                continue
+            # 原始內容擷取：文字 / 圖形 / 圖片、清理區塊、字型、邊界與分節（掃描頁或向量圖形多的頁面慢在這裡）
+            extract_start = time.perf_counter()
+            raw_page = RawPageFactory.create(page_engine=cv.fitz_doc[page.id], backend='PyMuPDF')
+            raw_page.restore(**settings)
+            raw_page.clean_up(**settings)
+            raw_page.process_font(fonts)
+            page.width, page.height = raw_page.width, raw_page.height
+            page.float_images.reset().extend(raw_page.blocks.floating_image_blocks)
+            raw_page.margin = page.margin = raw_page.calculate_margin(**settings)
+            page.sections.extend(raw_page.parse_section(**settings))
+            extract_seconds = time.perf_counter() - extract_start
 
-    # 翻譯段落
-    for i, paragraph in enumerate(doc.paragraphs):
-        if paragraph.text.strip():
+            # 版面解析（與 Converter.parse_pages 相同：單頁失敗時略過該頁）
+            parse_start = time.perf_counter()
             try:
-                # 保留原始格式
-                original_text = paragraph.text
-                print(f"翻譯段落 {i+1}/{total_paragraphs}: {original_text[:50]}...")
+                page.parse(**settings)
+            except Exception as e:
+                print(f"第 {page.id + 1} 頁轉換失敗，略過: {e}")
+            page_times[page.id + 1] = (extract_seconds, time.perf_counter() - parse_start)
 
-                # 翻譯為繁體中文
-                translated = translator.translate(original_text, src='auto', dest='zh-tw')
-                paragraph.text = translated.text
+        cv.serialize(json_path)
+        paragraphs, cells = [], []
+        if collect_texts:
+            for page in cv.pages:
+                if page.finalized:
+                    for section in page.sections:
+                        for column in section:
+                            _layout_texts(column.blocks, paragraphs, cells)
+    finally:
+        cv.close()
 
-                # 避免 API 請求過快
-                time.sleep(0.5)
+    texts = [text for text in paragraphs if text.strip()] + [text for text in cells if text.strip()]
+    return page_times, texts
 
-            except Exception as e:
-                print(f"翻譯段落 {i+1} 時發生錯誤: {e}")
-                continue
+def pdf_to_docx(pdf_path, docx_path, workers=CONVERT_WORKERS, pages_per_part=PAGES_PER_PART, on_part=None):
+    """
+    將 PDF 轉換為 DOCX
+    依 pages_per_part 頁切成多段交給工作行程平行解析，再依頁序合併成一份 DOCX
+    on_part(texts): 每段解析完成時依頁序呼叫（例如在翻譯執行緒預先翻譯該段文字，與後續段落的轉換重疊）
+    回傳每頁耗時 {頁碼: (原始內容擷取秒數, 版面解析秒數)}，並列出最慢的幾頁（掃描頁或向量圖形很多的頁面）
+    pdf2docx 版本不符、缺少分段轉換需要的內部介面時，改以 Converter.convert 整份轉換（不回傳每頁耗時）
+    """
+    print(f"正在將 {pdf_path} 轉換為 DOCX...")
+    with fitz.open(pdf_path) as pdf:
+        total_pages = len(pdf)
+        if not _has_pdf2docx_internals():
+            print("pdf2docx 缺少分段轉換需要的介面，改為整份轉換")
+            _convert_whole(pdf_path, docx_path, workers, total_pages, on_part)
+            print(f"轉換完成，保存為 {docx_path}（共 {total_pages} 頁）")
+            return {}
+        fonts = Fonts.extract(pdf)  # 字型只擷取一次，傳給各工作行程
+    ranges = [(start, min(start + pages_per_part, total_pages)) for start in range(0, total_pages, pages_per_part)]
 
-    # 翻譯表格
-    for table in doc.tables:
-        for row in table.rows:
-            for cell in row.cells:
-                if cell.text.strip():
-                    try:
-                        original_text = cell.text
-                        print(f"翻譯表格內容: {original_text[:30]}...")
-                        translated = translator.translate(original_text, src='auto', dest='zh-tw')
-                        cell.text = translated.text
-                        time.sleep(0.5)
-                    except Exception as e:
-                        print(f"翻譯表格時發生錯誤: {e}")
-                        continue
+    page_times = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_paths = [os.path.join(tmp_dir, f"pages-{i}.json") for i in range(len(ranges))]
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(ranges)))) as pool:
+            futures = [pool.submit(_convert_page_range, pdf_path, start, end, fonts, json_path,
+                                   on_part is not None)
+                       for (start, end), json_path in zip(ranges, json_paths)]
+            for (start, end), future in zip(ranges, futures):
+                times, texts = future.result()
+                page_times.update(times)
+                print(f"第 {start + 1}-{end} 頁轉換完成（原始內容擷取 {sum(t[0] for t in times.values()):.1f} 秒，"
+                      f"版面解析 {sum(t[1] for t in times.values()):.1f} 秒）")
+                if on_part is not None:
+                    on_part(texts)
+
+        # 合併各段解析結果後一次產生 DOCX
+        cv = Converter(pdf_path)
+        for json_path in json_paths:
+            cv.deserialize(json_path)
+        cv.make_docx(docx_path, **cv.default_settings)
+        cv.close()
+
+    slowest = sorted(page_times.items(), key=lambda item: sum(item[1]), reverse=True)[:SLOW_PAGES_SHOWN]
+    print(f"轉換完成，保存為 {docx_path}（共 {total_pages} 頁）")
+    if slowest:
+        print("最慢的頁面: " + "、".join(f"第 {page} 頁 {extract + parse:.2f} 秒（擷取 {extract:.2f}、解析 {parse:.2f}）"
+                                       for page, (extract, parse) in slowest))
+    return page_times
+
+def unique_cells(table):
+    """
+    表格中不重複的儲存格
+    合併儲存格會在 row.cells 中重複出現（不同的 _Cell 物件指向同一個 w:tc），以 w:tc 去重
+    """
+    seen = set()
+    cells = []
+    for row in table.rows:
+        for cell in row.cells:
+            if id(cell._tc) not in seen:
+                seen.add(id(cell._tc))
+                cells.append(cell)
+    return cells
+
+def collect_translatable(doc):
+    """需要翻譯的段落與儲存格（合併儲存格只出現一次）"""
+    paragraphs = [paragraph for paragraph in doc.paragraphs if paragraph.text.strip()]
+    cells = [cell for table in doc.tables for cell in unique_cells(table) if cell.text.strip()]
+    return paragraphs, cells
+
+def make_engine(max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, backend_factory=None):
+    # pdf2docx 的段落每行是一個版面行 → 拆行送出，與其他行共用批次
+    return TranslationEngine(backend_factory or GoogleTransBackend, max_workers=max_workers, rate=rate,
+                             split_lines=True)
+
+def translate_docx(input_docx, output_docx, max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND,
+                   backend_factory=None, engine=None):
+    """
+    翻譯 DOCX 文件內容為繁體中文
+    先收集所有段落與表格儲存格的文字，去重後交給 TranslationEngine 批次併發翻譯
+    （同時請求數上限 max_workers，令牌桶限速 rate 次 / 秒），再依序寫回
+    backend_factory: 自訂翻譯器建立函式（例如 translation_engine.FakeTranslator 用於基準測試）
+    engine: 沿用已預先翻譯過部分文字的引擎（見 convert_and_translate）
+    """
+    print(f"正在讀取 {input_docx}...")
+    doc = Document(input_docx)
+    if engine is None:
+        engine = make_engine(max_workers, rate, backend_factory)
+
+    # 收集需要翻譯的段落與儲存格（同一表格中重複的文字、合併儲存格都只翻譯一次）
+    paragraphs, cells = collect_translatable(doc)
+    texts = [paragraph.text for paragraph in paragraphs] + [cell.text for cell in cells]
+
+    print(f"開始翻譯: {len(paragraphs)} 個段落、{len(cells)} 個儲存格（不重複文字 {len(set(texts))} 筆）...")
+    engine.prefetch(texts)
+    print(f"翻譯請求 {engine.stats['requests']} 次")
+
+    # 寫回譯文（翻譯失敗的文字保留原文）
+    for paragraph in paragraphs:
+        paragraph.text = engine.results.get(paragraph.text, paragraph.text)
+    for cell in cells:
+        cell.text = engine.results.get(cell.text, cell.text)
 
     # 保存翻譯後的文件
     print(f"保存翻譯後的文件至 {output_docx}...")
     doc.save(output_docx)
     print("翻譯完成！")
 
+def convert_and_translate(pdf_path, temp_docx, output_docx, workers=CONVERT_WORKERS,
+                          max_workers=MAX_WORKERS, rate=REQUESTS_PER_SECOND, backend_factory=None):
+    """
+    轉換與翻譯重疊進行：第 N 段頁面轉換完成後，即在翻譯執行緒預先翻譯該段文字，
+    同時工作行程繼續轉換第 N+1 段；全部完成後寫回譯文（已翻譯的文字不再送出請求）
+    """
+    engine = make_engine(max_workers, rate, backend_factory)
+    with ThreadPoolExecutor(max_workers=1) as translating:
+        prefetches = []
+        pdf_to_docx(pdf_path, temp_docx, workers=workers,
+                    on_part=lambda texts: prefetches.append(translating.submit(engine.prefetch, texts)))
+        for prefetch in prefetches:
+            prefetch.result()
+    translate_docx(temp_docx, output_docx, engine=engine)
+
+# ===================== 直接翻譯 PDF 文字層 =====================
+
+def _join_lines(lines):
+    """區塊內各行合併為一段：英數字之間補空格，中文直接相接"""
+    text = ""
+    for line in lines:
+        if text and text[-1].isascii() and line[0].isascii():
+            text += " "
+        text += line
+    return text
+
+def _line_units(block):
+    """
+    區塊內的行分組為可翻譯的單位：行在上一行下方且左緣對齊時視為同一段，
+    否則（例如同一列的表格儲存格）另起一段
+    回傳 [(範圍, [行文字], [字級])]
+    """
+    units = []
+    for line in block["lines"]:
+        text = "".join(span["text"] for span in line["spans"]).strip()
+        if not text:
+            continue
+        bbox = fitz.Rect(line["bbox"])
+        sizes = [round(span["size"], 1) for span in line["spans"] if span["text"].strip()]
+        if units:
+            rect, texts, unit_sizes = units[-1]
+            if bbox.y0 >= rect.y1 - max(sizes) / 2 and abs(bbox.x0 - rect.x0) <= max(sizes):
+                units[-1][0] = rect | bbox
+                texts.append(text)
+                unit_sizes.extend(sizes)
+                continue
+        units.append([bbox, [text], sizes])
+    return units
+
+def extract_text_blocks(pdf_path):
+    """
+    以 PyMuPDF 擷取每頁的文字區塊（段落或表格儲存格），不重建版面
+    回傳 [{"page": 頁索引, "bbox": 區塊範圍, "text": 文字, "size": 最常見的字級}]
+    """
+    blocks = []
+    with fitz.open(pdf_path) as pdf:
+        for page in pdf:
+            for block in page.get_text("dict", flags=fitz.TEXTFLAGS_TEXT)["blocks"]:
+                if block["type"] != 0:
+                    continue
+                for rect, lines, sizes in _line_units(block):
+                    blocks.append({
+                        "page": page.number,
+                        "bbox": tuple(rect),
+                        "text": _join_lines(lines),
+                        "size": max(set(sizes), key=sizes.count),
+                    })
+    return blocks
+
+def _text_area(block, page_blocks, page_rect):
+    """
+    譯文可用的範圍：原區塊往右延伸到同一列下一個區塊（例如右邊的儲存格）之前，
+    沒有時延伸到與左邊界對稱的右邊界；稍微加高以容納字型的行高
+    """
+    x0, y0, x1, y1 = block["bbox"]
+    right = page_rect.x1 - min(other["bbox"][0] for other in page_blocks)
+    for other in page_blocks:
+        ox0, oy0, _, oy1 = other["bbox"]
+        if other is not block and ox0 >= x1 and oy0 < y1 and oy1 > y0:
+            right = min(right, ox0 - block["size"] / 2)
+    return fitz.Rect(x0, y0, max(x1, right), y1 + block["size"] * 0.3)
+
+def _insert_fitted_text(page, rect, text, size):
+    """在 rect 內寫入文字，放不下時逐步縮小字級；縮到下限仍放不下則往下延伸到頁底"""
+    while size > MIN_OVERLAY_FONT_SIZE:
+        if page.insert_textbox(rect, text, fontsize=size, fontname="cjk") >= 0:
+            return
+        size = max(size * 0.9, MIN_OVERLAY_FONT_SIZE)
+    rect = fitz.Rect(rect.x0, rect.y0, rect.x1, page.rect.y1)
+    page.insert_textbox(rect, text, fontsize=MIN_OVERLAY_FONT_SIZE, fontname="cjk")
+
+def _overlay_translations(pdf_path, blocks, translations):
+    """
+    刪除原文字（保留圖片與線條），在原區塊範圍內寫入譯文
+    譯文字型為 PyMuPDF 內建的 CJK 字型（含中英文），整份文件共用一份，存檔前需 subset_fonts()
+    """
+    doc = fitz.open(pdf_path)
+    font_buffer = fitz.Font("cjk").buffer
+    by_page = {}
+    for block in blocks:
+        by_page.setdefault(block["page"], []).append(block)
+
+    for page_number, page_blocks in by_page.items():
+        page = doc[page_number]
+        for block in page_blocks:
+            page.add_redact_annot(fitz.Rect(block["bbox"]))
+        page.apply_redactions(images=fitz.PDF_REDACT_IMAGE_NONE, graphics=fitz.PDF_REDACT_LINE_ART_NONE)
+        page.insert_font(fontname="cjk", fontbuffer=font_buffer)
+        for block in page_blocks:
+            _insert_fitted_text(page, _text_area(block, page_blocks, page.rect),
+                                translations[block["text"]], block["size"])
+    doc.subset_fonts()
+    return doc
+
+def translate_pdf_direct(pdf_path, output_path, mode='overlay', max_workers=MAX_WORKERS,
+                         rate=REQUESTS_PER_SECOND, backend_factory=None):
+    """
+    直接翻譯 PDF 文字層（不轉 DOCX）：擷取文字區塊 → 去重後批次翻譯 → 依 mode 輸出
+    mode: overlay 在原版面覆蓋譯文 / side_by_side 左原文右譯文 / text 純文字（依頁分段）
+    掃描頁沒有文字層，不會被翻譯
+    """
+    if mode not in DIRECT_MODES:
+        raise ValueError(f"mode 必須是 {DIRECT_MODES} 之一: {mode}")
+
+    print(f"正在擷取 {pdf_path} 的文字層...")
+    blocks = extract_text_blocks(pdf_path)
+    texts = [block["text"] for block in blocks]
+    engine = make_engine(max_workers, rate, backend_factory)
+    print(f"開始翻譯: {len(blocks)} 個文字區塊（不重複文字 {len(set(texts))} 筆）...")
+    engine.prefetch(texts)
+    print(f"翻譯請求 {engine.stats['requests']} 次")
+    # 翻譯失敗的文字保留原文
+    translations = {text: engine.results.get(text, text) for text in texts}
+
+    if mode == 'text':
+        pages = {}
+        for block in blocks:
+            pages.setdefault(block["page"], []).append(translations[block["text"]])
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for page_number, page_texts in pages.items():
+                f.write(f"=== 第 {page_number + 1} 頁 ===\n" + "\n".join(page_texts) + "\n\n")
+    else:
+        translated = _overlay_translations(pdf_path, blocks, translations)
+        if mode == 'side_by_side':
+            source = fitz.open(pdf_path)
+            output = fitz.open()
+            for page in source:
+                width, height = page.rect.width, page.rect.height
+                pair = output.new_page(width=width * 2, height=height)
+                pair.show_pdf_page(fitz.Rect(0, 0, width, height), source, page.number)
+                pair.show_pdf_page(fitz.Rect(width, 0, width * 2, height), translated, page.number)
+            output.save(output_path, garbage=3, deflate=True)
+            output.close()
+            source.close()
+        else:
+            translated.save(output_path, garbage=3, deflate=True)
+        translated.close()
+    print(f"翻譯完成，保存為 {output_path}")
+
 def main():
+    parser = argparse.ArgumentParser(description="PDF 轉換與翻譯")
+    parser.add_argument('pdf', nargs='?', default="ysm20r.pdf", help="輸入 PDF")
+    parser.add_argument('--direct', choices=DIRECT_MODES,
+                        help="不經 DOCX，直接翻譯 PDF 文字層（overlay / side_by_side / text）")
+    args = parser.parse_args()
+
     # 設定文件路徑
-    pdf_path = "ysm20r.pdf"
-    temp_docx = "ysm20r_temp.docx"
-    output_docx = "ysm20r_translated.docx"
+    pdf_path = args.pdf
+    stem = os.path.splitext(pdf_path)[0]
+    temp_docx = f"{stem}_temp.docx"
+    output_docx = f"{stem}_translated.docx"
 
     try:
-        # 步驟 1: PDF 轉 DOCX
-        pdf_to_docx(pdf_path, temp_docx)
+        if args.direct:
+            output_path = f"{stem}_translated.txt" if args.direct == 'text' else f"{stem}_{args.direct}.pdf"
+            translate_pdf_direct(pdf_path, output_path, mode=args.direct)
+            print(f"\n✓ 完成！翻譯後的文件: {output_path}")
+            return
 
-        # 步驟 2: 翻譯 DOCX
-        translate_docx(temp_docx, output_docx)
+        # 步驟 1 + 2: PDF 轉 DOCX（分頁平行），每段轉換完成即開始翻譯
+        convert_and_translate(pdf_path, temp_docx, output_docx)
 
         print(f"\n✓ 完成！翻譯後的文件: {output_docx}")
 
@@ -0,0 +1,527 @@
+# translation_engine.py
+# 批次翻譯引擎：先收集全部字串、去重、打包成批次，再以有限併發 + 令牌桶限速送出
+
+import asyncio
+import multiprocessing
+import random
+import threading
+import time
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+
+# ==================== 設定區 ====================
+# deep_translator 有字數限制（通常 5000 字），保留安全餘量
+MAX_LENGTH = 4500
+# 批次內各字串的分隔符（翻譯器會逐行保留）
+BATCH_SEPARATOR = '\n'
+# asyncio 模式：失敗重試次數與指數退避起始秒數
+RETRIES = 3
+RETRY_BACKOFF = 0.5
+
+# ===================== 令牌桶限速 =====================
+
+class TokenBucket:
+    """
+    令牌桶限速器
+    rate: 每秒補充的令牌數（None 或 0 表示不限速）
+    capacity: 可累積的突發請求數
+    """
+
+    def __init__(self, rate=5.0, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate or 1.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def try_acquire(self, tokens=1.0):
+        """嘗試取得令牌：成功回傳 0，否則回傳需等待的秒數（不阻塞，供 asyncio 使用）"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens=1.0):
+        """取得令牌，不足時阻塞等待"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+class SharedTokenBucket:
+    """
+    跨行程共用的令牌桶（狀態放在 multiprocessing 共享記憶體）
+    建立後透過行程池的 initializer 傳給各工作行程，所有文件共用同一個請求額度
+    """
+
+    def __init__(self, rate=5.0, capacity=None, ctx=None):
+        ctx = ctx or multiprocessing
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate or 1.0)
+        self._tokens = ctx.Value('d', self.capacity, lock=False)
+        self._last = ctx.Value('d', time.monotonic(), lock=False)
+        self._lock = ctx.Lock()
+
+    def try_acquire(self, tokens=1.0):
+        """嘗試取得令牌：成功回傳 0，否則回傳需等待的秒數"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens.value = min(self.capacity,
+                                     self._tokens.value + (now - self._last.value) * self.rate)
+            self._last.value = now
+            if self._tokens.value >= tokens:
+                self._tokens.value -= tokens
+                return 0.0
+            return (tokens - self._tokens.value) / self.rate
+
+    def acquire(self, tokens=1.0):
+        """取得令牌，不足時阻塞等待"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+# ===================== 分段與打包 =====================
+
+def split_long_text(text, max_length=MAX_LENGTH):
+    """超過長度限制的文字依換行分段"""
+    chunks = []
+    current_chunk = ""
+
+    for sentence in text.split('\n'):
+        if len(current_chunk) + len(sentence) + 1 <= max_length:
+            current_chunk += sentence + '\n'
+        else:
+            if current_chunk:
+                chunks.append(current_chunk.strip())
+            current_chunk = sentence + '\n'
+
+    if current_chunk:
+        chunks.append(current_chunk.strip())
+
+    return [chunk for chunk in chunks if chunk]
+
+def pack_batches(texts, max_length=MAX_LENGTH, separator=BATCH_SEPARATOR):
+    """
+    將字串打包成不超過 max_length 的批次
+    含分隔符或過長的字串單獨成批
+    """
+    batches = []
+    current = []
+    current_length = 0
+
+    for text in texts:
+        if separator in text or len(text) > max_length:
+            batches.append([text])
+            continue
+
+        added = len(text) + (len(separator) if current else 0)
+        if current and current_length + added > max_length:
+            batches.append(current)
+            current = []
+            current_length = 0
+            added = len(text)
+
+        current.append(text)
+        current_length += added
+
+    if current:
+        batches.append(current)
+
+    return batches
+
+def gather_futures(futures, before_done=None):
+    """
+    回傳一個在 futures 全部完成時完成的 Future（結果為 None）
+    before_done: 全部完成後、設定結果之前呼叫（等待者看到完成時已處理完畢）
+    任一個 future 或 before_done 失敗時，回傳的 Future 以第一個例外完成（不會永遠等不到）
+    """
+    done = Future()
+    remaining = [len(futures)]
+    errors = []
+    lock = threading.Lock()
+
+    def complete():
+        if not errors and before_done is not None:
+            try:
+                before_done()
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            done.set_exception(errors[0])
+        else:
+            done.set_result(None)
+
+    def finish(future):
+        error = future.exception() if not future.cancelled() else CancelledError()
+        with lock:
+            if error is not None:
+                errors.append(error)
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            complete()
+
+    if not futures:
+        complete()
+    for future in futures:
+        future.add_done_callback(finish)
+    return done
+
+# ===================== 翻譯引擎 =====================
+
+class TranslationEngine:
+    """
+    批次翻譯引擎
+    backend_factory: 建立翻譯器的函式（每個工作執行緒各自建立一個實例），
+                     翻譯器需提供 translate(text) -> str
+    memory: 選用的 TranslationMemory，翻譯前先查詢、翻譯後寫回
+    limiter: 選用的外部限速器（例如多行程共用的 SharedTokenBucket），未指定時依 rate 建立
+    split_lines: 多行字串拆成各行送出（PDF 轉出的段落每行是一個版面行）；
+                 預設關閉，DOCX 段落內的換行連同整段一起翻譯
+    """
+
+    def __init__(self, backend_factory, max_workers=4, rate=5.0,
+                 max_length=MAX_LENGTH, separator=BATCH_SEPARATOR, memory=None, limiter=None,
+                 split_lines=False):
+        self.backend_factory = backend_factory
+        self.split_lines = split_lines
+        self.memory = memory
+        self.max_workers = max_workers
+        self.max_length = max_length
+        self.separator = separator
+        self.limiter = limiter if limiter is not None else TokenBucket(rate)
+        self.results = {}
+        self.stats = {"requests": 0, "texts": 0, "fallbacks": 0}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._executor = None   # submit() 使用的常駐執行緒池
+        self._inflight = {}     # 已送出、尚未完成的字串 -> 所屬批次的 Future
+        self._is_async = None   # 翻譯器是否提供 atranslate（asyncio 模式第一次使用時判斷一次）
+
+    def _backend(self):
+        backend = getattr(self._local, 'backend', None)
+        if backend is None:
+            backend = self.backend_factory()
+            self._local.backend = backend
+        return backend
+
+    def _call_backend(self, text):
+        self.limiter.acquire()
+        with self._lock:
+            self.stats["requests"] += 1
+        return self._backend().translate(text)
+
+    def _translate_single(self, text):
+        """翻譯單一字串（過長時分段），失敗時返回原文"""
+        try:
+            if len(text) > self.max_length:
+                translated = '\n'.join(
+                    self._call_backend(chunk) for chunk in split_long_text(text, self.max_length)
+                )
+            else:
+                translated = self._call_backend(text)
+        except Exception as e:
+            print(f"翻譯錯誤: {text[:50]}... - {str(e)}")
+            return text
+
+        if translated is None:
+            return text
+        with self._lock:
+            self.results[text] = translated
+        return translated
+
+    def _run_batch(self, batch):
+        if len(batch) == 1:
+            self._translate_single(batch[0])
+            return
+
+        try:
+            translated = self._call_backend(self.separator.join(batch))
+            parts = translated.split(self.separator) if translated else []
+        except Exception as e:
+            print(f"批次翻譯錯誤（{len(batch)} 筆），改為逐筆翻譯 - {str(e)}")
+            parts = []
+
+        if len(parts) != len(batch):
+            # 分隔符被翻譯器合併或拆開 → 逐筆翻譯
+            with self._lock:
+                self.stats["fallbacks"] += 1
+            for text in batch:
+                self._translate_single(text)
+            return
+
+        with self._lock:
+            for text, part in zip(batch, parts):
+                self.results[text] = part.strip()
+
+    def _plan(self, texts):
+        """
+        去重、查翻譯記憶庫，回傳 (實際要送出的字串, {多行字串: 各行})
+        split_lines 開啟時，含分隔符的字串（例如 pdf2docx 的多行段落）拆成各行送出，與其他字串
+        共用批次，而不是整段單獨一次請求；各行譯文到齊後由 _join_lines 組回
+        """
+        pending = [text for text in dict.fromkeys(texts) if text and text not in self.results]
+        if pending and self.memory is not None:
+            # 翻譯記憶庫一次查詢整批
+            found = self.memory.get_many(pending)
+            self.results.update(found)
+            pending = [text for text in pending if text not in found]
+
+        units = []
+        multiline = {}
+        for text in pending:
+            if self.split_lines and self.separator in text:
+                lines = text.split(self.separator)
+                multiline[text] = lines
+                units.extend(line.strip() for line in lines if line.strip())
+            else:
+                units.append(text)
+        units = [unit for unit in dict.fromkeys(units) if unit not in self.results]
+
+        if not multiline:
+            return units, multiline
+
+        requested = set(pending)
+        lines = [unit for unit in units if unit not in requested]
+        if lines and self.memory is not None:
+            found = self.memory.get_many(lines)
+            self.results.update(found)
+            units = [unit for unit in units if unit not in found]
+        return units, multiline
+
+    def _join_lines(self, multiline):
+        """各行譯文都到齊的多行字串依原本的換行組回（保留每行前後空白），回傳 {多行字串: 譯文}"""
+        joined = {}
+        for text, lines in multiline.items():
+            parts = []
+            for line in lines:
+                core = line.strip()
+                if not core:
+                    parts.append(line)
+                    continue
+                if core not in self.results:
+                    break  # 有一行翻譯失敗 → 整段保留原文（與單行失敗相同）
+                start = line.index(core)
+                parts.append(line[:start] + self.results[core] + line[start + len(core):])
+            else:
+                joined[text] = self.separator.join(parts)
+        with self._lock:
+            self.results.update(joined)
+        return joined
+
+    def _remember(self, texts):
+        if texts and self.memory is not None:
+            self.memory.put_many({text: self.results[text] for text in texts if text in self.results})
+
+    def prefetch(self, texts):
+        """去重後批次翻譯全部字串，結果存入 self.results"""
+        pending, multiline = self._plan(texts)
+        if pending:
+            self.stats["texts"] += len(pending)
+            batches = pack_batches(pending, self.max_length, self.separator)
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                list(pool.map(self._run_batch, batches))
+        self._remember(pending + list(self._join_lines(multiline)))
+
+    # ---------- 分組送出（管線模式）----------
+
+    def _finish_batch(self, batch):
+        with self._lock:
+            for text in batch:
+                self._inflight.pop(text, None)
+        self._remember(batch)
+
+    def _finish_group(self, multiline):
+        self._remember(list(self._join_lines(multiline)))
+
+    def submit_many(self, groups):
+        """
+        送出多組字串（例如文件中的各個區域）後立即返回，每組回傳一個 Future，該組全部翻譯完成時完成
+        - 與 prefetch 相同：去重、查翻譯記憶庫、多行字串拆行，依組的順序打包批次（小的組共用批次，請求數與
+          prefetch 相同），在常駐執行緒池中以 max_workers 併發送出，前面的組先完成
+        - 已由先前送出、仍在翻譯中的字串不重複送出，改為等待該批次
+        用完後呼叫 close() 結束執行緒池
+        """
+        groups = [list(dict.fromkeys(text for text in texts if text)) for texts in groups]
+        units, multiline = self._plan(text for texts in groups for text in texts)
+        pending = []
+        futures = {}
+        with self._lock:
+            for unit in units:
+                if unit in self._inflight:
+                    futures[unit] = self._inflight[unit]
+                else:
+                    futures[unit] = None
+                    pending.append(unit)
+
+        if pending:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            self.stats["texts"] += len(pending)
+            for batch in pack_batches(pending, self.max_length, self.separator):
+                with self._lock:
+                    future = self._executor.submit(self._run_batch, batch)
+                    for text in batch:
+                        self._inflight[text] = future
+                future.add_done_callback(lambda _, batch=batch: self._finish_batch(batch))
+                for text in batch:
+                    futures[text] = future
+
+        results = []
+        for texts in groups:
+            group_multiline = {text: multiline[text] for text in texts if text in multiline}
+            group_units = [line.strip() for lines in group_multiline.values() for line in lines if line.strip()]
+            group_units += [text for text in texts if text not in multiline]
+            results.append(gather_futures({futures[unit] for unit in group_units if futures.get(unit) is not None},
+                                          before_done=lambda multiline=group_multiline: self._finish_group(multiline)))
+        return results
+
+    def submit(self, texts):
+        """送出一組字串，回傳該組全部翻譯完成時完成的 Future（見 submit_many）"""
+        return self.submit_many([texts])[0]
+
+    def close(self):
+        """結束 submit() 的執行緒池（等待已送出的批次）"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    # ---------- asyncio 模式 ----------
+
+    async def _detect_async(self):
+        """
+        判斷翻譯器是否提供 atranslate（每個引擎只判斷一次）
+        backend_factory 為類別時直接檢查類別；否則在工作執行緒建立一個實例檢查，
+        同步翻譯器的這個實例留給該執行緒之後的請求使用，不在事件迴圈執行緒多建一個
+        """
+        if self._is_async is None:
+            factory = self.backend_factory
+            if isinstance(factory, type):
+                self._is_async = hasattr(factory, 'atranslate')
+            else:
+                self._is_async = hasattr(await asyncio.to_thread(self._backend), 'atranslate')
+        return self._is_async
+
+    async def _acall_backend(self, text, retries, backoff):
+        """非同步呼叫翻譯器：限速 + 失敗時指數退避重試"""
+        for attempt in range(retries + 1):
+            while True:
+                wait = self.limiter.try_acquire()
+                if not wait:
+                    break
+                await asyncio.sleep(wait)
+            with self._lock:
+                self.stats["requests"] += 1
+
+            try:
+                if await self._detect_async():
+                    return await self._backend().atranslate(text)
+                # 同步翻譯器（例如 GoogleTranslator）交給執行緒，不阻塞事件迴圈
+                return await asyncio.to_thread(lambda: self._backend().translate(text))
+            except Exception as e:
+                if attempt >= retries:
+                    raise
+                delay = backoff * (2 ** attempt) * (1 + random.random() / 2)
+                print(f"翻譯請求失敗，{delay:.1f} 秒後重試（{attempt + 1}/{retries}）- {str(e)}")
+                await asyncio.sleep(delay)
+
+    async def _atranslate_single(self, text, retries, backoff):
+        try:
+            if len(text) > self.max_length:
+                parts = await asyncio.gather(*(
+                    self._acall_backend(chunk, retries, backoff)
+                    for chunk in split_long_text(text, self.max_length)
+                ))
+                translated = '\n'.join(parts)
+            else:
+                translated = await self._acall_backend(text, retries, backoff)
+        except Exception as e:
+            print(f"翻譯錯誤: {text[:50]}... - {str(e)}")
+            return
+        if translated is not None:
+            self.results[text] = translated
+
+    async def _arun_batch(self, batch, semaphore, retries, backoff):
+        async with semaphore:
+            if len(batch) == 1:
+                await self._atranslate_single(batch[0], retries, backoff)
+                return
+
+            try:
+                translated = await self._acall_backend(self.separator.join(batch), retries, backoff)
+                parts = translated.split(self.separator) if translated else []
+            except Exception as e:
+                print(f"批次翻譯錯誤（{len(batch)} 筆），改為逐筆翻譯 - {str(e)}")
+                parts = []
+
+        if len(parts) != len(batch):
+            self.stats["fallbacks"] += 1
+            await asyncio.gather(*(self._arun_batch([text], semaphore, retries, backoff) for text in batch))
+            return
+
+        for text, part in zip(batch, parts):
+            self.results[text] = part.strip()
+
+    async def aprefetch(self, texts, concurrency=None, retries=RETRIES, backoff=RETRY_BACKOFF):
+        """
+        asyncio 版 prefetch：所有批次同時送出，同時進行的請求數上限為 concurrency，
+        總耗時取決於最慢的批次而非所有請求的總和
+        """
+        pending, multiline = await asyncio.to_thread(self._plan, texts)
+        if pending:
+            self.stats["texts"] += len(pending)
+            await self._detect_async()  # 同時送出的請求開始前先判斷一次
+            semaphore = asyncio.Semaphore(concurrency or self.max_workers)
+            await asyncio.gather(*(
+                self._arun_batch(batch, semaphore, retries, backoff)
+                for batch in pack_batches(pending, self.max_length, self.separator)
+            ))
+        await asyncio.to_thread(self._remember, pending + list(self._join_lines(multiline)))
+
+    # ---------- 取得結果 ----------
+
+    def translate(self, text):
+        """取得翻譯結果；未預先翻譯的字串先查翻譯記憶庫，再呼叫翻譯器"""
+        cached = self.results.get(text)
+        if cached is not None:
+            return cached
+
+        if self.memory is not None:
+            remembered = self.memory.get(text)
+            if remembered is not None:
+                self.results[text] = remembered
+                return remembered
+
+        translated = self._translate_single(text)
+        if self.memory is not None and text in self.results:
+            self.memory.put(text, translated)
+        return translated
+
+# ===================== 本地假翻譯器（基準測試用）=====================
+
+class FakeTranslator:
+    """模擬網路延遲的本地翻譯器，逐行加上標記，不需連網"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+
+    def translate(self, text):
+        time.sleep(self.latency)
+        return '\n'.join(f"EN[{line}]" for line in text.split('\n'))
+
+class AsyncFakeTranslator(FakeTranslator):
+    """提供 atranslate 的假翻譯器，延遲以 asyncio.sleep 模擬（不佔用執行緒）"""
+
+    async def atranslate(self, text):
+        await asyncio.sleep(self.latency)
+        return '\n'.join(f"EN[{line}]" for line in text.split('\n'))
@@ -0,0 +1,178 @@
+# translation_memory.py
+# 持久化翻譯記憶庫（SQLite）：以正規化原文 + 語言對為鍵，LRU / 容量淘汰
+
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+# ==================== 設定區 ====================
+DEFAULT_MAX_ENTRIES = 200_000          # 最多保留筆數
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # 原文 + 譯文總大小上限
+
+# ===================== 原文正規化 =====================
+
+def normalize_text(text):
+    """全半形統一、去頭尾空白、連續空白合併為一個空格"""
+    text = unicodedata.normalize('NFKC', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+# ===================== 翻譯記憶庫 =====================
+
+class TranslationMemory:
+    """
+    SQLite 翻譯記憶庫
+    - get_many 以單一查詢批次取回整份文件的譯文
+    - 命中時更新 last_used，超過筆數或容量時淘汰最久未用的項目
+    - 筆數與總大小由觸發器維護在 tm_stats（多行程共用時也一致），寫入時不必掃描整張表
+    """
+
+    def __init__(self, path, source_lang='zh-TW', target_lang='en',
+                 max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.source_lang = source_lang
+        self.target_lang = target_lang
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tm ('
+            ' source_lang TEXT NOT NULL, target_lang TEXT NOT NULL, source TEXT NOT NULL,'
+            ' translated TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL,'
+            ' PRIMARY KEY (source_lang, target_lang, source))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS tm_last_used ON tm (last_used)')
+        self._create_stats()
+        self._conn.commit()
+
+    def _create_stats(self):
+        """筆數 / 總大小的計數列與維護它的觸發器；既有的記憶庫第一次開啟時掃描一次補上"""
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tm_stats ('
+            ' id INTEGER PRIMARY KEY CHECK (id = 0), entries INTEGER NOT NULL, bytes INTEGER NOT NULL)'
+        )
+        self._conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tm_stats_insert AFTER INSERT ON tm BEGIN'
+            ' UPDATE tm_stats SET entries = entries + 1, bytes = bytes + new.size; END'
+        )
+        self._conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tm_stats_delete AFTER DELETE ON tm BEGIN'
+            ' UPDATE tm_stats SET entries = entries - 1, bytes = bytes - old.size; END'
+        )
+        self._conn.execute(
+            'CREATE TRIGGER IF NOT EXISTS tm_stats_update AFTER UPDATE OF size ON tm BEGIN'
+            ' UPDATE tm_stats SET bytes = bytes + new.size - old.size; END'
+        )
+        # 先查計數列，已存在時不必掃描；多個行程同時第一次開啟時以 OR IGNORE 只留一列
+        if self._conn.execute('SELECT 1 FROM tm_stats').fetchone() is None:
+            self._conn.execute('INSERT OR IGNORE INTO tm_stats (id, entries, bytes)'
+                               ' SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM tm')
+
+    def _totals(self):
+        return self._conn.execute('SELECT entries, bytes FROM tm_stats').fetchone()
+
+    def get_many(self, texts):
+        """批次查詢，回傳 {原文: 譯文}（只含命中的項目）"""
+        keys = {}
+        for text in texts:
+            if text:
+                keys.setdefault(normalize_text(text), []).append(text)
+        if not keys:
+            return {}
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT source, translated FROM tm'
+                ' WHERE source_lang = ? AND target_lang = ?'
+                ' AND source IN (SELECT value FROM json_each(?))',
+                (self.source_lang, self.target_lang, json.dumps(list(keys), ensure_ascii=False)),
+            ).fetchall()
+
+            if rows:
+                self._conn.execute(
+                    'UPDATE tm SET last_used = ?'
+                    ' WHERE source_lang = ? AND target_lang = ?'
+                    ' AND source IN (SELECT value FROM json_each(?))',
+                    (time.time(), self.source_lang, self.target_lang,
+                     json.dumps([source for source, _ in rows], ensure_ascii=False)),
+                )
+                self._conn.commit()
+
+        found = {}
+        for source, translated in rows:
+            for text in keys[source]:
+                found[text] = translated
+
+        self.hits += len(rows)
+        self.misses += len(keys) - len(rows)
+        return found
+
+    def get(self, text):
+        return self.get_many([text]).get(text)
+
+    def put_many(self, pairs):
+        """寫入 {原文: 譯文}，寫入後檢查是否需要淘汰"""
+        now = time.time()
+        rows = []
+        for text, translated in pairs.items():
+            source = normalize_text(text)
+            if source and translated is not None:
+                size = len(source.encode('utf-8')) + len(translated.encode('utf-8'))
+                rows.append((self.source_lang, self.target_lang, source, translated, size, now))
+        if not rows:
+            return
+
+        with self._lock:
+            # 以 UPSERT 更新既有項目（INSERT OR REPLACE 的隱含刪除不會觸發刪除觸發器）
+            self._conn.executemany(
+                'INSERT INTO tm'
+                ' (source_lang, target_lang, source, translated, size, last_used)'
+                ' VALUES (?, ?, ?, ?, ?, ?)'
+                ' ON CONFLICT (source_lang, target_lang, source) DO UPDATE SET'
+                ' translated = excluded.translated, size = excluded.size, last_used = excluded.last_used',
+                rows,
+            )
+            self._evict()
+            self._conn.commit()
+
+    def put(self, text, translated):
+        self.put_many({text: translated})
+
+    def _evict(self):
+        """依 last_used 由舊到新淘汰，直到筆數與容量都在上限內（未超過上限時只讀取計數列）"""
+        count, total = self._totals()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+
+        excess_rows = max(0, count - self.max_entries)
+        excess_bytes = max(0, total - self.max_bytes)
+        removed_rows = 0
+        removed_bytes = 0
+        victims = []
+        cursor = self._conn.execute('SELECT rowid, size FROM tm ORDER BY last_used')
+        for rowid, size in cursor:
+            if removed_rows >= excess_rows and removed_bytes >= excess_bytes:
+                break
+            victims.append((rowid,))
+            removed_rows += 1
+            removed_bytes += size
+        cursor.close()
+
+        self._conn.executemany('DELETE FROM tm WHERE rowid = ?', victims)
+
+    def stats(self):
+        with self._lock:
+            count, total = self._totals()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,242 @@
+"""
+本地向量索引
+- 嵌入器可替換（embed(texts) 回傳 float32 矩陣，分批與快取由嵌入器負責，見 embedding_cache），
+  HashEmbedder 為不需網路的確定性嵌入（測試用）
+- 向量以 NumPy 陣列存檔，每個來源（PDF）一個 vectors/<來源雜湊>.npy（正規化後以內積做餘弦相似度檢索），
+  chunk id → 文字 / 元數據 / 內容雜湊存在 SQLite 旁存表
+- 以來源為單位同步：內容雜湊沒變的塊沿用舊向量，只嵌入新的或改過的塊，並刪除已不存在的塊；
+  只改寫該來源的向量檔與旁存表列，其他來源不動
+- 不同解析流程 / 嵌入器的塊放在各自的目錄（index_dir_for），避免互相覆蓋同一來源
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+# 預設索引目錄（各解析流程 / 嵌入器在其下各自一個子目錄，見 index_dir_for）
+DEFAULT_INDEX_DIR = "data/vector_index"
+
+_WORD = re.compile(r'[A-Za-z0-9]+')
+_UNSAFE_PATH_CHARS = re.compile(r'[^A-Za-z0-9._-]+')
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def index_dir_for(pipeline: str, embedder: "Embedder", root: str = DEFAULT_INDEX_DIR) -> Path:
+    """
+    某個解析流程 + 嵌入器專用的索引目錄，例如 data/vector_index/pymupdf_pdfplumber/hash-256
+    兩個流程以同一個 PDF 路徑為來源，共用目錄時會互相刪除對方的塊；換嵌入器時也不會碰到舊索引
+    """
+    return Path(root) / pipeline / _UNSAFE_PATH_CHARS.sub('_', embedder.name)
+
+
+# ===================== 嵌入器 =====================
+
+class Embedder:
+    """嵌入器介面：embed(texts) 回傳 shape 為 (len(texts), dim) 的 float32 矩陣"""
+
+    name = "embedder"
+    dim = 0
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        raise NotImplementedError
+
+    def close(self):
+        """釋放嵌入器持有的資源（快取檔、連線）；預設沒有需要釋放的資源"""
+
+
+class HashEmbedder(Embedder):
+    """
+    確定性的本地嵌入：中文取字元二元組、英數取單字，雜湊到 dim 維並帶正負號
+    相同文字永遠得到相同向量，不需網路，供測試與離線建索引使用
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hash-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        words = _WORD.findall(text.lower())
+        chars = [ch for ch in text if not ch.isspace() and not ch.isascii()]
+        return words + [a + b for a, b in zip(chars, chars[1:])] + chars
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                h = zlib.crc32(feature.encode('utf-8'))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return vectors
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+# ===================== 向量索引 =====================
+
+class VectorIndex:
+    """
+    持久化的平面向量索引（vectors/<來源雜湊>.npy 第 i 列對應旁存表中該來源 position = i 的塊）
+    upsert(chunks): 以來源為單位同步，回傳 {"embedded", "reused", "deleted", "total"}
+    search(query, k): 回傳最相似的 k 個塊
+    """
+
+    def __init__(self, path: str = DEFAULT_INDEX_DIR, embedder: Optional[Embedder] = None):
+        self.path = Path(path)
+        self.vectors_dir = self.path / "vectors"
+        self.vectors_dir.mkdir(parents=True, exist_ok=True)
+        self.embedder = embedder or HashEmbedder()
+
+        self._conn = sqlite3.connect(str(self.path / "chunks.sqlite3"))
+        self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS chunks ('
+            ' source TEXT NOT NULL, position INTEGER NOT NULL, id TEXT NOT NULL UNIQUE,'
+            ' content_hash TEXT NOT NULL, text TEXT NOT NULL, metadata TEXT NOT NULL,'
+            ' PRIMARY KEY (source, position))'
+        )
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(chunks)')}
+        if 'position' not in columns:
+            raise ValueError(f"索引 {self.path} 為舊版格式（所有來源共用一個 vectors.npy），請改用新目錄重建")
+        self._check_embedder()
+
+        # 來源 -> 該來源的向量矩陣；檢索用的合併矩陣在需要時才建立
+        self._source_vectors: Dict[str, np.ndarray] = {}
+        for (source,) in self._conn.execute('SELECT DISTINCT source FROM chunks ORDER BY source'):
+            self._source_vectors[source] = np.load(self._vectors_path(source))
+        self._matrix: Optional[np.ndarray] = None
+        self._owners: List[tuple] = []
+
+    def _check_embedder(self):
+        """索引與嵌入器必須一致，否則舊向量無法比較"""
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'embedder'").fetchone()
+        current = json.dumps({"name": self.embedder.name, "dim": self.embedder.dim})
+        if row is None:
+            self._conn.execute("INSERT INTO meta (key, value) VALUES ('embedder', ?)", (current,))
+            self._conn.commit()
+        elif row[0] != current:
+            raise ValueError(f"索引 {self.path} 以 {row[0]} 建立，與目前的嵌入器 {current} 不符，請改用新目錄重建")
+
+    def _vectors_path(self, source: str) -> Path:
+        return self.vectors_dir / f"{content_hash(source)[:32]}.npy"
+
+    def __len__(self) -> int:
+        return sum(len(vectors) for vectors in self._source_vectors.values())
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """所有來源的向量依來源順序合併（檢索用，upsert 後重新建立）"""
+        if self._matrix is None:
+            self._owners = []
+            for source, vectors in self._source_vectors.items():
+                self._owners.extend((source, position) for position in range(len(vectors)))
+            if self._source_vectors:
+                self._matrix = np.vstack(list(self._source_vectors.values()))
+            else:
+                self._matrix = np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return self._matrix
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        return _normalize(self.embedder.embed(texts))
+
+    def upsert(self, chunks: Iterable[Dict[str, Any]], source: Optional[str] = None) -> Dict[str, int]:
+        """
+        以來源為單位同步索引：chunks 須為該來源目前完整的塊（例如 prepare_for_rag 的結果）
+        source 未指定時取塊元數據中的 source
+        """
+        chunks = list(chunks)
+        if source is None:
+            source = chunks[0]["metadata"].get("source", "") if chunks else ""
+
+        old_rows = {}
+        for position, row_hash in self._conn.execute(
+                'SELECT position, content_hash FROM chunks WHERE source = ? ORDER BY position', (source,)):
+            old_rows.setdefault(row_hash, position)
+        old_vectors = self._source_vectors.get(source)
+
+        # 只嵌入內容雜湊在此來源舊資料中找不到的塊（同一次內重複的內容只嵌入一次，一次交給嵌入器分批）
+        hashes = [content_hash(chunk["text"]) for chunk in chunks]
+        missing = list(dict.fromkeys(h for h in hashes if h not in old_rows))
+        text_by_hash = {h: chunk["text"] for h, chunk in zip(hashes, chunks)}
+        new_vectors = dict(zip(missing, self._embed([text_by_hash[h] for h in missing])))
+
+        source_vectors = np.zeros((len(chunks), self.embedder.dim), dtype=np.float32)
+        for i, h in enumerate(hashes):
+            source_vectors[i] = new_vectors[h] if h in new_vectors else old_vectors[old_rows[h]]
+
+        stats = {
+            "embedded": len(missing),
+            "reused": sum(1 for h in hashes if h in old_rows),
+            "deleted": len(set(old_rows) - set(hashes)),
+            "total": len(self) - (len(old_vectors) if old_vectors is not None else 0) + len(chunks),
+        }
+
+        # 只改寫此來源的旁存表列與向量檔
+        with self._conn:
+            self._conn.execute('DELETE FROM chunks WHERE source = ?', (source,))
+            self._conn.executemany(
+                'INSERT INTO chunks (source, position, id, content_hash, text, metadata) VALUES (?, ?, ?, ?, ?, ?)',
+                [
+                    (source, i, f"{source}#{i}", h, chunk["text"],
+                     json.dumps(chunk.get("metadata", {}), ensure_ascii=False))
+                    for i, (h, chunk) in enumerate(zip(hashes, chunks))
+                ],
+            )
+            self._save_vectors(source, source_vectors)
+
+        if chunks:
+            self._source_vectors[source] = source_vectors
+        else:
+            self._source_vectors.pop(source, None)
+        self._matrix = None
+        return stats
+
+    def _save_vectors(self, source: str, vectors: np.ndarray):
+        path = self._vectors_path(source)
+        if not len(vectors):
+            path.unlink(missing_ok=True)
+            return
+        tmp_path = path.with_name(path.stem + ".tmp.npy")
+        np.save(tmp_path, vectors)
+        os.replace(tmp_path, path)
+
+    def delete_source(self, source: str) -> int:
+        """刪除某個來源的所有塊，回傳刪除數"""
+        before = len(self)
+        self.upsert([], source=source)
+        return before - len(self)
+
+    def search(self, query: str, k: int = 3) -> List[Dict[str, Any]]:
+        if not len(self):
+            return []
+        scores = self.vectors @ self._embed([query])[0]
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            source, position = self._owners[int(row)]
+            chunk_id, text, metadata = self._conn.execute(
+                'SELECT id, text, metadata FROM chunks WHERE source = ? AND position = ?', (source, position)
+            ).fetchone()
+            results.append({"id": chunk_id, "score": float(scores[row]), "text": text,
+                            "metadata": json.loads(metadata)})
+        return results
+
+    def close(self):
+        self._conn.close()